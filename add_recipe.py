@@ -1,37 +1,65 @@
 import streamlit as st
-import json
 import pandas as pd
 from datetime import datetime
 import uuid
-import os
+
+from recipe_export import FORMATS, ExportCache, available_formats
+from instrumentation import profiled
+from meal_plan import plan_selection, plan_week, shopping_list
+from nutrition import NutritionCalculator, format_nutrition
+from recipe_core import RecipeNotFound, RecipeService, ValidationError
+from recipe_import import import_recipes
+from recipe_schema import CATEGORIES, DIFFICULTIES, TO_TASTE, UNITS, make_ingredient, make_recipe, validate_recipe
+from recipe_storage import open_store
+
+PAGE_SIZES = [10, 20, 50]
 
 # Настройки для подавления предупреждений
 st.set_option('client.showErrorDetails', False)
 
+@st.cache_resource
+def get_store():
+    """Одно хранилище рецептов на весь процесс (общее для всех сессий).
+
+    Бэкенд выбирается переменной окружения RECIPES_BACKEND: json (по умолчанию) или sqlite.
+    """
+    return open_store()
+
+@st.cache_resource
+def get_export_cache():
+    """Готовые файлы выгрузки, общие для всех сессий"""
+    return ExportCache()
+
+@st.cache_resource
+def get_nutrition():
+    """Расчет КБЖУ с кэшем по хэшу ингредиентов, общий для всех сессий"""
+    return NutritionCalculator()
+
+@st.cache_resource
+def get_service():
+    """Операции с рецептами и поисковый индекс поверх общего хранилища, общие для всех сессий"""
+    service = RecipeService(get_store())
+    service.warm_up()
+    return service
+
+def count_recipes():
+    """Сколько всего рецептов (файл перечитывается только если он изменился)"""
+    try:
+        return get_service().count()
+    except Exception as e:
+        st.error(f"❌ Ошибка загрузки файла рецептов: {str(e)}")
+        return 0
+
+@profiled()
 def main():
-    # Инициализация состояния сессии
-    if 'recipes' not in st.session_state:
-        try:
-            # Проверяем существует ли файл и не пустой ли он
-            if os.path.exists('my_recipes.json') and os.path.getsize('my_recipes.json') > 0:
-                with open('my_recipes.json', 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:  # Если файл не пустой
-                        st.session_state.recipes = json.loads(content)
-                    else:
-                        st.session_state.recipes = []
-            else:
-                st.session_state.recipes = []
-        except (json.JSONDecodeError, Exception) as e:
-            st.error(f"❌ Ошибка загрузки файла рецептов: {str(e)}")
-            st.session_state.recipes = []
-            # Создаем пустой файл с корректным JSON
-            with open('my_recipes.json', 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
+    # Рецепты в сессии не копируем - все сессии читают общий снимок из get_store()
+    # Счетчик сохраненных в этой сессии рецептов (для сброса полей формы)
+    if 'saved_count' not in st.session_state:
+        st.session_state.saved_count = 0
     
     # Инициализация временных ингредиентов
     if 'temp_ingredients' not in st.session_state:
-        st.session_state.temp_ingredients = []
+        set_ingredients([])
     
     # Инициализация имени автора (сохраняется между рецептами)
     if 'saved_author' not in st.session_state:
@@ -46,16 +74,56 @@ def main():
     st.title("📖 Добавление нового рецепта в систему НутринямAI")
 
     
-    tab1, tab2 = st.tabs(["📝 Добавить рецепт", "📊 Мои рецепты"])
+    tab1, tab2, tab3 = st.tabs(["📝 Добавить рецепт", "📊 Мои рецепты", "🛒 Покупки и меню"])
     
     with tab1:
         final_recipe_form()
     
     with tab2:
         view_recipes_final()
+    
+    with tab3:
+        shopping_tab()
 
 def final_recipe_form():
-    
+    # Редактор ингредиентов и форма рецепта - отдельные фрагменты:
+    # правка одного поля перезапускает только свой фрагмент, а не всю страницу
+    ingredient_editor()
+    recipe_form()
+
+def set_ingredients(ingredients):
+    """Список ингредиентов редактора (порядок строк) и словарь uid -> ингредиент для колбэков"""
+    st.session_state.temp_ingredients = ingredients
+    st.session_state.ingredients_by_uid = {ingredient["uid"]: ingredient for ingredient in ingredients}
+
+def find_ingredient(uid):
+    return st.session_state.ingredients_by_uid.get(uid)
+
+def update_ingredient(uid, field, key):
+    """Колбэк поля в списке ингредиентов: переносим значение виджета в ингредиент"""
+    ingredient = find_ingredient(uid)
+    if ingredient is None:
+        return
+    value = st.session_state[key]
+    ingredient[field] = value
+    if field == "unit":
+        # Автоматически ставим прочерк при выборе "по вкусу" и возвращаем число при уходе с него
+        if value == TO_TASTE:
+            ingredient["amount"] = "-"
+        elif ingredient["amount"] == "-":
+            ingredient["amount"] = 100
+
+def remove_ingredient(uid):
+    set_ingredients([ingredient for ingredient in st.session_state.temp_ingredients if ingredient["uid"] != uid])
+
+def ingredients_for_save():
+    """Ингредиенты для рецепта - без служебного uid редактора"""
+    return [{k: v for k, v in ingredient.items() if k != "uid"}
+            for ingredient in st.session_state.temp_ingredients]
+
+@st.fragment
+@profiled()
+def ingredient_editor():
     # Секция добавления ингредиентов
     st.subheader("Ингредиенты")
     
@@ -72,7 +140,7 @@ def final_recipe_form():
         with col3:
             ing_unit = st.selectbox(
                 "Единица измерения*", 
-                ["г", "мл", "ст.л.", "ч.л.", "шт", "стакан", "по вкусу"],
+                UNITS,
                 key="ing_unit"
             )
         
@@ -87,15 +155,12 @@ def final_recipe_form():
                 st.error("❌ Введите название продукта")
             else:
                 # Автоматически ставим прочерк для "по вкусу"
-                final_amount = "-" if ing_unit == "по вкусу" else ing_amount
-                
-                new_ingredient = {
-                    "name": ing_name.strip(),
-                    "amount": final_amount,
-                    "unit": ing_unit,
-                    "needs_preparation": needs_prep
-                }
+                new_ingredient = make_ingredient(ing_name, ing_amount, ing_unit, needs_prep)
+                final_amount = new_ingredient["amount"]
+                # Постоянный uid - ключ виджетов строки, не зависящий от позиции в списке
+                new_ingredient["uid"] = uuid.uuid4().hex
                 st.session_state.temp_ingredients.append(new_ingredient)
+                st.session_state.ingredients_by_uid[new_ingredient["uid"]] = new_ingredient
                 prep_text = " (нужна предподготовка)" if needs_prep else ""
                 st.success(f"✅ Добавлен: {final_amount} {ing_unit} {ing_name}{prep_text}")
     
@@ -117,78 +182,82 @@ def final_recipe_form():
         with cols[4]:
             st.write("**Действие**")
         
-        # Отображаем каждый ингредиент с возможностью редактирования
-        ingredients_to_remove = []
-        for i, ingredient in enumerate(st.session_state.temp_ingredients):
-            cols = st.columns([4, 2, 2, 2, 1])
-            
+        # Каждая строка - свой фрагмент; удаление - колбэк, список перестраивается без st.rerun()
+        for ingredient in st.session_state.temp_ingredients:
+            cols = st.columns([10, 1])
             with cols[0]:
-                # Поле для редактирования названия
-                new_name = st.text_input(
-                    "Название", 
-                    value=ingredient["name"],
-                    key=f"edit_name_{i}",
-                    label_visibility="collapsed"
-                )
-                if new_name != ingredient["name"]:
-                    st.session_state.temp_ingredients[i]["name"] = new_name
-            
+                ingredient_row(ingredient["uid"])
             with cols[1]:
-                # Поле для редактирования количества
-                if ingredient["unit"] == "по вкусу":
-                    st.write("-")
-                else:
-                    new_amount = st.number_input(
-                        "Количество",
-                        value=int(ingredient["amount"]) if ingredient["amount"] != "-" else 100,
-                        min_value=0,
-                        key=f"edit_amount_{i}",
-                        label_visibility="collapsed"
-                    )
-                    if new_amount != ingredient["amount"]:
-                        st.session_state.temp_ingredients[i]["amount"] = new_amount
-            
-            with cols[2]:
-                # Выбор единицы измерения
-                new_unit = st.selectbox(
-                    "Единица",
-                    ["г", "мл", "ст.л.", "ч.л.", "шт","стакан", "по вкусу"],
-                    index=["г", "мл", "ст.л.", "ч.л.", "шт", "стакан", "по вкусу"].index(ingredient["unit"]),
-                    key=f"edit_unit_{i}",
-                    label_visibility="collapsed"
-                )
-                if new_unit != ingredient["unit"]:
-                    st.session_state.temp_ingredients[i]["unit"] = new_unit
-                    # Автоматически ставим прочерк при выборе "по вкусу"
-                    if new_unit == "по вкусу":
-                        st.session_state.temp_ingredients[i]["amount"] = "-"
-            
-            with cols[3]:
-                # Чекбокс предподготовки
-                new_prep = st.checkbox(
-                    "Предподготовка",
-                    value=ingredient["needs_preparation"],
-                    key=f"edit_prep_{i}",
-                    label_visibility="collapsed"
-                )
-                if new_prep != ingredient["needs_preparation"]:
-                    st.session_state.temp_ingredients[i]["needs_preparation"] = new_prep
-            
-            with cols[4]:
-                if st.button("❌", key=f"del_{i}"):
-                    ingredients_to_remove.append(i)
-        
-        # Удаляем отмеченные ингредиенты
-        for index in sorted(ingredients_to_remove, reverse=True):
-            st.session_state.temp_ingredients.pop(index)
-            st.rerun()
+                st.button("❌", key=f"del_{ingredient['uid']}", on_click=remove_ingredient,
+                          args=(ingredient["uid"],))
+
+@st.fragment
+@profiled()
+def ingredient_row(uid):
+    """Поля одного ингредиента; при правке перезапускается только эта строка"""
+    ingredient = find_ingredient(uid)
+    if ingredient is None:
+        return
+    cols = st.columns([4, 2, 2, 2])
+    
+    with cols[0]:
+        # Поле для редактирования названия
+        st.text_input(
+            "Название", 
+            value=ingredient["name"],
+            key=f"edit_name_{uid}",
+            label_visibility="collapsed",
+            on_change=update_ingredient,
+            args=(uid, "name", f"edit_name_{uid}")
+        )
+    
+    with cols[1]:
+        # Поле для редактирования количества
+        if ingredient["unit"] == TO_TASTE:
+            st.write("-")
+        else:
+            st.number_input(
+                "Количество",
+                value=int(ingredient["amount"]) if ingredient["amount"] != "-" else 100,
+                min_value=0,
+                key=f"edit_amount_{uid}",
+                label_visibility="collapsed",
+                on_change=update_ingredient,
+                args=(uid, "amount", f"edit_amount_{uid}")
+            )
     
+    with cols[2]:
+        # Выбор единицы измерения
+        st.selectbox(
+            "Единица",
+            UNITS,
+            index=UNITS.index(ingredient["unit"]),
+            key=f"edit_unit_{uid}",
+            label_visibility="collapsed",
+            on_change=update_ingredient,
+            args=(uid, "unit", f"edit_unit_{uid}")
+        )
+    
+    with cols[3]:
+        # Чекбокс предподготовки
+        st.checkbox(
+            "Предподготовка",
+            value=ingredient["needs_preparation"],
+            key=f"edit_prep_{uid}",
+            label_visibility="collapsed",
+            on_change=update_ingredient,
+            args=(uid, "needs_preparation", f"edit_prep_{uid}")
+        )
+
+@st.fragment
+@profiled()
+def recipe_form():
     # Основная форма рецепта
     st.write("---")
     st.subheader("Рецепт")
     
     # Используем уникальные ключи для полей формы
-    form_key = f"recipe_form_{len(st.session_state.recipes)}"
+    form_key = f"recipe_form_{st.session_state.saved_count}"
     
     with st.form(form_key):
         col1, col2 = st.columns(2)
@@ -216,15 +285,21 @@ def final_recipe_form():
             )
             difficulty = st.selectbox(
                 "Сложность", 
-                ["легко", "средне", "сложно"], 
+                DIFFICULTIES, 
                 index=0, 
                 key=f"difficulty_{form_key}"
             )
+            servings = st.number_input(
+                "Количество порций",
+                min_value=1,
+                value=2,
+                key=f"servings_{form_key}"
+            )
         
         # Одиночный выбор категории - оставляем "-" и добавляем "напитки"
         category = st.selectbox(
             "Выберите категорию",
-            ["-", "горячее", "салат", "суп", "закуска", "гарнир", "десерт", "напитки"],
+            CATEGORIES,
             key=f"category_{form_key}"
         )
         
@@ -239,6 +314,13 @@ def final_recipe_form():
             key=f"instructions_{form_key}"
         )
         
+        # Похожие рецепты, найденные при прошлой попытке сохранения
+        duplicate_warnings = st.session_state.get('duplicate_warnings', [])
+        for warning in duplicate_warnings:
+            st.warning(warning)
+        force_save = st.checkbox("Это другой рецепт - сохранить все равно", key=f"force_{form_key}") \
+            if duplicate_warnings else False
+        
         # Кнопка сохранения рецепта
         submitted = st.form_submit_button("💾 Сохранить рецепт")
         
@@ -247,157 +329,377 @@ def final_recipe_form():
             if author:
                 st.session_state.saved_author = author
             
-            # Валидация данных
-            errors = []
-            if not name:
-                errors.append("❌ Введите название рецепта")
-            if not author:
-                errors.append("❌ Введите автора рецепта")
-            if not st.session_state.temp_ingredients:
-                errors.append("❌ Добавьте хотя бы один ингредиент")
-            if not instructions_input:
-                errors.append("❌ Добавьте инструкцию приготовления")
-            # Убрали проверку на "-" - теперь можно сохранять с любой категорией
+            # Создаем рецепт с уникальным ID; проверка - в общем слое при сохранении
+            recipe = make_recipe(
+                name, author, category, difficulty, cooking_time,
+                ingredients_for_save(), instructions_input, servings
+            )
             
-            if errors:
-                for error in errors:
-                    st.error(error)
-            else:
-                # Обрабатываем инструкции - просто разбиваем по строкам
-                instructions_list = [step.strip() for step in instructions_input.split('\n') if step.strip()]
-                
-                # Создаем рецепт с уникальным ID
-                recipe = {
-                    "id": str(uuid.uuid4()),
-                    "name": name,
-                    "author": author,
-                    "categories": [category],  # Одна категория в массиве (может быть "-")
-                    "difficulty": difficulty,
-                    "cooking_time": cooking_time,
-                    "ingredients": st.session_state.temp_ingredients.copy(),
-                    "instructions": instructions_list,  # Шаги как есть, без цифр
-                    "created_date": datetime.now().strftime("%Y-%m-%d")
-                }
-                
-                save_recipe(recipe)
+            # Корректный рецепт сначала сверяем с сохраненными - вдруг такой уже есть
+            duplicates = [] if force_save or validate_recipe(recipe) else find_duplicates(recipe)
+            if duplicates:
+                st.session_state.duplicate_warnings = [
+                    f"⚠️ Возможный дубликат: «{dup['name']}» ({dup.get('author', 'Неизвестно')}, "
+                    f"сходство {score:.0%})"
+                    for dup, score in duplicates
+                ]
+                # Перезапускаем, чтобы показать предупреждения и флажок в форме
+                st.rerun()
+            elif save_recipe(recipe):
                 # Очищаем временные данные (кроме автора)
-                st.session_state.temp_ingredients = []
+                set_ingredients([])
+                st.session_state.duplicate_warnings = []
                 st.success("✅ Рецепт успешно сохранен!")
                 st.balloons()
-                # Перезагружаем страницу для очистки полей формы
+                # Перезапускаем всю страницу: очищаются поля формы и список ингредиентов
                 st.rerun()
 
+def find_duplicates(recipe):
+    """Похожие сохраненные рецепты; если проверка не удалась, сохранению это не мешает"""
+    try:
+        return get_service().duplicates(recipe)
+    except Exception as e:
+        st.warning(f"⚠️ Не удалось проверить дубликаты: {str(e)}")
+        return []
+
 def save_recipe(recipe):
-    """Сохраняем рецепт в JSON файл"""
-    # Добавляем ID если его нет (для совместимости со старыми рецептами)
-    if 'id' not in recipe:
-        recipe['id'] = str(uuid.uuid4())
-    
-    st.session_state.recipes.append(recipe)
-    
-    # Сохраняем в локальный файл
+    """Сохраняем рецепт через общий слой: проверка по правилам формы и запись в хранилище"""
     try:
-        with open('my_recipes.json', 'w', encoding='utf-8') as f:
-            json.dump(st.session_state.recipes, f, ensure_ascii=False, indent=2)
+        get_service().save(recipe)
+        st.session_state.saved_count += 1
+        return True
+    except ValidationError as e:
+        for error in e.errors:
+            st.error(f"❌ {error}")
     except Exception as e:
         st.error(f"❌ Ошибка сохранения рецепта: {str(e)}")
+    return False
 
 def delete_recipe(recipe_id):
     """Удаляем рецепт по ID"""
     try:
-        # Находим индекс рецепта
-        recipe_index = next((i for i, r in enumerate(st.session_state.recipes) if r['id'] == recipe_id), None)
-        
-        if recipe_index is not None:
-            # Удаляем рецепт из session state
-            deleted_recipe = st.session_state.recipes.pop(recipe_index)
-            
-            # Сохраняем обновленные данные в файл
-            with open('my_recipes.json', 'w', encoding='utf-8') as f:
-                json.dump(st.session_state.recipes, f, ensure_ascii=False, indent=2)
-            
-            st.success(f"✅ Рецепт '{deleted_recipe['name']}' успешно удален!")
-            st.rerun()
-        else:
-            st.error("❌ Рецепт не найден")
+        # Удаляем рецепт в хранилище (поиск по ключу, без перебора)
+        deleted_recipe = get_service().delete(recipe_id)
+        st.success(f"✅ Рецепт '{deleted_recipe['name']}' успешно удален!")
+        st.rerun()
+    except RecipeNotFound:
+        st.error("❌ Рецепт не найден")
     except Exception as e:
         st.error(f"❌ Ошибка при удалении рецепта: {str(e)}")
 
 def clear_all_recipes():
     """Очищаем все рецепты после скачивания"""
     try:
-        # Сохраняем количество рецептов для сообщения
-        recipes_count = len(st.session_state.recipes)
-        
-        # Очищаем рецепты
-        st.session_state.recipes = []
-        
-        # Очищаем файл
-        with open('my_recipes.json', 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        # Очищаем хранилище, запоминая количество рецептов для сообщения
+        recipes_count = get_service().clear()
         
         st.success(f"✅ Все рецепты ({recipes_count} шт.) успешно скачаны и очищены!")
         st.rerun()
     except Exception as e:
         st.error(f"❌ Ошибка при очистке рецептов: {str(e)}")
 
+@profiled()
 def view_recipes_final():
     st.header("📚 Записанные рецепты")
     
-    if not st.session_state.recipes:
+    # Импорт пачки рецептов из файла
+    with st.expander("📤 Импорт рецептов из файла"):
+        import_recipes_file()
+    
+    if not count_recipes():
         st.info("🍃 Пока нет сохраненных рецептов. Добавьте первый рецепт!")
         return
     
     # Кнопка скачивания всех рецептов с автоматической очисткой
-    if st.session_state.recipes:
+    try:
+        download_recipes()
+    except Exception as e:
+        st.error(f"❌ Ошибка создания файла для скачивания: {str(e)}")
+
+    # Выгрузка журнала в my_recipes.json по запросу
+    if st.button("💾 Выгрузить в my_recipes.json", key="export_json_file"):
         try:
-            json_data = json.dumps(st.session_state.recipes, ensure_ascii=False, indent=2)
-            
-            # Создаем состояние для отслеживания скачивания
-            if 'download_triggered' not in st.session_state:
-                st.session_state.download_triggered = False
-            
-            # Кнопка скачивания, которая запускает очистку
-            if st.download_button(
-                label="📥 Скачать рецепты и очистить",
-                data=json_data,
-                file_name=f"my_recipes_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
-                mime="application/json",
-                help="Скачайте JSON файл со всеми рецептами, после чего база очистится автоматически",
-                key="download_and_clear"
-            ):
-                # Устанавливаем флаг что скачивание произошло
-                st.session_state.download_triggered = True
-            
-            # Если скачивание произошло, очищаем рецепты
-            if st.session_state.download_triggered:
-                clear_all_recipes()
-                # Сбрасываем флаг после очистки
-                st.session_state.download_triggered = False
-                
+            path = get_store().export_json()
+            st.success(f"✅ Рецепты выгружены в {path}")
+        except Exception as e:
+            st.error(f"❌ Ошибка выгрузки рецептов: {str(e)}")
+
+    view_recipes_page()
+
+def import_recipes_file():
+    """Загрузка JSON / JSON Lines / CSV с проверкой по правилам формы"""
+    uploaded = st.file_uploader(
+        "Файл с рецептами (.json, .jsonl, .csv, можно сжатый .gz)",
+        type=["json", "jsonl", "csv", "gz"],
+        key="import_file"
+    )
+    if uploaded is None:
+        return
+    
+    if st.button("📥 Импортировать", key="import_start"):
+        try:
+            with st.spinner("Импортируем рецепты..."):
+                report = import_recipes(get_store(), uploaded, filename=uploaded.name)
         except Exception as e:
-            st.error(f"❌ Ошибка создания файла для скачивания: {str(e)}")
+            st.error(f"❌ Ошибка импорта: {str(e)}")
+            return
+        
+        if report.stopped_at:
+            st.warning(f"⚠️ {report.summary()}")
+        else:
+            st.success(f"✅ {report.summary()}")
+        if report.errors:
+            st.warning(f"⚠️ Записей с ошибками: {len(report.errors)}")
+            st.dataframe(
+                pd.DataFrame(
+                    [(number, recipe_id or "-", "; ".join(errors)) for number, recipe_id, errors in report.errors],
+                    columns=["Запись", "ID", "Ошибки"]
+                ),
+                hide_index=True
+            )
+
+@profiled()
+def download_recipes():
+    """Файл выгрузки собирается только по кнопке и кэшируется до изменения рецептов"""
+    store = get_store()
+    export_cache = get_export_cache()
     
-    # Отображаем все рецепты без фильтров
-    st.write(f"**Всего рецептов:** {len(st.session_state.recipes)}")
+    col1, col2 = st.columns([2, 3])
+    with col1:
+        fmt = st.selectbox(
+            "Формат файла",
+            available_formats(),
+            format_func=lambda f: FORMATS[f][0],
+            key="export_format"
+        )
+    with col2:
+        with_nutrition = st.checkbox("🥗 Добавить КБЖУ", key="export_nutrition")
+    nutrition = get_nutrition() if with_nutrition else None
     
-    for i, recipe in enumerate(st.session_state.recipes):
+    if export_cache.get(store, fmt, nutrition) is None:
+        if not st.button("📦 Подготовить файл для скачивания", key="prepare_export"):
+            return
+        with st.spinner("Собираем файл..."):
+            export_cache.build(store, fmt, nutrition)
+    data = export_cache.read(store, fmt, nutrition)
+    if data is None:
+        return
+    
+    # Создаем состояние для отслеживания скачивания
+    if 'download_triggered' not in st.session_state:
+        st.session_state.download_triggered = False
+    
+    _, extension, mime, _, _ = FORMATS[fmt]
+    # Кнопка скачивания, которая запускает очистку
+    if st.download_button(
+        label="📥 Скачать рецепты и очистить",
+        data=data,
+        file_name=f"my_recipes_{datetime.now().strftime('%Y%m%d_%H%M')}.{extension}",
+        mime=mime,
+        help="Скачайте файл со всеми рецептами, после чего база очистится автоматически",
+        key="download_and_clear"
+    ):
+        # Устанавливаем флаг что скачивание произошло
+        st.session_state.download_triggered = True
+    
+    # Если скачивание произошло, очищаем рецепты
+    if st.session_state.download_triggered:
+        # Сбрасываем флаг до очистки (clear_all_recipes перезапускает скрипт)
+        st.session_state.download_triggered = False
+        clear_all_recipes()
+
+def reset_recipes_page():
+    """При смене фильтров возвращаемся на первую страницу"""
+    st.session_state.recipes_page = 1
+
+@st.fragment
+@profiled()
+def view_recipes_page():
+    """Фильтры и постраничный список: рендерим только текущую страницу
+    и только содержимое открытого рецепта. Фрагмент - фильтры, страницы
+    и раскрытие рецептов не перезапускают остальную страницу"""
+    service = get_service()
+    facets = service.facets()
+    
+    # Поиск по индексу: по словам и по имеющимся продуктам
+    col1, col2 = st.columns(2)
+    with col1:
+        query = st.text_input("🔎 Поиск по названию, ингредиентам и шагам", key="search_query",
+                              on_change=reset_recipes_page)
+    with col2:
+        pantry = st.text_input("🧺 Что есть из продуктов (через запятую)", key="pantry_query",
+                               placeholder="яйца, мука, молоко", on_change=reset_recipes_page)
+    
+    # Фильтры применяются в хранилище до рендеринга
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        author = st.selectbox("Автор", ["Все"] + facets["authors"], key="filter_author",
+                              on_change=reset_recipes_page)
+    with col2:
+        category = st.selectbox("Категория", ["Все"] + facets["categories"], key="filter_category",
+                                on_change=reset_recipes_page)
+    with col3:
+        difficulty = st.selectbox("Сложность", ["Все"] + DIFFICULTIES, key="filter_difficulty",
+                                  on_change=reset_recipes_page)
+    with col4:
+        max_time = st.number_input("Время до (мин), 0 - любое", min_value=0, value=0, step=5,
+                                   key="filter_max_time", on_change=reset_recipes_page)
+    
+    filters = {
+        "author": None if author == "Все" else author,
+        "category": None if category == "Все" else category,
+        "difficulty": None if difficulty == "Все" else difficulty,
+        "max_cooking_time": max_time or None,
+    }
+    
+    if 'recipes_page' not in st.session_state:
+        st.session_state.recipes_page = 1
+    page_size = st.session_state.get('recipes_page_size', PAGE_SIZES[0])
+    offset = (st.session_state.recipes_page - 1) * page_size
+    # Без запроса поиск отдает обычную страницу из хранилища
+    products = [p.strip() for p in pantry.split(",") if p.strip()]
+    total, page, missing = service.search(query, products, offset, page_size, **filters)
+    pages = max(1, -(-total // page_size))
+    if st.session_state.recipes_page > pages:
+        # Рецептов стало меньше (удалили) - переходим на последнюю страницу
+        st.session_state.recipes_page = pages
+        offset = (pages - 1) * page_size
+        total, page, missing = service.search(query, products, offset, page_size, **filters)
+    
+    st.write(f"**Найдено рецептов:** {total}")
+    
+    selected_id = st.session_state.get('selected_recipe_id')
+    for recipe in page:
         # Для совместимости со старыми рецептами (где categories мог быть массивом)
         if isinstance(recipe.get('categories'), list) and recipe['categories']:
             categories_text = recipe['categories'][0] if len(recipe['categories']) > 0 else "Не указано"
         else:
             categories_text = recipe.get('categories', 'Не указано')
-            
-        with st.expander(f"🍳 {recipe['name']} | 👤{recipe.get('author', 'Неизвестно')} | ⏱️{recipe['cooking_time']}мин | {recipe['difficulty'].upper()} | {categories_text}"):
-            
-            # Кнопка удаления рецепта
-            col1, col2 = st.columns([3, 1])
-            with col2:
-                if st.button("🗑️ Удалить рецепт", key=f"delete_{i}", type="secondary"):
-                    delete_recipe(recipe['id'])
-            
-            display_recipe_final(recipe)
+        
+        is_open = recipe['id'] == selected_id
+        col1, col2 = st.columns([6, 1])
+        with col1:
+            st.write(f"🍳 **{recipe['name']}** | 👤{recipe.get('author', 'Неизвестно')} | ⏱️{recipe['cooking_time']}мин | {recipe['difficulty'].upper()} | {categories_text}")
+            if recipe['id'] in missing:
+                st.caption(pantry_note(missing[recipe['id']]))
+        with col2:
+            st.button(
+                "🔼 Скрыть" if is_open else "🔽 Открыть",
+                key=f"toggle_{recipe['id']}",
+                on_click=toggle_recipe,
+                args=(recipe['id'],)
+            )
+        
+        # Тело рецепта строим только для открытого
+        if is_open:
+            with st.container(border=True):
+                col1, col2 = st.columns([3, 1])
+                with col2:
+                    if st.button("🗑️ Удалить рецепт", key=f"delete_{recipe['id']}", type="secondary"):
+                        delete_recipe(recipe['id'])
+                
+                display_recipe_final(recipe)
+    
+    # Переключение страниц
+    col1, col2, col3 = st.columns([2, 2, 4])
+    with col1:
+        st.number_input(f"Страница (из {pages})", min_value=1, max_value=pages, key="recipes_page")
+    with col2:
+        st.selectbox("На странице", PAGE_SIZES, key="recipes_page_size", on_change=reset_recipes_page)
+
+def pantry_note(products_missing):
+    """Подпись к рецепту при подборе по продуктам"""
+    if not products_missing:
+        return "✅ Все продукты есть"
+    return f"🛒 Не хватает: {len(products_missing)} — {', '.join(products_missing)}"
 
+def toggle_recipe(recipe_id):
+    if st.session_state.get('selected_recipe_id') == recipe_id:
+        st.session_state.selected_recipe_id = None
+    else:
+        st.session_state.selected_recipe_id = recipe_id
+
+@st.fragment
+@profiled()
+def shopping_tab():
+    """Меню на неделю под бюджет времени и сводный список покупок по нему"""
+    st.header("🛒 Меню и список покупок")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        days = st.number_input("Дней", min_value=1, max_value=14, value=7, key="plan_days")
+    with col2:
+        meals = st.number_input("Блюд в день", min_value=1, max_value=5, value=2, key="plan_meals")
+    with col3:
+        daily_time = st.number_input("Время на готовку в день (мин)", min_value=5, value=90, step=5,
+                                     key="plan_time")
+    with col4:
+        max_difficulty = st.selectbox("Сложность не выше", DIFFICULTIES, index=len(DIFFICULTIES) - 1,
+                                      key="plan_difficulty")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🗓️ Составить меню", key="plan_build"):
+            st.session_state.plan_seed = st.session_state.get('plan_seed', -1) + 1
+            plan = plan_week(get_store().snapshot(), days, meals, daily_time, max_difficulty,
+                             seed=st.session_state.plan_seed)
+            # В сессии храним только ID - рецепты берем из хранилища при показе
+            st.session_state.meal_plan = [[recipe['id'] for recipe in day] for day in plan]
+    with col2:
+        servings = st.number_input("Порций каждого блюда", min_value=1, value=2, key="plan_servings")
+    
+    if not st.session_state.get('meal_plan'):
+        st.info("🍃 Составьте меню, чтобы получить список покупок")
+        return
+    
+    store = get_store()
+    plan = [[r for r in (store.get(recipe_id) for recipe_id in day) if r is not None]
+            for day in st.session_state.meal_plan]
+    if not any(plan):
+        st.warning("⚠️ Нет рецептов, которые укладываются в заданное время и сложность")
+        return
+    
+    for number, day in enumerate(plan, start=1):
+        total_time = sum(recipe['cooking_time'] for recipe in day)
+        st.write(f"**День {number}** (⏱️{total_time} мин)")
+        for recipe in day:
+            st.write(f"- {recipe['name']} | ⏱️{recipe['cooking_time']}мин | {recipe['difficulty']}")
+    
+    st.write("---")
+    st.subheader("Список покупок")
+    try:
+        shopping = shopping_list(plan_selection(plan, servings))
+    except Exception as e:
+        st.error(f"❌ Ошибка расчета списка покупок: {str(e)}")
+        return
+    
+    st.dataframe(
+        shopping.items.rename(columns={
+            "ingredient": "Продукт", "unit": "Единица", "amount": "Количество",
+            "grams": "Вес (г)", "recipes": "Рецептов"
+        }),
+        hide_index=True
+    )
+    if shopping.to_taste:
+        st.caption(f"По вкусу: {', '.join(shopping.to_taste)}")
+    
+    if len(shopping.prep):
+        st.write("**Подготовить заранее:**")
+        for row in shopping.prep.itertuples():
+            amount = row.unit if row.amount == "-" else f"{row.amount:g} {row.unit}"
+            # Ключ по ингредиенту рецепта: отметка не переезжает на другую строку, когда меню меняется
+            st.checkbox(f"{row.ingredient} — {amount} ({row.recipe})",
+                        key=f"prep_done_{row.recipe_id}_{row.position}")
+    
+    st.download_button(
+        label="📥 Скачать список покупок",
+        data=shopping.as_text(),
+        file_name=f"shopping_list_{datetime.now().strftime('%Y%m%d')}.txt",
+        mime="text/plain",
+        key="download_shopping"
+    )
+
+@profiled()
 def display_recipe_final(recipe):
     # Для совместимости со старыми рецептами
     if isinstance(recipe.get('categories'), list) and recipe['categories']:
@@ -410,6 +712,16 @@ def display_recipe_final(recipe):
     st.write(f"**Сложность:** {recipe['difficulty']}")
     st.write(f"**⏱Время готовки:** {recipe['cooking_time']} мин")
     
+    # КБЖУ по таблице продуктов (ингредиенты "по вкусу" не учитываются)
+    try:
+        nutrition = get_nutrition().for_recipe(recipe)
+        st.write(f"**🥗 КБЖУ на порцию** ({nutrition['servings']} порц.): {format_nutrition(nutrition, 'portion_')}")
+        st.caption(f"Всего: {format_nutrition(nutrition)}")
+        if nutrition['uncounted']:
+            st.caption(f"Не учтено ингредиентов (нет в таблице или неизвестен вес): {nutrition['uncounted']}")
+    except Exception as e:
+        st.caption(f"КБЖУ не рассчитано: {str(e)}")
+    
     st.write("**Ингредиенты:**")
     for ing in recipe['ingredients']:
         prep_icon = " ⚠️" if ing.get('needs_preparation', False) else ""
@@ -0,0 +1,155 @@
+"""Бенчмарк горячих путей приложения на синтетических коллекциях.
+
+Замеряется: загрузка хранилища (открытие и общий снимок), сохранение и
+удаление одного рецепта, выгрузка в файл, перезапуск всей страницы и
+отрисовка одного рецепта (через AppTest, без браузера). Для каждой операции -
+перцентили задержки и пиковая память (tracemalloc, отдельным проходом, чтобы
+трассировка не искажала время).
+
+    python benchmarks/bench_app.py --sizes 100 1000 10000 100000 --backends json sqlite
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from add_recipe import get_store
+from recipe_export import available_formats, export_recipes
+from recipe_storage import open_store
+from synthetic import seed_store, synthetic_recipes
+
+APP_PATH = os.path.join(ROOT, 'add_recipe.py')
+EXPORT_FORMATS = ["json", "csv", "parquet"]
+RENDER_BATCH = 20
+
+
+def _render_app(recipes):
+    from add_recipe import display_recipe_final
+    for recipe in recipes:
+        display_recipe_final(recipe)
+
+
+def timings(fn, repeat, setup=None):
+    """Время (мс) repeat вызовов fn; setup() перед каждым вызовом не замеряется"""
+    times = []
+    for i in range(repeat):
+        arg = setup(i) if setup else None
+        started = time.perf_counter()
+        fn(arg)
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def peak_memory(fn, setup=None):
+    """Пиковая память одного вызова fn (МБ)"""
+    arg = setup(0) if setup else None
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def operations(store, ids, n, repeat, heavy_repeat, workdir):
+    """(название, функция, повторов, подготовка) для коллекции из n рецептов"""
+    rng = random.Random(n)
+    new_recipes = list(synthetic_recipes(repeat + 1, seed=n + 1))
+    # Удаляем не больше половины коллекции, чтобы выгрузке и странице было что показать
+    victims = rng.sample(ids, min(len(ids) // 2, repeat + 1))
+
+    def load(_):
+        fresh = open_store()
+        try:
+            fresh.snapshot()
+        finally:
+            fresh.close()
+
+    ops = [
+        ("загрузка (открытие + снимок)", load, heavy_repeat, None),
+        ("сохранение рецепта", lambda recipe: store.add(recipe), repeat,
+         lambda i: new_recipes[i % len(new_recipes)]),
+        ("удаление рецепта", lambda recipe_id: store.delete(recipe_id), len(victims) - 1,
+         lambda i: victims[i]),
+    ]
+    for fmt in EXPORT_FORMATS:
+        if fmt in available_formats():
+            path = os.path.join(workdir, f"export.{fmt}")
+            ops.append((f"выгрузка {fmt}", lambda _, fmt=fmt, path=path: export_recipes(store, fmt, path),
+                        heavy_repeat, None))
+    return ops
+
+
+def bench_app(repeat):
+    """Перезапуск всей страницы с открытым рецептом и отрисовка одного рецепта"""
+    at = AppTest.from_file(APP_PATH, default_timeout=600).run()
+    toggles = [button for button in at.button if button.key and button.key.startswith("toggle_")]
+    if toggles:
+        toggles[0].click().run()
+    rerun = timings(lambda _: at.run(), repeat)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+    recipes = list(synthetic_recipes(RENDER_BATCH, seed=7))
+    render_at = AppTest.from_function(_render_app, args=(recipes,), default_timeout=600).run()
+    render = [t / RENDER_BATCH for t in timings(lambda _: render_at.run(), repeat)]
+    return rerun, render
+
+
+def report(backend, n, name, times, peak):
+    p50, p95, p99 = np.percentile(times, [50, 95, 99])
+    print(f"{backend:<7} {n:>7} {name:<30} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} {max(times):>9.2f} "
+          f"{'' if peak is None else f'{peak:.1f}':>9}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки, записи, выгрузки и отрисовки рецептов")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--backends", nargs="+", choices=["json", "sqlite"], default=["json", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=100, help="повторов быстрых операций")
+    parser.add_argument("--heavy-repeat", type=int, default=5, help="повторов загрузки, выгрузки и перезапусков")
+    parser.add_argument("--no-app", action="store_true", help="без замеров через AppTest")
+    args = parser.parse_args()
+
+    print(f"{'бэкенд':<7} {'рецептов':>7} {'операция':<30} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} "
+          f"{'max мс':>9} {'пик МБ':>9}")
+    for backend in args.backends:
+        for n in args.sizes:
+            with tempfile.TemporaryDirectory() as workdir:
+                os.chdir(workdir)
+                os.environ['RECIPES_BACKEND'] = backend
+                os.environ['RECIPES_DB'] = os.path.join(workdir, 'my_recipes.db')
+                store = open_store()
+                try:
+                    ids = seed_store(store, n)
+                    for name, fn, repeat, setup in operations(store, ids, n, args.repeat, args.heavy_repeat,
+                                                              workdir):
+                        times = timings(fn, repeat, setup)
+                        # Для сохранения и удаления память меряем на еще не использованном рецепте
+                        peak = peak_memory(fn, (lambda _, setup=setup, repeat=repeat: setup(repeat))
+                                           if setup else None)
+                        report(backend, n, name, times, peak)
+                finally:
+                    store.close()
+
+                if not args.no_app:
+                    st.cache_resource.clear()
+                    rerun, render = bench_app(args.heavy_repeat)
+                    report(backend, n, "перезапуск страницы", rerun, None)
+                    report(backend, n, "отрисовка рецепта (на рецепт)", render, None)
+                    get_store().close()
+                    st.cache_resource.clear()
+                os.chdir(ROOT)
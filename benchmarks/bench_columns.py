@@ -0,0 +1,76 @@
+"""Память и скорость фильтров: словари рецептов против колоночной таблицы RecipeTable.
+
+Словари читаются из JSON Lines, как при загрузке журнала, - каждая строка
+значения отдельный объект. Память - прирост tracemalloc после сборки.
+
+    python benchmarks/bench_columns.py --sizes 1000 10000 100000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from recipe_columns import RecipeTable
+from recipe_storage import matches_filters
+from synthetic import synthetic_recipes
+
+FILTERS = [
+    {"author": "Автор 7"},
+    {"category": "суп", "max_cooking_time": 30},
+    {"difficulty": "легко", "max_cooking_time": 20},
+]
+
+
+def retained(build):
+    """Результат build() и сколько памяти он удерживает (МБ)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size / 1024 / 1024
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Память и фильтры: словари против RecipeTable")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'рецептов':>8} {'словари МБ':>11} {'таблица МБ':>11} {'сжатие':>7} {'сборка с':>9} "
+          f"{'фильтры dict мс':>16} {'фильтры табл. мс':>17} {'рецепт мкс':>11}")
+    for n in args.sizes:
+        lines = [json.dumps(recipe, ensure_ascii=False) for recipe in synthetic_recipes(n)]
+        recipes, dict_mb = retained(lambda: [json.loads(line) for line in lines])
+        table, table_mb = retained(lambda: RecipeTable.from_recipes(recipes))
+        # Время сборки - отдельно, без трассировки
+        build = best_of(lambda: RecipeTable.from_recipes(recipes), repeat=1) / 1000
+
+        for filters in FILTERS:
+            expected = [i for i, r in enumerate(recipes) if matches_filters(r, **filters)]
+            assert table.rows(**filters).tolist() == expected
+        dict_ms = best_of(lambda: [[r for r in recipes if matches_filters(r, **f)] for f in FILTERS])
+        table_ms = best_of(lambda: [table.rows(**f) for f in FILTERS])
+        rows = range(0, n, max(1, n // 1000))
+        recipe_us = best_of(lambda: [table[row] for row in rows]) * 1000 / len(rows)
+
+        print(f"{n:>8} {dict_mb:>11.1f} {table_mb:>11.1f} {dict_mb / table_mb:>6.1f}x {build:>9.2f} "
+              f"{dict_ms:>16.1f} {table_ms:>17.2f} {recipe_us:>11.1f}", flush=True)
+        del recipes, table
@@ -0,0 +1,131 @@
+"""Задержка одного действия в интерфейсе: перезапуск всей страницы и работа фрагмента.
+
+Правка поля ингредиента в браузере перезапускает только фрагмент
+ingredient_row (или редактор ingredient_editor), а переключение страниц -
+только фрагмент view_recipes_page. AppTest перезапускать отдельные
+фрагменты не умеет и всегда выполняет скрипт целиком, поэтому бенчмарк
+запускает страницу с включенными замерами instrumentation (RECIPES_PROFILE)
+и на каждом перезапуске берет:
+
+- время всей страницы (так было до фрагментов);
+- время раздела @profiled самого фрагмента - столько же работы выполняет
+  перезапуск этого фрагмента; накладные расходы Streamlit на сам
+  перезапуск (разбор дельт, отправка в браузер) сюда не входят.
+
+    python benchmarks/bench_fragments.py --ingredients 5 25 100 --recipes 100 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Замеры разделов включаются при импорте instrumentation - до импорта приложения
+PROFILE_PATH = os.path.join(tempfile.mkdtemp(), 'profile.jsonl')
+os.environ['RECIPES_PROFILE'] = PROFILE_PATH
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from add_recipe import get_store  # noqa: E402
+from recipe_schema import make_ingredient  # noqa: E402
+from recipe_storage import open_store  # noqa: E402
+from synthetic import seed_store  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, 'add_recipe.py')
+
+
+def make_ingredients(count):
+    ingredients = []
+    for i in range(count):
+        ingredient = make_ingredient(f"продукт {i}", 100, "г")
+        ingredient["uid"] = uuid.uuid4().hex
+        ingredients.append(ingredient)
+    return ingredients
+
+
+def last_record(section):
+    """Последняя запись журнала замеров для внешнего раздела section"""
+    with open(PROFILE_PATH, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return next(record for record in reversed(records) if record["section"] == section)
+
+
+def timed(at, action, fragments, repeat):
+    """Медианы (мс) после действия action(at, i): перезапуск всей страницы и
+    разделы фрагментов {название: (раздел, сколько раз он вызывается за перезапуск)}"""
+    page, parts = [], {name: [] for name in fragments}
+    for i in range(repeat):
+        action(at, i)
+        started = time.perf_counter()
+        at.run()
+        page.append((time.perf_counter() - started) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        sections = last_record("main")["sections"]
+        for name, (section, calls) in fragments.items():
+            parts[name].append(sections[section] / calls)
+    return {"вся страница": statistics.median(page),
+            **{name: statistics.median(values) for name, values in parts.items()}}
+
+
+def new_app(ingredients):
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.session_state.temp_ingredients = ingredients
+    at.session_state.ingredients_by_uid = {ingredient["uid"]: ingredient for ingredient in ingredients}
+    return at.run()
+
+
+def bench(n_ingredients, repeat):
+    ingredients = make_ingredients(n_ingredients)
+    name_key = f"edit_name_{ingredients[0]['uid']}"
+
+    def edit_name(at, i):
+        at.text_input(key=name_key).input(f"правка {i}")
+
+    def next_page(at, i):
+        at.number_input(key="recipes_page").set_value(2 if i % 2 == 0 else 1)
+
+    edit = timed(new_app(ingredients), edit_name, {
+        "фрагмент строки": ("ingredient_row", n_ingredients),
+        "фрагмент редактора": ("ingredient_editor", 1),
+    }, repeat)
+    paging = timed(new_app(ingredients), next_page, {
+        "фрагмент списка": ("view_recipes_page", 1),
+    }, repeat)
+    return {
+        **{f"правка ингредиента: {name}": ms for name, ms in edit.items()},
+        **{f"смена страницы: {name}": ms for name, ms in paging.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка действий в интерфейсе: вся страница и работа фрагментов")
+    parser.add_argument("--ingredients", type=int, nargs="+", default=[5, 25, 100])
+    parser.add_argument("--recipes", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'рецептов':>9} {'ингр.':>6}  {'действие':<40} {'мс':>8}")
+    for n_recipes in args.recipes:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            st.cache_resource.clear()
+            store = open_store()
+            try:
+                seed_store(store, n_recipes)
+            finally:
+                store.close()
+            for n_ingredients in args.ingredients:
+                for name, ms in bench(n_ingredients, args.repeat).items():
+                    print(f"{n_recipes:>9} {n_ingredients:>6}  {name:<40} {ms:>8.1f}")
+            get_store().close()
+            st.cache_resource.clear()
+            os.chdir(ROOT)
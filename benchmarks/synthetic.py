@@ -0,0 +1,82 @@
+"""Синтетические рецепты для бенчмарков: заданное число рецептов, ингредиентов и шагов"""
+import os
+import random
+import sys
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingredients import CANONICAL_INGREDIENTS
+from recipe_schema import CATEGORIES, DIFFICULTIES, UNITS, make_ingredient
+
+VERBS = ["нарезать", "смешать", "обжарить", "отварить", "запечь", "посолить", "взбить", "натереть",
+         "потушить", "остудить", "добавить", "перемешать", "процедить", "выложить", "украсить"]
+TAILS = ["до готовности", "на среднем огне", "в глубокой миске", "под крышкой", "тонкими ломтиками",
+         "до золотистой корочки", "в духовке при 180 градусах", "и подавать"]
+PRODUCTS = [item[0] for item in CANONICAL_INGREDIENTS]
+
+
+def _count(value, rng):
+    return rng.randint(*value) if isinstance(value, tuple) else value
+
+
+def synthetic_recipe(rng, ingredients=(3, 12), steps=(3, 8), authors=50):
+    """Один рецепт в схеме формы; ingredients и steps - число или диапазон (от, до)"""
+    items = []
+    for name in rng.sample(PRODUCTS, min(_count(ingredients, rng), len(PRODUCTS))):
+        unit = rng.choice(UNITS)
+        amount = rng.choice([0.5, 1, 2, 3, 50, 100, 150, 200, 250, 500])
+        items.append(make_ingredient(name, amount, unit, rng.random() < 0.2))
+    instructions = [
+        f"{rng.choice(VERBS).capitalize()} {rng.choice(items)['name']} {rng.choice(TAILS)}"
+        for _ in range(_count(steps, rng))
+    ]
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "name": f"{rng.choice(VERBS).capitalize()} {rng.choice(PRODUCTS)} {rng.randint(1, 9999)}",
+        "author": f"Автор {rng.randint(1, authors)}",
+        "categories": [rng.choice(CATEGORIES)],
+        "difficulty": rng.choice(DIFFICULTIES),
+        "cooking_time": rng.choice([5, 10, 15, 20, 30, 45, 60, 90, 120]),
+        "servings": rng.randint(1, 8),
+        "ingredients": items,
+        "instructions": instructions,
+        "created_date": (date(2024, 1, 1) + timedelta(days=rng.randint(0, 700))).isoformat(),
+    }
+
+
+def synthetic_recipes(count, ingredients=(3, 12), steps=(3, 8), authors=50, seed=0):
+    """Детерминированный поток из count рецептов"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield synthetic_recipe(rng, ingredients, steps, authors)
+
+
+def seed_store(store, count, batch_size=1000, **options):
+    """Записываем в хранилище count синтетических рецептов пачками; возвращаем их ID"""
+    ids, batch = [], []
+    for recipe in synthetic_recipes(count, **options):
+        ids.append(recipe["id"])
+        batch.append(recipe)
+        if len(batch) >= batch_size:
+            store.add_many(batch)
+            batch = []
+    if batch:
+        store.add_many(batch)
+    return ids
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Синтетические рецепты в JSON Lines (для импорта и бенчмарков)")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--ingredients", type=int, nargs=2, default=(3, 12), metavar=("ОТ", "ДО"))
+    parser.add_argument("--steps", type=int, nargs=2, default=(3, 8), metavar=("ОТ", "ДО"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for recipe in synthetic_recipes(args.count, tuple(args.ingredients), tuple(args.steps), seed=args.seed):
+        print(json.dumps(recipe, ensure_ascii=False))
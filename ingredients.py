@@ -0,0 +1,213 @@
+"""Нормализация ингредиентов: словарь продуктов с синонимами и перевод единиц в граммы"""
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from recipe_schema import TO_TASTE, UNITS
+
+# Объем единиц измерения в мл ("г" и "шт" переводятся отдельно)
+UNIT_ML = {"мл": 1.0, "ст.л.": 15.0, "ч.л.": 5.0, "стакан": 250.0}
+
+# Продукт: (название, плотность г/мл, вес одной штуки в г, синонимы)
+# Плотность по умолчанию 1.0; вес штуки None - штуками продукт не меряют
+CANONICAL_INGREDIENTS = [
+    ("вода", 1.0, None, ["питьевая вода"]),
+    ("соль", 1.3, None, ["соль поваренная", "морская соль"]),
+    ("сахар", 0.85, None, ["сахарный песок", "сахар-песок"]),
+    ("сахарная пудра", 0.6, None, []),
+    ("мука пшеничная", 0.55, None, ["мука", "пшеничная мука"]),
+    ("крахмал", 0.65, None, ["картофельный крахмал", "кукурузный крахмал"]),
+    ("разрыхлитель", 0.9, None, ["разрыхлитель теста"]),
+    ("сода", 1.1, None, ["пищевая сода"]),
+    ("молоко", 1.03, None, []),
+    ("кефир", 1.03, None, []),
+    ("сметана", 1.0, None, []),
+    ("сливки", 1.0, None, []),
+    ("йогурт", 1.05, None, ["греческий йогурт"]),
+    ("творог", 0.65, None, []),
+    ("сыр", 0.45, None, ["твердый сыр", "тертый сыр"]),
+    ("масло сливочное", 0.95, None, ["сливочное масло"]),
+    ("масло растительное", 0.92, None, ["масло", "подсолнечное масло", "растительное масло"]),
+    ("масло оливковое", 0.92, None, ["оливковое масло"]),
+    ("яйцо куриное", 1.03, 55.0, ["яйцо", "яйца", "яиц", "куриное яйцо"]),
+    ("мед", 1.4, None, []),
+    ("куриная грудка", 1.0, 200.0, ["куриное филе", "филе куриной грудки", "грудка"]),
+    ("курица", 1.0, 1500.0, ["курицы", "кура"]),
+    ("говядина", 1.0, None, []),
+    ("свинина", 1.0, None, []),
+    ("фарш", 1.0, None, ["мясной фарш"]),
+    ("рыба", 1.0, None, ["филе рыбы"]),
+    ("лосось", 1.0, None, ["семга", "филе лосося"]),
+    ("рис", 0.85, None, []),
+    ("гречка", 0.8, None, ["гречневая крупа", "греча"]),
+    ("киноа", 0.75, None, []),
+    ("овсяные хлопья", 0.4, None, ["овсянка", "геркулес"]),
+    ("макароны", 0.6, None, ["паста", "спагетти"]),
+    ("картофель", 0.65, 150.0, ["картошка", "картофелина"]),
+    ("морковь", 0.55, 80.0, ["морковка"]),
+    ("лук репчатый", 0.6, 100.0, ["лук", "луковица"]),
+    ("лук зеленый", 0.2, 5.0, ["зеленый лук"]),
+    ("чеснок", 0.6, 5.0, ["зубчик чеснока"]),
+    ("помидор", 0.6, 120.0, ["томат", "помидоры черри"]),
+    ("огурец", 0.6, 100.0, []),
+    ("перец болгарский", 0.5, 150.0, ["сладкий перец", "болгарский перец"]),
+    ("капуста белокочанная", 0.4, 1500.0, ["капуста"]),
+    ("кабачок", 0.6, 300.0, ["цукини"]),
+    ("свекла", 0.6, 200.0, ["буряк"]),
+    ("шампиньоны", 0.45, 20.0, ["грибы", "шампиньон"]),
+    ("авокадо", 0.6, 200.0, []),
+    ("лимон", 0.6, 120.0, []),
+    ("лимонный сок", 1.03, None, ["сок лимона"]),
+    ("яблоко", 0.6, 180.0, []),
+    ("банан", 0.6, 120.0, []),
+    # Отдельные травы - разные продукты для списка покупок, но вес и КБЖУ у них как у зелени
+    ("зелень", 0.15, None, []),
+    ("укроп", 0.15, None, []),
+    ("петрушка", 0.15, None, []),
+    ("кинза", 0.15, None, []),
+    ("базилик", 0.15, None, []),
+    ("перец черный молотый", 0.5, None, ["черный перец", "перец молотый", "перец"]),
+    ("паприка", 0.45, None, []),
+    ("уксус", 1.01, None, []),
+    ("соевый соус", 1.1, None, ["соус соевый"]),
+    ("томатная паста", 1.1, None, []),
+    ("майонез", 0.95, None, []),
+    ("горчица", 1.05, None, []),
+    ("орехи грецкие", 0.45, None, ["грецкие орехи", "грецкий орех"]),
+    ("какао", 0.4, None, ["какао-порошок", "какао порошок"]),
+    ("шоколад", 1.0, None, ["темный шоколад", "горький шоколад"]),
+]
+
+# Окончания, которые отбрасываем при сравнении слов (самые длинные проверяются первыми)
+_ENDINGS = sorted([
+    "иями", "ями", "ами", "его", "ого", "ему", "ому", "ыми", "ими",
+    "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ую", "юю",
+    "ов", "ев", "ей", "ах", "ях", "ом", "ем", "ам", "ям",
+    "а", "я", "ы", "и", "у", "ю", "е", "о", "ь", "й",
+], key=len, reverse=True)
+_WORD = re.compile(r"[а-яa-z]+")
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """Грубая основа русского слова: отрезаем окончание, оставляя не меньше 3 букв"""
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def name_key(name):
+    """Набор основ слов названия (без скобок, цифр и порядка слов)"""
+    name = re.sub(r"\(.*?\)", " ", str(name).lower().replace("ё", "е"))
+    return frozenset(stem(word) for word in _WORD.findall(name))
+
+
+def _build_index():
+    names = [item[0] for item in CANONICAL_INGREDIENTS]
+    density = np.array([item[1] for item in CANONICAL_INGREDIENTS], dtype=np.float64)
+    piece_grams = np.array([np.nan if item[2] is None else item[2] for item in CANONICAL_INGREDIENTS],
+                           dtype=np.float64)
+    # Основа слова -> варианты названий (набор основ, код продукта), длинные варианты первыми
+    by_stem = {}
+    for code, (name, _, _, synonyms) in enumerate(CANONICAL_INGREDIENTS):
+        for variant in [name] + synonyms:
+            key = name_key(variant)
+            for word in key:
+                by_stem.setdefault(word, []).append((key, code))
+    for variants in by_stem.values():
+        variants.sort(key=lambda v: (-len(v[0]), v[1]))
+    return names, density, piece_grams, by_stem
+
+
+INGREDIENT_NAMES, DENSITY, PIECE_GRAMS, _BY_STEM = _build_index()
+
+
+@lru_cache(maxsize=65536)
+def match_ingredient(name):
+    """Код продукта из словаря для свободного названия или -1, если продукт не найден.
+
+    Берем самый длинный вариант, все слова которого есть в названии:
+    "филе куриной грудки без кожи" -> "куриная грудка".
+    """
+    key = name_key(name)
+    best = None
+    for word in key:
+        for variant, code in _BY_STEM.get(word, ()):
+            if variant <= key:
+                if best is None or (len(variant), -code) > (len(best[0]), -best[1]):
+                    best = (variant, code)
+                break
+    return -1 if best is None else best[1]
+
+
+def canonical_name(name):
+    """Название продукта из словаря или очищенное исходное название"""
+    code = match_ingredient(name)
+    return INGREDIENT_NAMES[code] if code >= 0 else " ".join(str(name).lower().split())
+
+
+def flatten_ingredients(recipes):
+    """Все ингредиенты коллекции одной таблицей: строка - ингредиент рецепта"""
+    rows = [
+        (recipe["id"], position, ing.get("name", ""), ing.get("amount"), ing.get("unit"),
+         bool(ing.get("needs_preparation", False)))
+        for recipe in recipes
+        for position, ing in enumerate(recipe.get("ingredients", []))
+    ]
+    return pd.DataFrame(rows, columns=["recipe_id", "position", "name", "amount", "unit", "needs_preparation"])
+
+
+def normalize_frame(frame):
+    """Добавляем к таблице ингредиентов продукт из словаря и вес в граммах.
+
+    Уникальные названия сопоставляются со словарем один раз (с кэшем),
+    а перевод единиц идет векторно по массивам плотностей и весов штук.
+    Колонки: ingredient, code (-1 - не найден), grams (NaN - не перевести), to_taste.
+    """
+    frame = frame.copy()
+    name_codes, unique_names = pd.factorize(frame["name"].fillna("").astype(str))
+    codes = np.array([match_ingredient(name) for name in unique_names], dtype=np.int32)[name_codes] \
+        if len(unique_names) else np.empty(0, dtype=np.int32)
+    known = codes >= 0
+
+    canonical = np.array([canonical_name(name) for name in unique_names], dtype=object)
+    frame["ingredient"] = canonical[name_codes] if len(unique_names) else []
+    frame["code"] = codes
+
+    amount = pd.to_numeric(frame["amount"], errors="coerce").to_numpy(dtype=np.float64)
+    unit = frame["unit"].to_numpy(dtype=object)
+    density = np.where(known, DENSITY[np.where(known, codes, 0)], 1.0)
+    piece = np.where(known, PIECE_GRAMS[np.where(known, codes, 0)], np.nan)
+    unit_ml = pd.Series(unit).map(UNIT_ML).to_numpy(dtype=np.float64)
+
+    grams = np.full(len(frame), np.nan)
+    is_gram = unit == "г"
+    grams[is_gram] = amount[is_gram]
+    is_volume = ~np.isnan(unit_ml)
+    grams[is_volume] = amount[is_volume] * unit_ml[is_volume] * density[is_volume]
+    is_piece = unit == "шт"
+    grams[is_piece] = amount[is_piece] * piece[is_piece]
+
+    frame["grams"] = grams
+    frame["to_taste"] = unit == TO_TASTE
+    return frame
+
+
+def normalize_collection(recipes):
+    """Нормализованная таблица ингредиентов для списка рецептов за один проход"""
+    return normalize_frame(flatten_ingredients(recipes))
+
+
+def to_grams(name, amount, unit):
+    """Вес одного ингредиента в граммах или None (по вкусу, неизвестный вес штуки)"""
+    if unit == TO_TASTE or unit not in UNITS:
+        return None
+    frame = normalize_frame(pd.DataFrame(
+        [("", 0, name, amount, unit, False)],
+        columns=["recipe_id", "position", "name", "amount", "unit", "needs_preparation"],
+    ))
+    grams = frame["grams"].iloc[0]
+    return None if np.isnan(grams) else float(grams)
@@ -0,0 +1,116 @@
+"""Замер времени разделов страницы на каждом перезапуске (включается переменной RECIPES_PROFILE).
+
+    RECIPES_PROFILE=1 streamlit run add_recipe.py              # строки в stderr
+    RECIPES_PROFILE=profile.jsonl streamlit run add_recipe.py  # строки JSON в файл
+    python instrumentation.py profile.jsonl                    # перцентили по разделам
+
+Каждый перезапуск (весь скрипт или отдельный фрагмент) дает одну запись:
+общее время внешнего раздела и суммарное время вложенных. Без переменной
+декоратор profiled возвращает функцию как есть - накладных расходов нет.
+"""
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_ENV = 'RECIPES_PROFILE'
+TARGET = os.environ.get(PROFILE_ENV, '')
+ENABLED = bool(TARGET) and TARGET != '0'
+
+logger = logging.getLogger('recipes.profile')
+# Скрипт каждой сессии Streamlit выполняется в своем потоке
+_state = threading.local()
+
+
+def _setup_logger():
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr) if TARGET in ('1', 'stderr') \
+        else logging.FileHandler(TARGET, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+if ENABLED:
+    _setup_logger()
+
+
+@contextmanager
+def section(name):
+    """Замеряем блок; внешний раздел перезапуска пишет запись со всеми вложенными"""
+    if not ENABLED:
+        yield
+        return
+    stack = getattr(_state, 'stack', None)
+    outer = not stack
+    if outer:
+        stack = _state.stack = []
+        _state.sections = {}
+    stack.append(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        stack.pop()
+        if outer:
+            record = {"time": round(time.time(), 3), "section": name, "ms": round(elapsed, 2),
+                      "sections": {key: round(value, 2) for key, value in _state.sections.items()}}
+            _state.stack = None
+            logger.info(json.dumps(record, ensure_ascii=False))
+        else:
+            # Один раздел может вызываться много раз за перезапуск (например, рецепты списка)
+            _state.sections[name] = _state.sections.get(name, 0.0) + elapsed
+
+
+def profiled(name=None):
+    """Декоратор: функция - раздел страницы. Ставится под @st.fragment, чтобы
+    перезапуск одного фрагмента тоже попадал в журнал"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with section(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def summarize(path):
+    """Перцентили времени по разделам из журнала: {раздел: (вызовов, p50, p95, p99, max)}"""
+    import numpy as np
+
+    samples = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            samples.setdefault(record["section"], []).append(record["ms"])
+            for key, value in record["sections"].items():
+                samples.setdefault(f"{record['section']} / {key}", []).append(value)
+    return {
+        key: (len(values), *np.percentile(values, [50, 95, 99]).tolist(), max(values))
+        for key, values in sorted(samples.items())
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Перцентили времени разделов по журналу RECIPES_PROFILE")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    print(f"{'раздел':<50} {'раз':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for key, (count, p50, p95, p99, worst) in summarize(args.path).items():
+        print(f"{key:<50} {count:>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {worst:>9.1f}")
@@ -0,0 +1,135 @@
+"""Меню на неделю и сводный список покупок по выбранным рецептам"""
+import random
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from ingredients import normalize_collection
+from nutrition import recipe_servings
+from recipe_columns import RecipeTable
+from recipe_schema import DIFFICULTIES
+
+ITEM_COLUMNS = ["ingredient", "unit", "amount", "grams", "recipes"]
+PREP_COLUMNS = ["recipe_id", "position", "recipe", "ingredient", "amount", "unit"]
+
+
+@dataclass
+class ShoppingList:
+    """Список покупок: продукты с суммарным количеством, продукты "по вкусу" и что подготовить заранее"""
+    items: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=ITEM_COLUMNS))
+    to_taste: list = field(default_factory=list)
+    prep: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=PREP_COLUMNS))
+
+    def as_text(self):
+        """Список покупок обычным текстом - для скачивания"""
+        lines = [f"- {row.ingredient}: {row.amount:g} {row.unit}" for row in self.items.itertuples()]
+        if self.to_taste:
+            lines.append(f"- по вкусу: {', '.join(self.to_taste)}")
+        if len(self.prep):
+            lines.append("")
+            lines.append("Подготовить заранее:")
+            lines.extend(f"- {row.ingredient} ({row.recipe})" for row in self.prep.itertuples())
+        return "\n".join(lines)
+
+
+def rollup(selections):
+    """Списки покупок для нескольких планов (например, меню разных пользователей) за один проход.
+
+    selections - (план, рецепт, порций); порций None - как в рецепте. Все
+    ингредиенты сводятся в одну таблицу, количества масштабируются на порции
+    и суммируются одной группировкой по (план, продукт, единица). Продукты из
+    словаря объединяются по каноническому названию, поэтому "яйца" и "яйцо"
+    попадают в одну строку.
+
+    Возвращает три таблицы с колонкой plan: продукты (ITEM_COLUMNS),
+    продукты "по вкусу" (plan, ingredient) и что подготовить (PREP_COLUMNS;
+    position - номер ингредиента в рецепте).
+    """
+    recipes, rows = {}, []
+    for plan, recipe, servings in selections:
+        recipes[recipe["id"]] = recipe
+        rows.append((plan, recipe["id"], (servings or recipe_servings(recipe)) / recipe_servings(recipe)))
+    if not rows:
+        return (pd.DataFrame(columns=["plan"] + ITEM_COLUMNS), pd.DataFrame(columns=["plan", "ingredient"]),
+                pd.DataFrame(columns=["plan"] + PREP_COLUMNS))
+    # Один рецепт в плане несколько раз - множители складываются
+    chosen = pd.DataFrame(rows, columns=["plan", "recipe_id", "factor"]) \
+        .groupby(["plan", "recipe_id"], as_index=False, sort=False)["factor"].sum()
+
+    frame = normalize_collection(recipes.values()).merge(chosen, on="recipe_id")
+    frame["amount"] = (pd.to_numeric(frame["amount"], errors="coerce") * frame["factor"]).round(2)
+    frame["grams"] = frame["grams"] * frame["factor"]
+    frame["recipe"] = frame["recipe_id"].map({recipe_id: r.get("name", "") for recipe_id, r in recipes.items()})
+
+    to_taste = frame["to_taste"].to_numpy()
+    measured = frame[~to_taste]
+    items = measured.groupby(["plan", "ingredient", "unit"], as_index=False).agg(
+        amount=("amount", "sum"), grams=("grams", "sum"), known=("grams", "count"),
+        recipes=("recipe_id", "nunique"),
+    )
+    # Вес неизвестен (штуки без веса, неизвестная единица) - оставляем пустым, а не 0
+    items["grams"] = items["grams"].where(items["known"] > 0).round(1)
+    items["amount"] = items["amount"].round(2)
+    seasonings = frame.loc[to_taste, ["plan", "ingredient"]].drop_duplicates().sort_values(["plan", "ingredient"])
+    # Подготовить бывает и продукт "по вкусу" - количество у него, как в форме, прочерк
+    prep = frame[frame["needs_preparation"].to_numpy()].sort_values(["plan", "recipe", "position"])
+    prep = prep.assign(amount=prep["amount"].astype(object).where(~prep["to_taste"], "-"))[["plan"] + PREP_COLUMNS]
+    return items[["plan"] + ITEM_COLUMNS], seasonings.reset_index(drop=True), prep.reset_index(drop=True)
+
+
+def shopping_list(selection):
+    """Список покупок для выбора [(рецепт, порций)]"""
+    items, seasonings, prep = rollup(("", recipe, servings) for recipe, servings in selection)
+    return ShoppingList(
+        items=items[ITEM_COLUMNS].reset_index(drop=True),
+        to_taste=seasonings["ingredient"].tolist(),
+        prep=prep[PREP_COLUMNS].reset_index(drop=True),
+    )
+
+
+def plan_week(recipes, days=7, meals_per_day=2, daily_time=90, max_difficulty=None, seed=0):
+    """Жадное меню: каждый день берем блюда по очереди, пока укладываемся во время.
+
+    Рецепты перемешиваются (seed - для другого варианта меню), сложнее
+    max_difficulty и дольше daily_time минут не берутся. Сначала каждый рецепт
+    берется по разу, повторы - когда неиспользованные не помещаются в день.
+    Возвращает список дней - списков рецептов.
+    """
+    allowed = DIFFICULTIES[:DIFFICULTIES.index(max_difficulty) + 1] if max_difficulty else DIFFICULTIES
+    if isinstance(recipes, RecipeTable):
+        # Снимок хранилища: отбираем по колонкам и собираем словари только подходящих рецептов
+        rows = recipes.mask(max_cooking_time=daily_time) & np.logical_or.reduce(
+            [recipes.mask(difficulty=difficulty) for difficulty in allowed])
+        recipes = [recipes[row] for row in np.flatnonzero(rows)]
+    pool = [
+        recipe for recipe in recipes
+        if recipe.get("difficulty") in allowed
+        and isinstance(recipe.get("cooking_time"), int) and 0 < recipe["cooking_time"] <= daily_time
+    ]
+    random.Random(seed).shuffle(pool)
+    times = np.array([recipe["cooking_time"] for recipe in pool], dtype=np.int64)
+    used = np.zeros(len(pool), dtype=bool)
+
+    plan = []
+    for _ in range(days):
+        day, remaining = [], daily_time
+        today = np.zeros(len(pool), dtype=bool)
+        for _ in range(meals_per_day):
+            fits = (times <= remaining) & ~today
+            candidates = np.flatnonzero(fits & ~used)
+            if not len(candidates):
+                candidates = np.flatnonzero(fits)
+            if not len(candidates):
+                break
+            i = candidates[0]
+            used[i] = today[i] = True
+            remaining -= times[i]
+            day.append(pool[i])
+        plan.append(day)
+    return plan
+
+
+def plan_selection(plan, servings=None):
+    """Выбор для списка покупок по меню: каждое блюдо меню - servings порций"""
+    return [(recipe, servings) for day in plan for recipe in day]
@@ -0,0 +1,106 @@
+"""КБЖУ рецептов по таблице пищевой ценности продуктов (на 100 г)"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ingredients import match_ingredient, normalize_collection
+
+NUTRIENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nutrients.csv')
+NUTRIENTS = ["calories", "protein", "fat", "carbs"]
+NUTRIENT_LABELS = {"calories": "ккал", "protein": "белки", "fat": "жиры", "carbs": "углеводы"}
+
+
+def load_nutrient_table(path=NUTRIENTS_PATH):
+    """Таблица КБЖУ на 100 г с колонкой code - кодом продукта из словаря ингредиентов"""
+    table = pd.read_csv(path)
+    table["code"] = [match_ingredient(name) for name in table["ingredient"]]
+    unknown = table.loc[table["code"] < 0, "ingredient"].tolist()
+    if unknown:
+        raise ValueError(f"Продукты из таблицы КБЖУ не найдены в словаре: {', '.join(unknown)}")
+    return table.drop_duplicates("code")[["code"] + NUTRIENTS]
+
+
+def recipe_servings(recipe):
+    """Число порций; в рецептах без поля servings считаем одну порцию"""
+    servings = recipe.get("servings")
+    return servings if isinstance(servings, int) and servings > 0 else 1
+
+
+def ingredients_hash(recipe):
+    """Хэш того, от чего зависит КБЖУ - списка ингредиентов"""
+    payload = json.dumps(recipe.get("ingredients", []), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class NutritionCalculator:
+    """Расчет КБЖУ для коллекции рецептов.
+
+    Все ингредиенты нужных рецептов сводятся в одну таблицу, соединяются с
+    таблицей КБЖУ и суммируются группировкой по рецепту. Результат кэшируется
+    по хэшу ингредиентов, поэтому неизменившиеся рецепты повторно не считаются.
+    """
+
+    def __init__(self, table=None):
+        self.table = load_nutrient_table() if table is None else table
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _compute_totals(self, recipes):
+        """Суммы КБЖУ и число неучтенных ингредиентов по рецептам (один join + groupby)"""
+        frame = normalize_collection(recipes)
+        frame = frame.merge(self.table, on="code", how="left")
+        values = frame[NUTRIENTS].to_numpy() * (frame["grams"].to_numpy()[:, None] / 100.0)
+        # Неучтенные: не знаем вес или продукта нет в таблице; "по вкусу" не считаем вовсе
+        counted = ~np.isnan(values).any(axis=1)
+        frame[NUTRIENTS] = np.where(counted[:, None], values, 0.0)
+        frame["uncounted"] = ~counted & ~frame["to_taste"].to_numpy()
+        return frame.groupby("recipe_id")[NUTRIENTS + ["uncounted"]].sum()
+
+    def compute(self, recipes):
+        """КБЖУ всего рецепта и на порцию; строки - id рецептов в исходном порядке"""
+        recipes = list(recipes)
+        hashes = [ingredients_hash(recipe) for recipe in recipes]
+        with self._lock:
+            missing = {h: recipe for h, recipe in zip(hashes, recipes) if h not in self._cache}
+        if missing:
+            # Считаем по хэшу, чтобы одинаковые списки ингредиентов шли один раз
+            totals = self._compute_totals(
+                [dict(recipe, id=h) for h, recipe in missing.items()]
+            )
+            totals = totals.reindex(list(missing), fill_value=0)
+            computed = {h: (tuple(values), int(uncounted)) for h, values, uncounted in zip(
+                totals.index, totals[NUTRIENTS].to_numpy().tolist(), totals["uncounted"].to_numpy())}
+            with self._lock:
+                self._cache.update(computed)
+
+        rows = []
+        for recipe, h in zip(recipes, hashes):
+            values, uncounted = self._cache[h]
+            servings = recipe_servings(recipe)
+            row = dict(zip(NUTRIENTS, values))
+            row.update({f"portion_{key}": value / servings for key, value in zip(NUTRIENTS, values)})
+            row["servings"] = servings
+            row["uncounted"] = uncounted
+            rows.append(row)
+        return pd.DataFrame(rows, index=pd.Index([recipe["id"] for recipe in recipes], name="recipe_id"))
+
+    def for_recipe(self, recipe):
+        """КБЖУ одного рецепта словарем (округлено до 0.1)"""
+        row = self.compute([recipe]).iloc[0]
+        return {key: (round(float(value), 1) if key not in ("servings", "uncounted") else int(value))
+                for key, value in row.items()}
+
+    def annotate(self, recipes):
+        """Копии рецептов с полем nutrition - для выгрузки"""
+        recipes = list(recipes)
+        rows = self.compute(recipes).round(1).to_dict("records")
+        return [dict(recipe, nutrition=row) for recipe, row in zip(recipes, rows)]
+
+
+def format_nutrition(values, prefix=""):
+    """Строка вида "ккал 250 · белки 12 · жиры 8 · углеводы 30"; prefix="portion_" - на порцию"""
+    return " · ".join(f"{NUTRIENT_LABELS[key]} {values[prefix + key]:.0f}" for key in NUTRIENTS)
@@ -0,0 +1,290 @@
+"""HTTP API рецептов на asyncio без сторонних библиотек.
+
+    GET    /recipes?offset=&limit=&author=&category=&difficulty=&max_cooking_time=
+    GET    /recipes/<id>
+    POST   /recipes            (JSON рецепта, как в форме)
+    DELETE /recipes/<id>
+    GET    /search?q=&pantry=яйца,мука&offset=&limit=  (+ те же фильтры)
+    GET    /facets
+
+В ответе /search с pantry поле missing - каких продуктов не хватает
+рецептам страницы ({id: [продукты]}, пустой список - все есть).
+
+Работает поверх того же хранилища, что и Streamlit-приложение (RECIPES_BACKEND,
+RECIPES_DB); JSON-журнал - только там, где есть блокировка файлов (fcntl).
+Ответы на чтение кэшируются до изменения данных и отдаются с ETag; запрос
+с совпадающим If-None-Match получает 304 без тела. Сами запросы выполняются
+в пуле потоков, чтобы долгий поиск или запись не останавливали цикл событий.
+
+    python recipe_api.py --port 8502
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from recipe_core import RecipeError, RecipeNotFound, RecipeService, ValidationError
+
+HOST = '127.0.0.1'
+PORT = 8502
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_BODY = 1024 * 1024
+# Сколько разных ответов на чтение держим в кэше одной версии данных
+MAX_CACHED_RESPONSES = 4096
+
+REASONS = {
+    200: "OK", 201: "Created", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors
+
+
+def _int_param(params, name, default=None, minimum=0, maximum=None):
+    value = params.get(name, [None])[0]
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HTTPError(400, f"Параметр {name} должен быть целым числом")
+    if value < minimum:
+        raise HTTPError(400, f"Параметр {name} должен быть не меньше {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _filters(params):
+    return {
+        "author": params.get("author", [None])[0] or None,
+        "category": params.get("category", [None])[0] or None,
+        "difficulty": params.get("difficulty", [None])[0] or None,
+        "max_cooking_time": _int_param(params, "max_cooking_time", minimum=1),
+    }
+
+
+def _page(params):
+    return _int_param(params, "offset", 0), _int_param(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT)
+
+
+def _content_length(headers):
+    """Длина тела запроса: 400 - заголовок не число (или отрицательный), 413 - больше MAX_BODY"""
+    value = headers.get("content-length", "")
+    if not value:
+        return 0
+    if not (value.isascii() and value.isdigit()):
+        raise HTTPError(400, "Некорректный заголовок Content-Length")
+    length = int(value)
+    if length > MAX_BODY:
+        raise HTTPError(413, f"Слишком большой запрос (больше {MAX_BODY} байт)")
+    return length
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _json(data):
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class RecipeAPI:
+    """Маршрутизация запросов к RecipeService и кэш готовых ответов на чтение"""
+
+    def __init__(self, service=None):
+        self.service = RecipeService() if service is None else service
+        self._responses = {}
+        self._responses_version = None
+        self._responses_lock = threading.Lock()
+
+    # --- Кэш ответов ---
+
+    def _cached(self, target, build):
+        """(ETag, тело) ответа на GET; пересобирается только после изменения данных"""
+        store = self.service.store
+        # Данные могли поменять другие процессы (например, Streamlit-приложение)
+        store.refresh()
+        version = store.version
+        with self._responses_lock:
+            if self._responses_version != version or len(self._responses) >= MAX_CACHED_RESPONSES:
+                self._responses = {}
+                self._responses_version = version
+            response = self._responses.get(target)
+        if response is None:
+            # Собираем без блокировки; ответ, собранный до смены версии, в новый кэш не кладем
+            body = _json(build())
+            response = (f'"{hashlib.sha1(body).hexdigest()[:20]}"', body)
+            with self._responses_lock:
+                if self._responses_version == version:
+                    self._responses[target] = response
+        return response
+
+    # --- Маршруты ---
+
+    def dispatch(self, method, target, headers, body):
+        """Обработка запроса: (статус, тело, дополнительные заголовки)"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        params = parse_qs(url.query)
+
+        if parts == ["recipes"] and method == "POST":
+            try:
+                data = json.loads(body.decode('utf-8') or "null")
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise HTTPError(400, f"Некорректный JSON: {e}")
+            recipe = self.service.create(data)
+            return 201, _json(recipe), {"Location": f"/recipes/{recipe['id']}"}
+        if len(parts) == 2 and parts[0] == "recipes" and method == "DELETE":
+            return 200, _json(self.service.delete(parts[1])), {}
+
+        if method != "GET":
+            raise HTTPError(405, "Метод не поддерживается")
+        if parts == ["recipes"]:
+            offset, limit = _page(params)
+            filters = _filters(params)
+
+            def build():
+                total, items = self.service.list(offset, limit, **filters)
+                return {"total": total, "offset": offset, "limit": limit, "items": items}
+        elif len(parts) == 2 and parts[0] == "recipes":
+            # 404 не кэшируем - проверяем до сборки ответа
+            recipe = self.service.get(parts[1])
+
+            def build():
+                return recipe
+        elif parts == ["search"]:
+            offset, limit = _page(params)
+            filters = _filters(params)
+            query = params.get("q", [""])[0]
+            pantry = [p.strip() for p in params.get("pantry", [""])[0].split(",") if p.strip()]
+
+            def build():
+                total, items, missing = self.service.search(query, pantry, offset, limit, **filters)
+                return {"total": total, "offset": offset, "limit": limit, "items": items, "missing": missing}
+        elif parts == ["facets"]:
+            build = self.service.facets
+        else:
+            raise HTTPError(404, "Неизвестный адрес")
+
+        etag, payload = self._cached(target, build)
+        if _etag_matches(headers.get("if-none-match"), etag):
+            return 304, b"", {"ETag": etag}
+        return 200, payload, {"ETag": etag, "Cache-Control": "no-cache"}
+
+    def respond(self, method, target, headers, body):
+        try:
+            return self.dispatch(method, target, headers, body)
+        except HTTPError as e:
+            payload = {"error": str(e)}
+            if e.errors:
+                payload["errors"] = e.errors
+            return e.status, _json(payload), {}
+        except ValidationError as e:
+            return 422, _json({"error": "Рецепт не прошел проверку", "errors": e.errors}), {}
+        except RecipeNotFound as e:
+            return 404, _json({"error": str(e)}), {}
+        except RecipeError as e:
+            return 400, _json({"error": str(e)}), {}
+        except Exception as e:
+            return 500, _json({"error": f"Внутренняя ошибка: {e}"}), {}
+
+    # --- HTTP/1.1 ---
+
+    async def handle_connection(self, reader, writer):
+        """Запросы одного соединения по очереди (keep-alive)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._write(writer, 400, _json({"error": "Некорректный запрос"}), {}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1" \
+                    or headers.get("connection", "").lower() == "keep-alive"
+                try:
+                    length = _content_length(headers)
+                except HTTPError as e:
+                    # Тело не прочитать - соединение дальше не разобрать, закрываем
+                    await self._write(writer, e.status, _json({"error": str(e)}), {}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload, extra = await asyncio.to_thread(self.respond, method.upper(), target, headers, body)
+                await self._write(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write(writer, status, payload, extra, keep_alive):
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        if status != 304:
+            head.append("Content-Type: application/json; charset=utf-8")
+        head.append(f"Content-Length: {len(payload)}")
+        head.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        head.extend(f"{name}: {value}" for name, value in extra.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + payload)
+        await writer.drain()
+
+
+async def serve(host=HOST, port=PORT, service=None):
+    """Запускаем сервер; возвращает asyncio.Server"""
+    api = RecipeAPI(service)
+    return await asyncio.start_server(api.handle_connection, host, port)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from recipe_storage import open_store
+
+    parser = argparse.ArgumentParser(description="HTTP API рецептов")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--backend", choices=["json", "sqlite"], help="по умолчанию RECIPES_BACKEND или json")
+    args = parser.parse_args()
+
+    store = open_store(args.backend)
+    if not getattr(store, 'SHARED_SAFE', True):
+        # API пишет в тот же журнал, что и приложение, - без блокировки файла записи потеряются
+        store.close()
+        parser.error("JSON-журнал нельзя делить с приложением на этой платформе (нет fcntl) - "
+                     "запустите с --backend sqlite")
+
+    async def main():
+        server = await serve(args.host, args.port, RecipeService(store))
+        print(f"API рецептов: http://{args.host}:{args.port}/recipes")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            store.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
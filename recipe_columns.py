@@ -0,0 +1,434 @@
+"""Компактное представление коллекции рецептов в памяти: колонки вместо словарей.
+
+Повторяющиеся строки (автор, сложность, категории, продукты, единицы, даты)
+хранятся кодами словаря значений, числа - массивами numpy, ID, названия и
+шаги - одним буфером UTF-8 со смещениями. Вложенные списки (категории,
+ингредиенты, шаги) лежат подряд, границы рецептов - в массиве смещений.
+
+Словарь рецепта собирается по строке таблицы только когда он нужен (страница
+списка, выгрузка) и совпадает с исходным вплоть до порядка ключей. Рецепты,
+которые не укладываются в колонки (неизвестные поля, другие типы значений),
+хранятся как есть - по ним работают те же фильтры.
+"""
+import copy
+
+import numpy as np
+
+from recipe_schema import recipe_categories
+
+RECIPE_KEYS = frozenset(("id", "name", "author", "categories", "difficulty", "cooking_time", "servings",
+                         "ingredients", "instructions", "created_date"))
+INGREDIENT_KEYS = frozenset(("name", "amount", "unit", "needs_preparation"))
+# Количество "по вкусу" (см. make_ingredient)
+NO_AMOUNT = "-"
+AMOUNT_INT, AMOUNT_FLOAT, AMOUNT_NONE = 0, 1, 2
+# Целые до 2^53 хранятся во float64 без потерь
+MAX_EXACT_INT = 2 ** 53
+MAX_INT32 = 2 ** 31 - 1
+
+# Колонки по уровням: строка рецепта, категория, ингредиент, шаг (str - строки в буфере)
+LEVELS = {
+    "recipe": {"layout": np.int32, "hash": np.int64, "id": str, "name": str, "author": np.int32,
+               "difficulty": np.int32, "cooking_time": np.float64, "servings": np.int32, "created": np.int32},
+    "category": {"category": np.int32},
+    "ingredient": {"ingredient_layout": np.int32, "ingredient": np.int32, "amount": np.float64,
+                   "amount_kind": np.int8, "unit": np.int32, "prep": np.bool_},
+    "step": {"step": str},
+}
+NESTED = ("category", "ingredient", "step")
+# Колонки с кодами словаря; layout - порядок ключей рецепта или ингредиента
+CATEGORICAL = ("layout", "author", "difficulty", "created", "category", "ingredient_layout", "ingredient", "unit")
+
+
+class Vocabulary:
+    """Значения категориальной колонки и их коды"""
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def add(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def code(self, value):
+        """Код значения; -1 - такого значения в колонке нет"""
+        try:
+            return self._codes.get(value, -1)
+        except TypeError:
+            return -1
+
+
+class StringColumn:
+    """Строки одним буфером UTF-8 и массивом смещений"""
+    __slots__ = ("buffer", "offsets")
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        # surrogatepass - одиночные суррогаты из JSON тоже переживают кодирование
+        encoded = [s.encode('utf-8', 'surrogatepass') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        return cls(b"".join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].decode('utf-8', 'surrogatepass')
+
+    def slice(self, start, end):
+        """Строки start..end подряд - одним декодированием смещений"""
+        bounds = self.offsets[start:end + 1].tolist()
+        return [self.buffer[a:b].decode('utf-8', 'surrogatepass') for a, b in zip(bounds, bounds[1:])]
+
+    def take(self, rows):
+        starts, ends = self.offsets[rows], self.offsets[rows + 1]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=offsets[1:])
+        if not len(rows):
+            return StringColumn(b"", offsets)
+        # Подряд идущие строки копируем одним куском
+        breaks = np.flatnonzero(rows[1:] != rows[:-1] + 1) + 1
+        first = np.concatenate(([0], breaks))
+        last = np.concatenate((breaks, [len(rows)])) - 1
+        buffer = b"".join(self.buffer[a:b] for a, b in zip(starts[first].tolist(), ends[last].tolist()))
+        return StringColumn(buffer, offsets)
+
+    @staticmethod
+    def concat(columns):
+        return StringColumn(b"".join(c.buffer for c in columns),
+                            _concat_offsets([c.offsets for c in columns]))
+
+    @property
+    def nbytes(self):
+        return len(self.buffer) + self.offsets.nbytes
+
+
+def _concat_offsets(parts):
+    shifted, total = [], 0
+    for offsets in parts:
+        shifted.append(offsets[:-1] + total)
+        total += int(offsets[-1])
+    return np.concatenate(shifted + [np.array([total], dtype=np.int64)])
+
+
+def _gather(offsets, rows):
+    """Индексы вложенных элементов строк rows и смещения для них"""
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    index = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1], dtype=np.int64)
+    return index, new_offsets
+
+
+def _take(column, index):
+    return column[index] if isinstance(column, np.ndarray) else column.take(index)
+
+
+# Проверки по точному типу: подклассы (и bool вместо int) хранятся как есть
+def _is_int(value, limit):
+    return type(value) is int and -limit <= value <= limit
+
+
+def _is_str_list(value):
+    return type(value) is list and all(type(item) is str for item in value)
+
+
+def _fits_ingredient(ing):
+    if type(ing) is not dict or not ing.keys() <= INGREDIENT_KEYS:
+        return False
+    amount = ing.get("amount", 0)
+    return (type(ing.get("name", "")) is str and type(ing.get("unit", "")) is str
+            and type(ing.get("needs_preparation", False)) is bool
+            and (_is_int(amount, MAX_EXACT_INT) or type(amount) is float or amount == NO_AMOUNT))
+
+
+def _fits(recipe):
+    """Укладывается ли рецепт в колонки без потерь"""
+    if not recipe.keys() <= RECIPE_KEYS:
+        return False
+    if not all(type(recipe.get(key, "")) is str for key in ("id", "name", "author", "difficulty", "created_date")):
+        return False
+    if not (_is_int(recipe.get("cooking_time", 0), MAX_EXACT_INT) and _is_int(recipe.get("servings", 0), MAX_INT32)):
+        return False
+    if not (_is_str_list(recipe.get("categories", [])) and _is_str_list(recipe.get("instructions", []))):
+        return False
+    ingredients = recipe.get("ingredients", [])
+    return type(ingredients) is list and all(_fits_ingredient(ing) for ing in ingredients)
+
+
+class RecipeTable:
+    """Неизменяемая таблица рецептов: последовательность словарей рецептов
+    (len, индексы, срезы, перебор) и векторные фильтры по колонкам"""
+
+    def __init__(self, columns, offsets, vocab, raw):
+        self.columns = columns      # имя колонки -> массив numpy или StringColumn
+        self.offsets = offsets      # вложенный уровень -> границы рецептов
+        self.vocab = vocab          # категориальная колонка -> Vocabulary
+        self._raw = raw             # строка -> рецепт, не уложившийся в колонки
+        self._sorted_hashes = None
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        """Таблица из словарей рецептов (в порядке перебора)"""
+        vocab = {name: Vocabulary() for name in CATEGORICAL}
+        data = {name: [] for level in LEVELS.values() for name in level}
+        counts = {level: [] for level in NESTED}
+        raw = {}
+        add = {name: vocab[name].add for name in CATEGORICAL}
+
+        for row, recipe in enumerate(recipes):
+            fits = _fits(recipe)
+            recipe_id = recipe.get("id", "")
+            recipe_id = recipe_id if isinstance(recipe_id, str) else str(recipe_id)
+            author, difficulty = recipe.get("author"), recipe.get("difficulty")
+            cooking_time = recipe.get("cooking_time", 0)
+            data["hash"].append(hash(recipe_id))
+            data["id"].append(recipe_id)
+            data["author"].append(add["author"](author) if isinstance(author, str) else -1)
+            data["difficulty"].append(add["difficulty"](difficulty) if isinstance(difficulty, str) else -1)
+            data["cooking_time"].append(float(cooking_time) if isinstance(cooking_time, (int, float)) else np.nan)
+            # Категории нужны фильтрам и у рецептов, хранящихся как есть
+            categories = [add["category"](c) for c in recipe_categories(recipe) if isinstance(c, str)]
+            data["category"].extend(categories)
+            counts["category"].append(len(categories))
+            if not fits:
+                raw[row] = recipe
+                data["layout"].append(-1)
+                data["name"].append("")
+                data["servings"].append(0)
+                data["created"].append(-1)
+                counts["ingredient"].append(0)
+                counts["step"].append(0)
+                continue
+
+            data["layout"].append(add["layout"](tuple(recipe)))
+            data["name"].append(recipe.get("name", ""))
+            data["servings"].append(recipe.get("servings", 0))
+            data["created"].append(add["created"](recipe["created_date"]) if "created_date" in recipe else -1)
+            ingredients = recipe.get("ingredients", [])
+            for ing in ingredients:
+                amount = ing.get("amount", 0)
+                data["ingredient_layout"].append(add["ingredient_layout"](tuple(ing)))
+                data["ingredient"].append(add["ingredient"](ing.get("name", "")))
+                data["unit"].append(add["unit"](ing.get("unit", "")))
+                data["prep"].append(ing.get("needs_preparation", False))
+                if amount == NO_AMOUNT:
+                    data["amount"].append(np.nan)
+                    data["amount_kind"].append(AMOUNT_NONE)
+                else:
+                    data["amount"].append(amount)
+                    data["amount_kind"].append(AMOUNT_FLOAT if isinstance(amount, float) else AMOUNT_INT)
+            counts["ingredient"].append(len(ingredients))
+            steps = recipe.get("instructions", [])
+            data["step"].extend(steps)
+            counts["step"].append(len(steps))
+
+        columns = {}
+        for level in LEVELS.values():
+            for name, dtype in level.items():
+                columns[name] = (StringColumn.from_strings(data[name]) if dtype is str
+                                 else np.array(data[name], dtype=dtype))
+        offsets = {}
+        for level in NESTED:
+            offsets[level] = np.zeros(len(counts[level]) + 1, dtype=np.int64)
+            np.cumsum(counts[level], out=offsets[level][1:])
+        return cls(columns, offsets, vocab, raw)
+
+    # --- Последовательность рецептов ---
+
+    def __len__(self):
+        return len(self.columns["hash"])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.recipe(row)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self.recipe(i) for i in range(*row.indices(len(self)))]
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("Нет такой строки в таблице рецептов")
+        return self.recipe(row)
+
+    def recipe_id(self, row):
+        return self.columns["id"][row]
+
+    def recipe(self, row):
+        """Словарь рецепта в формате схемы (новый объект на каждый вызов)"""
+        if row in self._raw:
+            return copy.deepcopy(self._raw[row])
+        columns, vocab = self.columns, self.vocab
+        recipe = {}
+        for key in vocab["layout"].values[columns["layout"][row]]:
+            if key == "id":
+                recipe[key] = columns["id"][row]
+            elif key == "name":
+                recipe[key] = columns["name"][row]
+            elif key == "author":
+                recipe[key] = vocab["author"].values[columns["author"][row]]
+            elif key == "difficulty":
+                recipe[key] = vocab["difficulty"].values[columns["difficulty"][row]]
+            elif key == "cooking_time":
+                recipe[key] = int(columns["cooking_time"][row])
+            elif key == "servings":
+                recipe[key] = int(columns["servings"][row])
+            elif key == "created_date":
+                recipe[key] = vocab["created"].values[columns["created"][row]]
+            elif key == "categories":
+                start, end = self.offsets["category"][row:row + 2]
+                recipe[key] = [vocab["category"].values[c] for c in columns["category"][start:end].tolist()]
+            elif key == "ingredients":
+                recipe[key] = self._ingredients(row)
+            elif key == "instructions":
+                start, end = self.offsets["step"][row:row + 2]
+                recipe[key] = columns["step"].slice(start, end)
+        return recipe
+
+    def _ingredients(self, row):
+        columns, vocab = self.columns, self.vocab
+        start, end = self.offsets["ingredient"][row:row + 2]
+        part = slice(start, end)
+        ingredients = []
+        for layout, name, amount, kind, unit, prep in zip(
+                columns["ingredient_layout"][part].tolist(), columns["ingredient"][part].tolist(),
+                columns["amount"][part].tolist(), columns["amount_kind"][part].tolist(),
+                columns["unit"][part].tolist(), columns["prep"][part].tolist()):
+            values = {
+                "name": vocab["ingredient"].values[name],
+                "amount": NO_AMOUNT if kind == AMOUNT_NONE else int(amount) if kind == AMOUNT_INT else amount,
+                "unit": vocab["unit"].values[unit],
+                "needs_preparation": prep,
+            }
+            ingredients.append({key: values[key] for key in vocab["ingredient_layout"].values[layout]})
+        return ingredients
+
+    def _hash_order(self):
+        if self._sorted_hashes is None:
+            order = np.argsort(self.columns["hash"], kind="stable")
+            self._sorted_hashes = (self.columns["hash"][order], order)
+        return self._sorted_hashes
+
+    def find(self, recipe_id):
+        """Строка рецепта по ID или None (поиск по отсортированным хэшам ID)"""
+        try:
+            key = hash(recipe_id)
+        except TypeError:
+            return None
+        hashes, order = self._hash_order()
+        start, end = np.searchsorted(hashes, key, "left"), np.searchsorted(hashes, key, "right")
+        for row in order[start:end].tolist():
+            if self.columns["id"][row] == recipe_id:
+                return row
+        return None
+
+    def find_rows(self, recipe_ids):
+        """Строки рецептов по списку ID (-1 - такого нет); хэши ищутся одним searchsorted"""
+        recipe_ids = list(recipe_ids)
+        hashes, order = self._hash_order()
+        if not len(hashes):
+            return np.full(len(recipe_ids), -1, dtype=np.int64)
+        keys = np.fromiter((hash(recipe_id) for recipe_id in recipe_ids), dtype=np.int64, count=len(recipe_ids))
+        at = np.minimum(np.searchsorted(hashes, keys), len(hashes) - 1)
+        rows = np.where(hashes[at] == keys, order[at], -1)
+        ids = self.columns["id"]
+        for i in np.flatnonzero(rows >= 0).tolist():
+            # Совпал только хэш - ищем среди остальных строк с тем же хэшем
+            if ids[rows[i]] != recipe_ids[i]:
+                row = self.find(recipe_ids[i])
+                rows[i] = -1 if row is None else row
+        return rows
+
+    # --- Фильтры ---
+
+    def mask(self, author=None, category=None, difficulty=None, max_cooking_time=None):
+        """Строки под фильтрами (булев массив) - те же правила, что у matches_filters"""
+        result = np.ones(len(self), dtype=bool)
+        for name, value in (("author", author), ("difficulty", difficulty)):
+            if value is not None:
+                code = self.vocab[name].code(value)
+                result &= (self.columns[name] == code) if code >= 0 else False
+        if category is not None:
+            code = self.vocab["category"].code(category)
+            hits = np.flatnonzero(self.columns["category"] == code) if code >= 0 else np.empty(0, dtype=np.int64)
+            in_category = np.zeros(len(self), dtype=bool)
+            in_category[np.searchsorted(self.offsets["category"], hits, side="right") - 1] = True
+            result &= in_category
+        if max_cooking_time is not None:
+            # Время, которое не число (NaN), фильтром не отсекается
+            result &= ~(self.columns["cooking_time"] > max_cooking_time)
+        return result
+
+    def rows(self, **filters):
+        """Номера строк под фильтрами"""
+        return np.flatnonzero(self.mask(**filters))
+
+    def values(self, name):
+        """Значения категориальной колонки, которые встречаются в таблице"""
+        codes = np.unique(self.columns[name])
+        return [self.vocab[name].values[code] for code in codes.tolist() if code >= 0]
+
+    # --- Новые таблицы ---
+
+    def take(self, rows):
+        """Таблица из строк rows (в этом порядке)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = {name: _take(self.columns[name], rows) for name in LEVELS["recipe"]}
+        offsets = {}
+        for level in NESTED:
+            index, offsets[level] = _gather(self.offsets[level], rows)
+            for name in LEVELS[level]:
+                columns[name] = _take(self.columns[name], index)
+        raw = {}
+        if self._raw:
+            for new_row in np.flatnonzero(np.isin(rows, list(self._raw))).tolist():
+                raw[new_row] = self._raw[int(rows[new_row])]
+        return RecipeTable(columns, offsets, self.vocab, raw)
+
+    @staticmethod
+    def concat(tables):
+        """Таблицы одна за другой; словари значений объединяются, коды пересчитываются"""
+        tables = list(tables)
+        vocab = {name: Vocabulary() for name in CATEGORICAL}
+        # Последний элемент -1: код -1 (нет значения) так и остается -1
+        remap = {name: [np.array([vocab[name].add(v) for v in t.vocab[name].values] + [-1], dtype=np.int32)
+                        for t in tables]
+                 for name in CATEGORICAL}
+        columns = {}
+        for level in LEVELS.values():
+            for name, dtype in level.items():
+                parts = [t.columns[name] for t in tables]
+                if dtype is str:
+                    columns[name] = StringColumn.concat(parts)
+                elif name in remap:
+                    columns[name] = np.concatenate([m[p] for m, p in zip(remap[name], parts)]).astype(dtype)
+                else:
+                    columns[name] = np.concatenate(parts).astype(dtype)
+        offsets = {level: _concat_offsets([t.offsets[level] for t in tables]) for level in NESTED}
+        raw, start = {}, 0
+        for t in tables:
+            raw.update((start + row, recipe) for row, recipe in t._raw.items())
+            start += len(t)
+        return RecipeTable(columns, offsets, vocab, raw)
+
+    @property
+    def nbytes(self):
+        """Размер массивов и буферов таблицы (без словарей значений)"""
+        return (sum(column.nbytes for column in self.columns.values())
+                + sum(offsets.nbytes for offsets in self.offsets.values()))
+
+
+EMPTY = RecipeTable.from_recipes([])
@@ -0,0 +1,163 @@
+"""Операции с рецептами без привязки к интерфейсу: создание, удаление, выборка и поиск.
+
+Общие для Streamlit-приложения (add_recipe.py) и HTTP API (recipe_api.py).
+"""
+import threading
+import uuid
+from datetime import datetime
+
+from recipe_dedup import DuplicateIndex
+from recipe_schema import coerce_recipe, make_ingredient, validate_recipe
+from recipe_search import RecipeSearchIndex
+from recipe_storage import open_store
+
+
+class RecipeError(Exception):
+    """Ошибка операции с рецептом; сообщение - для пользователя"""
+
+
+class ValidationError(RecipeError):
+    """Рецепт не прошел проверку; errors - список сообщений формы"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class RecipeNotFound(RecipeError):
+    def __init__(self, recipe_id):
+        super().__init__(f"Рецепт {recipe_id} не найден")
+        self.recipe_id = recipe_id
+
+
+class RecipeService:
+    """Рецепты поверх общего хранилища и поискового индекса.
+
+    Методы можно вызывать из нескольких потоков (API обрабатывает запросы
+    в пуле потоков).
+    """
+
+    def __init__(self, store=None, index=None, dedup=None):
+        self.store = open_store() if store is None else store
+        self._index = index
+        self._dedup = dedup
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        # Индекс строится при первом поиске, а не при запуске
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = RecipeSearchIndex(self.store)
+        return self._index
+
+    @property
+    def dedup(self):
+        if self._dedup is None:
+            with self._lock:
+                if self._dedup is None:
+                    self._dedup = DuplicateIndex(self.store)
+        return self._dedup
+
+    def warm_up(self):
+        """Запускаем сборку индекса дубликатов заранее: она идет в фоновом потоке,
+        и первое сохранение не ждет ее"""
+        return self.dedup
+
+    def save(self, recipe):
+        """Проверяем рецепт по правилам формы и сохраняем; ValidationError - если есть ошибки"""
+        errors = validate_recipe(recipe)
+        if errors:
+            raise ValidationError(errors)
+        # Добавляем ID если его нет (для совместимости со старыми рецептами)
+        if not recipe.get('id'):
+            recipe['id'] = str(uuid.uuid4())
+        self.store.add(recipe)
+        return recipe
+
+    def create(self, data):
+        """Новый рецепт из словаря (JSON запроса): ID и дата проставляются здесь.
+
+        Шаги можно передать списком или текстом (шаг на строку), категорию -
+        строкой category или списком categories, как в форме.
+        """
+        if not isinstance(data, dict):
+            raise ValidationError(["Рецепт должен быть объектом"])
+        recipe = coerce_recipe(data)
+        recipe['id'] = str(uuid.uuid4())
+        recipe['created_date'] = datetime.now().strftime("%Y-%m-%d")
+        if 'category' in recipe:
+            recipe['categories'] = [recipe.pop('category')]
+        recipe.setdefault('categories', ["-"])
+        if isinstance(recipe.get('instructions'), str):
+            recipe['instructions'] = [s.strip() for s in recipe['instructions'].split('\n') if s.strip()]
+        ingredients = recipe.get('ingredients')
+        if isinstance(ingredients, list) and all(isinstance(ing, dict) for ing in ingredients):
+            # Прочерк для "по вкусу" и обрезка названий - как при добавлении ингредиента в форме
+            recipe['ingredients'] = [
+                make_ingredient(str(ing.get('name', '')), ing.get('amount'), ing.get('unit'),
+                                bool(ing.get('needs_preparation', False)))
+                for ing in ingredients
+            ]
+        return self.save(recipe)
+
+    def duplicates(self, recipe, limit=5):
+        """Возможные дубликаты рецепта: [(рецепт, сходство)], самые похожие первыми;
+        пока индекс дубликатов собирается - пустой список"""
+        found = [(self.store.get(recipe_id), score) for recipe_id, score in self.dedup.candidates(recipe)]
+        return [(r, score) for r, score in found if r is not None][:limit]
+
+    def get(self, recipe_id):
+        recipe = self.store.get(recipe_id)
+        if recipe is None:
+            raise RecipeNotFound(recipe_id)
+        return recipe
+
+    def delete(self, recipe_id):
+        """Удаляем рецепт по ID и возвращаем его"""
+        recipe = self.store.delete(recipe_id)
+        if recipe is None:
+            raise RecipeNotFound(recipe_id)
+        return recipe
+
+    def clear(self):
+        """Удаляем все рецепты; возвращаем, сколько их было"""
+        count = len(self.store)
+        self.store.clear()
+        return count
+
+    def count(self):
+        total, _ = self.store.query(limit=0)
+        return total
+
+    def list(self, offset=0, limit=None, **filters):
+        """Страница рецептов под фильтрами: (всего, рецепты страницы)"""
+        return self.store.query(offset=offset, limit=limit, **filters)
+
+    def search(self, query="", pantry=None, offset=0, limit=None, **filters):
+        """Поиск по индексу с фильтрами: (всего, страница, недостающие продукты).
+
+        query - слова из названия, ингредиентов и шагов; pantry - имеющиеся
+        продукты (список). Недостающие - {id рецепта: [названия продуктов]}
+        для рецептов страницы (пустой список - все есть), только если задан
+        pantry; как их показать, решает интерфейс. Индекс ранжирует все совпадения, фильтры отсекают их по колонкам
+        хранилища, а рецепты читаются только для страницы.
+        """
+        ranked = [recipe_id for recipe_id, _ in self.index.search(query, limit=None)] \
+            if query.strip() else None
+        found = {}
+        if pantry:
+            found = dict(self.index.pantry_ranking(pantry, limit=None))
+            in_search = None if ranked is None else set(ranked)
+            ranked = [recipe_id for recipe_id in found if in_search is None or recipe_id in in_search]
+        if ranked is None:
+            return self.list(offset, limit, **filters) + ({},)
+
+        total, recipes = self.store.query_ids(ranked, offset=offset, limit=limit, **filters)
+        missing = {recipe["id"]: self.index.missing_products(recipe["id"], pantry)
+                   for recipe in recipes if recipe["id"] in found}
+        return total, recipes, missing
+
+    def facets(self):
+        return self.store.facets()
@@ -0,0 +1,310 @@
+"""Поиск похожих рецептов (возможных дубликатов): MinHash-подписи и LSH-индекс"""
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from ingredients import canonical_name, stem
+
+NUM_PERM = 128
+# Подпись делится на BANDS полос по ROWS значений; рецепты с совпавшей полосой - кандидаты.
+# Пара со сходством s становится кандидатом с вероятностью 1 - (1 - s^ROWS)^BANDS; порог
+# этой кривой (1/BANDS)^(1/ROWS) при 32 x 4 - около 0.42, поэтому пары на THRESHOLD
+# находятся с вероятностью 0.9998 (при 0.5 - 0.87). Лишних кандидатов отсекает сравнение подписей
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.7
+# Длина шингла из шагов приготовления (в словах)
+SHINGLE_WORDS = 3
+# Сколько шинглов переставляем за раз (матрица NUM_PERM x CHUNK_SHINGLES uint64 - 64 МБ)
+CHUNK_SHINGLES = 65536
+
+_WORD = re.compile(r"[а-яa-z0-9]+")
+_RNG = np.random.default_rng(20240101)
+# Хэши вида (a*x + b) >> 32 по модулю 2^64 - свой набор (a, b) на каждую перестановку
+_A = _RNG.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _RNG.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+
+def recipe_shingles(recipe):
+    """Отпечаток рецепта: нормализованные продукты и шинглы из слов шагов"""
+    shingles = {"i:" + canonical_name(ing.get("name", "")) for ing in recipe.get("ingredients", [])}
+    words = [stem(word) for step in recipe.get("instructions", [])
+             for word in _WORD.findall(str(step).lower().replace("ё", "е"))]
+    if len(words) < SHINGLE_WORDS:
+        shingles.update("s:" + word for word in words)
+    shingles.update("s:" + " ".join(words[i:i + SHINGLE_WORDS])
+                    for i in range(len(words) - SHINGLE_WORDS + 1))
+    return shingles
+
+
+def signatures(recipes):
+    """MinHash-подписи пачки рецептов: массив (рецептов, NUM_PERM) uint32.
+
+    Хэши шинглов нескольких рецептов переставляются одной матрицей, а минимумы
+    по рецептам берутся через np.minimum.reduceat, без цикла по перестановкам.
+    У рецепта без ингредиентов и шагов подпись из одних 0xFFFFFFFF.
+    """
+    hashes = [np.fromiter((zlib.crc32(s.encode('utf-8')) for s in recipe_shingles(recipe)), dtype=np.uint64)
+              for recipe in recipes]
+    result = np.full((len(hashes), NUM_PERM), _EMPTY, dtype=np.uint32)
+    start = 0
+    while start < len(hashes):
+        # Пачка рецептов, в которой вместе не больше CHUNK_SHINGLES шинглов
+        end, size = start + 1, len(hashes[start])
+        while end < len(hashes) and size + len(hashes[end]) <= CHUNK_SHINGLES:
+            size += len(hashes[end])
+            end += 1
+        counts = np.array([len(h) for h in hashes[start:end]])
+        rows = np.flatnonzero(counts)
+        if len(rows):
+            x = np.concatenate(hashes[start:end])
+            permuted = ((_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)).astype(np.uint32)
+            bounds = (np.cumsum(counts) - counts)[rows]
+            result[start + rows] = np.minimum.reduceat(permuted, bounds, axis=1).T
+        start = end
+    return result
+
+
+def similarity(a, b):
+    """Оценка сходства (коэффициента Жаккара) по двум подписям"""
+    return float(np.mean(a == b))
+
+
+class DuplicateIndex:
+    """LSH-индекс подписей: кандидаты в дубликаты ищутся по совпавшим полосам.
+
+    Проверка одного рецепта - BANDS поисков в словарях и сравнение подписей
+    только с кандидатами, поэтому ее стоимость почти не зависит от размера
+    коллекции. Индекс хранилища следит за ним через subscribe() и собирается
+    в фоновом потоке - сразу при создании и заново, если данные перечитаны
+    целиком. Пока сборка идет, candidates() возвращает пустой список, а
+    изменения копятся и применяются к собранному индексу.
+    """
+
+    def __init__(self, store=None, threshold=THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._store = store
+        self._builder = None    # поток сборки
+        self._pending = []      # изменения, пришедшие во время сборки
+        self._restart = False   # во время сборки данные перечитаны - собрать заново
+        self._reset()
+        if store is not None:
+            self._stale = True
+            store.subscribe(self._on_change)
+            self._start_build()
+
+    def _reset(self):
+        self._signatures = {}                          # id рецепта -> подпись
+        self._buckets = [{} for _ in range(BANDS)]     # полоса -> ключ полосы -> [id]
+        self._stale = False
+
+    @staticmethod
+    def _band_keys(signature):
+        raw = signature.tobytes()
+        width = len(raw) // BANDS
+        return [raw[b * width:(b + 1) * width] for b in range(BANDS)]
+
+    # --- Обновление ---
+
+    def _on_change(self, event, payload):
+        with self._lock:
+            if self._builder is not None:
+                if event in ("put", "delete"):
+                    self._pending.append((event, payload))
+                else:
+                    self._restart = True
+            elif event == "put":
+                self._add_many(payload)
+            elif event == "delete":
+                self.remove(payload)
+            else:
+                self._stale = True
+                self._start_build()
+
+    def _add_many(self, recipes, replace=True):
+        recipes = list(recipes)
+        for recipe, signature in zip(recipes, signatures(recipes)):
+            if replace:
+                self.remove(recipe["id"])
+            if signature[0] == _EMPTY and not recipe_shingles(recipe):
+                continue
+            self._signatures[recipe["id"]] = signature
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(key, []).append(recipe["id"])
+
+    def add(self, recipe):
+        with self._lock:
+            self._add_many([recipe])
+
+    def remove(self, recipe_id):
+        with self._lock:
+            signature = self._signatures.pop(recipe_id, None)
+            if signature is None:
+                return
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                ids = bucket[key]
+                ids.remove(recipe_id)
+                if not ids:
+                    del bucket[key]
+
+    def _fill(self, recipes):
+        # Снимок хранилища собирает словари рецептов по одному - берем их пачками
+        batch = []
+        for recipe in recipes:
+            batch.append(recipe)
+            if len(batch) == 5000:
+                self._add_many(batch, replace=False)
+                batch = []
+        self._add_many(batch, replace=False)
+
+    def rebuild(self, recipes):
+        """Строим индекс заново по списку рецептов; запросы до замены идут по старому"""
+        built = DuplicateIndex(threshold=self.threshold)
+        built._fill(recipes)
+        with self._lock:
+            self._signatures, self._buckets = built._signatures, built._buckets
+            self._stale = False
+
+    def _start_build(self):
+        with self._lock:
+            if self._builder is not None:
+                return
+            self._pending, self._restart = [], False
+            self._builder = threading.Thread(target=self._build, name="duplicate-index", daemon=True)
+            self._builder.start()
+
+    def _build(self):
+        """Фоновая сборка: подписи считаются без блокировки индекса, поэтому
+        запись в хранилище (и уведомление индекса) ее не ждет"""
+        try:
+            while True:
+                built = DuplicateIndex(threshold=self.threshold)
+                built._fill(self._store.snapshot())
+                with self._lock:
+                    if self._restart:
+                        self._pending, self._restart = [], False
+                        continue
+                    self._signatures, self._buckets = built._signatures, built._buckets
+                    # Изменения, пришедшие во время сборки: повтор уже учтенных в снимке ничего не меняет
+                    for event, payload in self._pending:
+                        if event == "put":
+                            self._add_many(payload)
+                        else:
+                            self.remove(payload)
+                    self._pending = []
+                    self._stale = False
+                    return
+        finally:
+            with self._lock:
+                # Если сборка упала, индекс остается неготовым - следующий запрос запустит ее снова
+                self._builder = None
+
+    def ready(self):
+        """Собран ли индекс; если нет и сборка не идет - запускаем ее"""
+        if self._store is None:
+            return True
+        self._store.refresh()
+        with self._lock:
+            if self._stale:
+                self._start_build()
+            return not self._stale
+
+    def wait_ready(self, timeout=None):
+        """Ждем окончания фоновой сборки; True - индекс собран"""
+        if not self.ready():
+            builder = self._builder
+            if builder is not None:
+                builder.join(timeout)
+        return not self._stale
+
+    def __len__(self):
+        return len(self._signatures)
+
+    # --- Запросы ---
+
+    def candidates(self, recipe, threshold=None):
+        """Похожие рецепты: [(id, сходство)] со сходством от threshold, самые похожие первыми.
+
+        Пока индекс собирается, проверку пропускаем: пустой список.
+        """
+        if not self.ready():
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        if not recipe_shingles(recipe):
+            return []
+        signature = signatures([recipe])[0]
+        with self._lock:
+            found = set()
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                found.update(bucket.get(key, ()))
+            found.discard(recipe.get("id"))
+            scored = [(recipe_id, similarity(signature, self._signatures[recipe_id])) for recipe_id in found]
+        return sorted([item for item in scored if item[1] >= threshold], key=lambda item: (-item[1], item[0]))
+
+    def clusters(self, threshold=None):
+        """Группы похожих рецептов во всей коллекции: списки id, крупные группы первыми.
+
+        Пары-кандидаты берутся из общих корзин LSH, проверяются по сходству
+        подписей и объединяются системой непересекающихся множеств. Ждет
+        окончания фоновой сборки индекса.
+        """
+        self.wait_ready()
+        threshold = self.threshold if threshold is None else threshold
+        parent = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        with self._lock:
+            for bucket in self._buckets:
+                for ids in bucket.values():
+                    if len(ids) < 2:
+                        continue
+                    block = np.stack([self._signatures[recipe_id] for recipe_id in ids])
+                    if len(ids) <= 64:
+                        # Сходство всех пар корзины одной матрицей
+                        similar = (block[:, None, :] == block[None, :, :]).mean(axis=2) >= threshold
+                        pairs = zip(*np.nonzero(np.triu(similar, 1)))
+                    else:
+                        # Большая корзина: сравниваем только с первым рецептом
+                        similar = (block[1:] == block[0]).mean(axis=1) >= threshold
+                        pairs = ((0, j + 1) for j in np.flatnonzero(similar))
+                    for i, j in pairs:
+                        parent[find(ids[i])] = find(ids[j])
+
+        groups = {}
+        for recipe_id in parent:
+            groups.setdefault(find(recipe_id), []).append(recipe_id)
+        return sorted((sorted(ids) for ids in groups.values() if len(ids) > 1), key=lambda ids: (-len(ids), ids))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from recipe_storage import open_store
+
+    parser = argparse.ArgumentParser(description="Поиск групп похожих рецептов во всей коллекции")
+    parser.add_argument("--backend", choices=["json", "sqlite"], help="по умолчанию RECIPES_BACKEND или json")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    store = open_store(args.backend)
+    try:
+        started = time.perf_counter()
+        index = DuplicateIndex(store, threshold=args.threshold)
+        groups = index.clusters()
+        print(f"Рецептов: {len(index)}, групп похожих: {len(groups)} ({time.perf_counter() - started:.2f} с)")
+        for ids in groups:
+            names = [store.get(recipe_id)["name"] for recipe_id in ids]
+            print(f"  {len(ids)}: {'; '.join(names)}")
+    finally:
+        store.close()
@@ -0,0 +1,215 @@
+"""Выгрузка рецептов в файлы: JSON, JSON Lines, CSV, Parquet, со сжатием gzip/zstd"""
+import gzip
+import json
+import os
+import tempfile
+import textwrap
+import threading
+
+import pandas as pd
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Словари рецептов собираем из снимка пачками, чтобы не держать вторую копию коллекции
+BATCH_SIZE = 1000
+
+# Колонки CSV/Parquet; списки (категории, ингредиенты, шаги) хранятся строкой JSON
+TABLE_COLUMNS = ["id", "name", "author", "categories", "difficulty", "cooking_time", "servings",
+                 "ingredients", "instructions", "created_date"]
+NESTED_COLUMNS = ("categories", "ingredients", "instructions")
+
+
+def iter_batches(store, batch_size=BATCH_SIZE):
+    """Пачки рецептов из одного снимка хранилища: запись во время выгрузки
+    не сдвигает страницы (рецепты не дублируются и не пропадают)"""
+    recipes = store.snapshot()
+    for start in range(0, len(recipes), batch_size):
+        yield recipes[start:start + batch_size]
+
+
+def _open_text(path, compression):
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if compression == 'zstd':
+        raw = open(path, 'wb')
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return _TextZstd(stream)
+    return open(path, 'w', encoding='utf-8')
+
+
+class _TextZstd:
+    """Текстовая обертка над потоком zstandard (io.TextIOWrapper требует readable/seekable)"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        return self._stream.write(text.encode('utf-8'))
+
+    def close(self):
+        self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_json(batches, path, compression=None):
+    """JSON-массив в том же виде, что и my_recipes.json (indent=2), по одному рецепту за раз"""
+    with _open_text(path, compression) as f:
+        f.write('[')
+        first = True
+        for batch in batches:
+            for recipe in batch:
+                f.write('\n' if first else ',\n')
+                f.write(textwrap.indent(json.dumps(recipe, ensure_ascii=False, indent=2), '  '))
+                first = False
+        f.write('\n]' if not first else ']')
+
+
+def write_jsonl(batches, path, compression=None):
+    """JSON Lines: один рецепт - одна строка"""
+    with _open_text(path, compression) as f:
+        for batch in batches:
+            f.write(''.join(json.dumps(recipe, ensure_ascii=False) + '\n' for recipe in batch))
+
+
+def recipes_frame(batch):
+    """Плоская таблица рецептов; вложенные списки сериализуются в JSON"""
+    frame = pd.DataFrame(
+        [{col: recipe.get(col) for col in TABLE_COLUMNS} for recipe in batch],
+        columns=TABLE_COLUMNS,
+    )
+    for col in NESTED_COLUMNS:
+        frame[col] = [json.dumps(value, ensure_ascii=False) for value in frame[col]]
+    for col in ("cooking_time", "servings"):
+        frame[col] = frame[col].astype("Int64")
+    # КБЖУ (если выгрузка с расчетом) - отдельными колонками
+    if batch and "nutrition" in batch[0]:
+        nutrition = pd.DataFrame([recipe["nutrition"] for recipe in batch]).drop(columns=["servings"])
+        frame = pd.concat([frame, nutrition.add_prefix("nutrition_")], axis=1)
+    return frame
+
+
+def write_csv(batches, path, compression=None):
+    with _open_text(path, compression) as f:
+        header = True
+        for batch in batches:
+            recipes_frame(batch).to_csv(f, index=False, header=header)
+            header = False
+
+
+def write_parquet(batches, path, compression=None):
+    # Пишем по группам строк, чтобы не собирать всю таблицу в памяти
+    writer = None
+    try:
+        for batch in batches:
+            table = pyarrow.Table.from_pandas(recipes_frame(batch), preserve_index=False)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(path, table.schema, compression='zstd')
+            writer.write_table(table)
+        if writer is None:
+            recipes_frame([]).to_parquet(path, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# Формат -> (подпись, расширение, mime, функция записи, сжатие)
+FORMATS = {
+    "json": ("JSON (как my_recipes.json)", "json", "application/json", write_json, None),
+    "jsonl": ("JSON Lines", "jsonl", "application/x-ndjson", write_jsonl, None),
+    "jsonl.gz": ("JSON Lines + gzip", "jsonl.gz", "application/gzip", write_jsonl, 'gzip'),
+    "jsonl.zst": ("JSON Lines + zstd", "jsonl.zst", "application/zstd", write_jsonl, 'zstd'),
+    "csv": ("CSV", "csv", "text/csv", write_csv, None),
+    "csv.gz": ("CSV + gzip", "csv.gz", "application/gzip", write_csv, 'gzip'),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet", write_parquet, None),
+}
+
+
+def available_formats():
+    """Форматы, для которых установлены нужные библиотеки"""
+    formats = []
+    for fmt, (_, _, _, writer, compression) in FORMATS.items():
+        if compression == 'zstd' and zstandard is None:
+            continue
+        if writer is write_parquet and pyarrow is None:
+            continue
+        formats.append(fmt)
+    return formats
+
+
+def export_recipes(store, fmt, path, nutrition=None):
+    """Потоково выгружаем все рецепты хранилища в файл выбранного формата.
+
+    nutrition - NutritionCalculator: к каждому рецепту добавляется поле nutrition с КБЖУ.
+    """
+    _, _, _, writer, compression = FORMATS[fmt]
+    batches = iter_batches(store)
+    if nutrition is not None:
+        batches = (nutrition.annotate(batch) for batch in batches)
+    writer(batches, path, compression)
+    return path
+
+
+class ExportCache:
+    """Готовые файлы выгрузки, общие для всех сессий.
+
+    Ключ - версия коллекции и формат: пока рецепты не менялись, повторная
+    выгрузка отдает уже собранный файл. Устаревшие файлы удаляются.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or tempfile.mkdtemp(prefix='recipes_export_')
+        self._lock = threading.Lock()
+        self._files = {}
+        self._payloads = {}
+
+    def get(self, store, fmt, nutrition=None):
+        """Путь к готовому файлу или None, если его еще не собирали для этой версии"""
+        store.refresh()
+        return self._files.get((id(store), store.version, fmt, nutrition is not None))
+
+    def build(self, store, fmt, nutrition=None):
+        with self._lock:
+            store.refresh()
+            key = (id(store), store.version, fmt, nutrition is not None)
+            if key in self._files:
+                return self._files[key]
+            suffix = "_kbju" if nutrition is not None else ""
+            path = os.path.join(self.directory, f"recipes_{store.version}{suffix}.{FORMATS[fmt][1]}")
+            export_recipes(store, fmt, path, nutrition)
+            # Файлы прежних версий больше не нужны
+            for old_key in [k for k in self._files if k[:2] != key[:2]]:
+                old_path = self._files.pop(old_key)
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+            self._files[key] = path
+            return path
+
+    def read(self, store, fmt, nutrition=None):
+        """Содержимое готового файла или None. Файл читается один раз на версию,
+        а не на каждый перезапуск страницы с кнопкой скачивания"""
+        path = self.get(store, fmt, nutrition)
+        if path is None:
+            return None
+        with self._lock:
+            if path not in self._payloads:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # Держим только файлы текущей версии
+                live = set(self._files.values())
+                self._payloads = {p: d for p, d in self._payloads.items() if p in live}
+                self._payloads[path] = data
+            return self._payloads[path]
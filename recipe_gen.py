@@ -0,0 +1,270 @@
+"""Генерация рецептов пачками: подключаемая модель, кэш запросов и сохранение в хранилище"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from ingredients import CANONICAL_INGREDIENTS
+from recipe_schema import CATEGORIES, DIFFICULTIES, TO_TASTE, coerce_recipe, make_ingredient, validate_recipe
+
+CACHE_DIR = '.recipe_gen_cache'
+DEFAULT_AUTHOR = 'НутринямAI'
+# Пространство имен для ID: один и тот же запрос к той же модели дает тот же ID рецепта
+RECIPE_ID_NAMESPACE = uuid.UUID('6f1c1b8e-3f52-4a8e-9a51-2f0f3c1d7e21')
+
+
+class GenerationBackend:
+    """Модель, которая по текстовым запросам возвращает черновики рецептов.
+
+    Черновик - словарь в схеме формы без служебных полей (id, author,
+    created_date): name, categories, difficulty, cooking_time, servings,
+    ingredients, instructions. Пачка запросов отправляется одним вызовом.
+    """
+
+    name = 'base'
+
+    async def generate_batch(self, prompts):
+        raise NotImplementedError
+
+
+class LocalStubBackend(GenerationBackend):
+    """Детерминированная заглушка вместо модели - для тестов и отладки конвейера.
+
+    Рецепт собирается из словаря продуктов по хэшу запроса, поэтому один и тот
+    же запрос всегда дает один и тот же рецепт. latency имитирует задержку
+    сети, fail_rate - долю вызовов, завершающихся ошибкой.
+    """
+
+    name = 'stub'
+
+    STEPS = [
+        "Подготовить {0}", "Нарезать {0} и {1}", "Обжарить {0} на среднем огне",
+        "Добавить {1} и перемешать", "Варить {2} минут", "Запекать {2} минут при 180 градусах",
+        "Посолить и поперчить по вкусу", "Подавать горячим", "Остудить и подавать",
+    ]
+    UNIT_AMOUNTS = {"г": (50, 500), "мл": (50, 500), "ст.л.": (1, 4), "ч.л.": (1, 3), "шт": (1, 4)}
+
+    def __init__(self, latency=0.0, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._failures = random.Random(seed)
+
+    async def generate_batch(self, prompts):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_rate and self._failures.random() < self.fail_rate:
+            raise ConnectionError("Заглушка: имитация сбоя модели")
+        return [self.draft(prompt) for prompt in prompts]
+
+    def draft(self, prompt):
+        rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).digest())
+        products = rng.sample(CANONICAL_INGREDIENTS, rng.randint(3, 7))
+        ingredients = []
+        for name, _, piece_grams, _ in products:
+            unit = "шт" if piece_grams and rng.random() < 0.5 else rng.choice(["г", "мл", "ст.л.", "ч.л."])
+            low, high = self.UNIT_AMOUNTS[unit]
+            ingredients.append(make_ingredient(name, rng.randint(low, high), unit, rng.random() < 0.2))
+        ingredients.append(make_ingredient("соль", "-", TO_TASTE))
+        cooking_time = rng.choice([10, 15, 20, 30, 40, 60, 90])
+        names = [item[0] for item in products]
+        steps = [step.format(names[0], names[1 % len(names)], cooking_time)
+                 for step in rng.sample(self.STEPS, rng.randint(3, 6))]
+        return {
+            "name": prompt.strip().capitalize(),
+            "categories": [rng.choice(CATEGORIES[1:])],
+            "difficulty": rng.choice(DIFFICULTIES),
+            "cooking_time": cooking_time,
+            "servings": rng.randint(1, 6),
+            "ingredients": ingredients,
+            "instructions": steps,
+        }
+
+
+BACKENDS = {'stub': LocalStubBackend}
+
+
+class PromptCache:
+    """Кэш запрос -> черновик: файл на диске с именем по хэшу модели и запроса"""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    @staticmethod
+    def key(backend_name, prompt):
+        return hashlib.sha256(f"{backend_name}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, draft):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(draft, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+@dataclass
+class GenerationReport:
+    """Итог генерации: сколько рецептов взято из кэша, получено от модели и сохранено"""
+    prompts: int = 0
+    cached: int = 0
+    generated: int = 0
+    saved: int = 0
+    existing: int = 0
+    failed: list = field(default_factory=list)   # (запрос, ошибка)
+    invalid: list = field(default_factory=list)  # (запрос, [ошибки проверки])
+    seconds: float = 0.0
+
+    def summary(self):
+        return (f"Запросов: {self.prompts}, из кэша: {self.cached}, сгенерировано: {self.generated}, "
+                f"сохранено: {self.saved}, уже были: {self.existing}, ошибок модели: {len(self.failed)}, "
+                f"не прошли проверку: {len(self.invalid)} ({self.seconds:.2f} с)")
+
+
+class RecipeGenerator:
+    """Конвейер генерации.
+
+    Уникальные запросы сначала ищутся в кэше; остальные уходят в модель пачками
+    по batch_size, не больше concurrency пачек одновременно, с повтором при
+    сбое (retries раз, пауза удваивается). Черновики дополняются служебными
+    полями, проверяются по правилам формы и сохраняются в хранилище пачками.
+    """
+
+    def __init__(self, backend, store=None, cache=None, batch_size=16, concurrency=4,
+                 retries=3, backoff=0.5, author=DEFAULT_AUTHOR):
+        self.backend = backend
+        self.store = store
+        self.cache = PromptCache() if cache is None else cache
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.author = author
+
+    async def _call(self, semaphore, prompts):
+        async with semaphore:
+            delay = self.backoff
+            for attempt in range(self.retries + 1):
+                try:
+                    drafts = await self.backend.generate_batch(prompts)
+                    if len(drafts) != len(prompts):
+                        raise ValueError("Модель вернула не столько рецептов, сколько запросов")
+                    return drafts, None
+                except Exception as e:
+                    if attempt == self.retries:
+                        return None, e
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+    def to_recipe(self, key, draft):
+        """Рецепт в схеме формы из черновика модели; ID выводится из ключа кэша"""
+        recipe = coerce_recipe(draft)
+        recipe["id"] = str(uuid.uuid5(RECIPE_ID_NAMESPACE, key))
+        recipe.setdefault("author", self.author)
+        recipe.setdefault("created_date", datetime.now().strftime("%Y-%m-%d"))
+        return recipe
+
+    async def generate(self, prompts):
+        report = GenerationReport()
+        started = time.perf_counter()
+        unique = list(dict.fromkeys(p.strip() for p in prompts if p.strip()))
+        report.prompts = len(unique)
+
+        drafts, missing = {}, []
+        for prompt in unique:
+            key = self.cache.key(self.backend.name, prompt)
+            draft = self.cache.get(key)
+            if draft is None:
+                missing.append(prompt)
+            else:
+                drafts[prompt] = draft
+                report.cached += 1
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        results = await asyncio.gather(*(self._call(semaphore, batch) for batch in batches))
+        for batch, (batch_drafts, error) in zip(batches, results):
+            if error is not None:
+                report.failed.extend((prompt, str(error)) for prompt in batch)
+                continue
+            for prompt, draft in zip(batch, batch_drafts):
+                self.cache.put(self.cache.key(self.backend.name, prompt), draft)
+                drafts[prompt] = draft
+                report.generated += 1
+
+        recipes = []
+        for prompt in unique:
+            if prompt not in drafts:
+                continue
+            recipe = self.to_recipe(self.cache.key(self.backend.name, prompt), drafts[prompt])
+            errors = validate_recipe(recipe)
+            if errors:
+                report.invalid.append((prompt, errors))
+            else:
+                recipes.append(recipe)
+
+        if self.store is not None:
+            fresh = [recipe for recipe in recipes if recipe["id"] not in self.store]
+            report.existing = len(recipes) - len(fresh)
+            for i in range(0, len(fresh), 500):
+                self.store.add_many(fresh[i:i + 500])
+            report.saved = len(fresh)
+
+        report.seconds = time.perf_counter() - started
+        return report
+
+
+def generate_recipes(prompts, backend=None, store=None, **options):
+    """Синхронная обертка над RecipeGenerator.generate"""
+    generator = RecipeGenerator(backend or LocalStubBackend(), store=store, **options)
+    return asyncio.run(generator.generate(prompts))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from recipe_storage import open_store
+
+    parser = argparse.ArgumentParser(description="Генерация рецептов по запросам (по одному в строке файла)")
+    parser.add_argument("prompts_file")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="stub")
+    parser.add_argument("--store", choices=["json", "sqlite"], help="по умолчанию RECIPES_BACKEND или json")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="не сохранять рецепты, только сгенерировать")
+    args = parser.parse_args()
+
+    with open(args.prompts_file, 'r', encoding='utf-8') as f:
+        prompts = f.read().splitlines()
+
+    store = None if args.dry_run else open_store(args.store)
+    try:
+        report = generate_recipes(
+            prompts, BACKENDS[args.backend](), store,
+            cache=PromptCache(args.cache_dir), batch_size=args.batch_size,
+            concurrency=args.concurrency, retries=args.retries,
+        )
+        print(report.summary())
+        for prompt, error in report.failed[:20]:
+            print(f"  ошибка модели: {prompt}: {error}")
+        for prompt, errors in report.invalid[:20]:
+            print(f"  не прошел проверку: {prompt}: {'; '.join(errors)}")
+    finally:
+        if store is not None:
+            store.close()
@@ -0,0 +1,274 @@
+"""Массовый импорт рецептов из файлов JSON / JSON Lines / CSV"""
+import csv
+import gzip
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from recipe_schema import coerce_recipe, validate_recipe
+
+# Сколько записей разбирает один процесс за раз и сколько пишем в хранилище одной транзакцией
+CHUNK_SIZE = 500
+BATCH_SIZE = 500
+# Файлы больше этого размера разбираем пулом процессов
+PARALLEL_MIN_BYTES = 5 * 1024 * 1024
+# Сколько символов JSON-массива читаем за раз
+READ_CHARS = 1 << 16
+
+
+@dataclass
+class ImportReport:
+    """Итог импорта: сколько записей добавлено, пропущено и какие ошибки"""
+    total: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    errors: list = field(default_factory=list)  # (номер записи, id, [сообщения])
+    seconds: float = 0.0
+    stopped_at: int = 0  # номер записи, на которой файл перестал читаться (0 - прочитан целиком)
+
+    @property
+    def per_second(self):
+        return self.total / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        text = (f"Записей: {self.total}, добавлено: {self.imported}, дубликатов: {self.duplicates}, "
+                f"с ошибками: {len(self.errors)} ({self.seconds:.2f} с, {self.per_second:.0f} зап/с)")
+        if self.stopped_at:
+            text += f"; файл поврежден, чтение остановлено на записи {self.stopped_at}"
+        return text
+
+
+def detect_format(filename):
+    name = filename[:-3] if filename.endswith('.gz') else filename
+    for fmt in ('jsonl', 'json', 'csv'):
+        if name.endswith('.' + fmt):
+            return fmt
+    raise ValueError(f"Неизвестный формат файла: {filename} (ожидается .json, .jsonl или .csv)")
+
+
+def _open_text(source, filename):
+    """Текстовый поток из пути или загруженного файла; .gz распаковывается на лету"""
+    raw = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    if filename.endswith('.gz'):
+        raw = gzip.GzipFile(fileobj=raw)
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+
+def iter_raw_records(source, filename):
+    """Сырые записи файла: строки JSON Lines или словари JSON/CSV - без разбора схемы"""
+    fmt = detect_format(filename)
+    f = _open_text(source, filename)
+    if fmt == 'jsonl':
+        for line in f:
+            if line.strip():
+                yield line
+    elif fmt == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        yield from iter_json_array(f)
+
+
+def iter_json_array(f, read_chars=READ_CHARS):
+    """Элементы JSON-массива по одному: файл читается кусками, в памяти - только текущий кусок"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(read_chars)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_space():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def expect(chars):
+        nonlocal pos
+        skip_space()
+        if pos >= len(buffer) or buffer[pos] not in chars:
+            raise json.JSONDecodeError(f"Ожидается один из символов {chars!r}", buffer, pos)
+        pos += 1
+        return buffer[pos - 1]
+
+    fill()
+    expect("[")
+    skip_space()
+    if pos < len(buffer) and buffer[pos] == "]":
+        return
+    while True:
+        skip_space()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # Число на границе куска могло оборваться - за элементом должен идти разделитель
+            if eof or (end < len(buffer) and (buffer[end] in ",]" or buffer[end].isspace())):
+                break
+            fill()
+        pos = end
+        yield item
+        if expect(",]") == "]":
+            return
+
+
+def _source_size(source):
+    """Размер файла в байтах: путь или загруженный файл (UploadedFile.size, seek/tell)"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, 'size', None)
+    if size is None and hasattr(source, 'seek'):
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+    return size or 0
+
+
+def parse_record(raw):
+    """Разбор и проверка одной записи: (рецепт или None, если это не объект; список ошибок)"""
+    try:
+        record = json.loads(raw) if isinstance(raw, str) else raw
+    except json.JSONDecodeError as e:
+        return None, [f"Некорректный JSON: {e}"]
+    if not isinstance(record, dict):
+        return None, ["Запись должна быть объектом"]
+    recipe = coerce_recipe(record)
+    return recipe, validate_recipe(recipe)
+
+
+def parse_chunk(chunk):
+    """Выполняется в процессе пула: разбираем пачку сырых записей"""
+    return [parse_record(raw) for raw in chunk]
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _ordered_map(pool, fn, chunks, window):
+    """Как pool.map, но держит в работе не больше window пачек - файл читается по мере разбора"""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(fn, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def import_recipes(store, source, filename=None, workers=None, batch_size=BATCH_SIZE):
+    """Импортируем рецепты из файла в хранилище.
+
+    Записи читаются потоком, разбираются и проверяются по правилам формы
+    (для больших файлов - пулом процессов), дубликаты по id пропускаются,
+    а рецепты сохраняются пачками по batch_size. Если файл дальше не
+    разбирается (битый JSON-массив), уже прочитанные записи сохраняются,
+    а место поломки попадает в отчет.
+    """
+    filename = filename or str(source)
+    if workers is None:
+        workers = os.cpu_count() if _source_size(source) >= PARALLEL_MIN_BYTES else 0
+
+    report = ImportReport()
+    started = time.perf_counter()
+    seen = set()
+    batch = []
+    read = 0
+    broken = []
+
+    def records():
+        nonlocal read
+        try:
+            for raw in iter_raw_records(source, filename):
+                read += 1
+                yield raw
+        except json.JSONDecodeError as e:
+            # Позиция в сообщении считается от текущего куска, а не от начала файла
+            broken.append(f"Некорректный JSON, файл дальше не разбирается: {e.msg}")
+        except UnicodeDecodeError:
+            broken.append("Файл не в кодировке UTF-8, дальше не разбирается")
+
+    chunks = _chunks(records(), CHUNK_SIZE)
+    # spawn: дочерние процессы не наследуют потоки и блокировки приложения (Streamlit, журнал)
+    pool = (ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            if workers and workers > 1 else None)
+    try:
+        if pool:
+            parsed_chunks = _ordered_map(pool, parse_chunk, chunks, window=workers * 2)
+        else:
+            parsed_chunks = map(parse_chunk, chunks)
+        for parsed in parsed_chunks:
+            for recipe, errors in parsed:
+                report.total += 1
+                if errors:
+                    report.errors.append((report.total, recipe and recipe.get('id'), errors))
+                    continue
+                # Записи без ID получают новый, как при сохранении из формы
+                if not recipe.get('id'):
+                    recipe['id'] = str(uuid.uuid4())
+                if recipe['id'] in seen or recipe['id'] in store:
+                    report.duplicates += 1
+                    continue
+                seen.add(recipe['id'])
+                batch.append(recipe)
+                if len(batch) >= batch_size:
+                    store.add_many(batch)
+                    report.imported += len(batch)
+                    batch = []
+        if batch:
+            store.add_many(batch)
+            report.imported += len(batch)
+    finally:
+        if pool:
+            pool.shutdown()
+    if broken:
+        report.stopped_at = read + 1
+        report.errors.append((report.stopped_at, None, broken))
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from recipe_storage import open_store
+
+    parser = argparse.ArgumentParser(description="Импорт рецептов из JSON / JSON Lines / CSV (можно .gz)")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--backend", choices=["json", "sqlite"], help="по умолчанию RECIPES_BACKEND или json")
+    parser.add_argument("--workers", type=int, help="число процессов для разбора (0 - без пула)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    store = open_store(args.backend)
+    try:
+        for path in args.paths:
+            report = import_recipes(store, path, workers=args.workers, batch_size=args.batch_size)
+            print(f"{path}: {report.summary()}")
+            for number, recipe_id, errors in report.errors:
+                print(f"  запись {number}{f' ({recipe_id})' if recipe_id else ''}: {'; '.join(errors)}")
+    finally:
+        store.close()
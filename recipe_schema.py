@@ -0,0 +1,121 @@
+"""Схема рецепта: допустимые значения полей и проверка рецептов (форма, импорт)"""
+import json
+import uuid
+from datetime import datetime
+
+UNITS = ["г", "мл", "ст.л.", "ч.л.", "шт", "стакан", "по вкусу"]
+TO_TASTE = "по вкусу"
+DIFFICULTIES = ["легко", "средне", "сложно"]
+CATEGORIES = ["-", "горячее", "салат", "суп", "закуска", "гарнир", "десерт", "напитки"]
+
+
+def make_ingredient(name, amount, unit, needs_preparation=False):
+    """Ингредиент в формате формы: для "по вкусу" вместо количества ставим прочерк"""
+    return {
+        "name": name.strip(),
+        "amount": "-" if unit == TO_TASTE else amount,
+        "unit": unit,
+        "needs_preparation": needs_preparation
+    }
+
+
+def make_recipe(name, author, category, difficulty, cooking_time, ingredients, instructions_text,
+                servings=1):
+    """Рецепт с новым ID; шаги - непустые строки текста инструкции"""
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "author": author,
+        "categories": [category],  # Одна категория в массиве (может быть "-")
+        "difficulty": difficulty,
+        "cooking_time": cooking_time,
+        "servings": servings,
+        "ingredients": ingredients,
+        "instructions": [step.strip() for step in instructions_text.split('\n') if step.strip()],
+        "created_date": datetime.now().strftime("%Y-%m-%d")
+    }
+
+
+def recipe_categories(recipe):
+    """Категории рецепта списком (в старых рецептах могла быть строка)"""
+    categories = recipe.get('categories')
+    if isinstance(categories, list):
+        return categories
+    return [categories] if categories else []
+
+
+def _is_amount(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+
+
+def validate_recipe(recipe):
+    """Проверяем рецепт по тем же правилам, что и форма; возвращаем список ошибок"""
+    errors = []
+    if not recipe.get("name"):
+        errors.append("Введите название рецепта")
+    if not recipe.get("author"):
+        errors.append("Введите автора рецепта")
+    if not recipe.get("ingredients"):
+        errors.append("Добавьте хотя бы один ингредиент")
+    if not recipe.get("instructions"):
+        errors.append("Добавьте инструкцию приготовления")
+
+    if recipe.get("difficulty") not in DIFFICULTIES:
+        errors.append(f"Неизвестная сложность «{recipe.get('difficulty')}»")
+    categories = recipe.get("categories")
+    if not isinstance(categories, list) or not categories:
+        errors.append("Категории должны быть списком")
+    else:
+        errors.extend(f"Неизвестная категория «{c}»" for c in categories if c not in CATEGORIES)
+    cooking_time = recipe.get("cooking_time")
+    if not isinstance(cooking_time, int) or isinstance(cooking_time, bool) or cooking_time < 1:
+        errors.append("Время готовки должно быть целым числом минут, не меньше 1")
+    # Число порций необязательно (в старых рецептах его нет)
+    servings = recipe.get("servings")
+    if servings is not None and (not isinstance(servings, int) or isinstance(servings, bool) or servings < 1):
+        errors.append("Число порций должно быть целым числом, не меньше 1")
+
+    for i, ing in enumerate(recipe.get("ingredients") or [], 1):
+        if not isinstance(ing, dict):
+            errors.append(f"Ингредиент {i}: неверный формат")
+            continue
+        if not ing.get("name"):
+            errors.append(f"Ингредиент {i}: введите название продукта")
+        unit = ing.get("unit")
+        if unit not in UNITS:
+            errors.append(f"Ингредиент {i}: неизвестная единица измерения «{unit}»")
+        elif unit == TO_TASTE:
+            if ing.get("amount") != "-":
+                errors.append(f"Ингредиент {i}: для «{TO_TASTE}» количество должно быть «-»")
+        elif not _is_amount(ing.get("amount")):
+            errors.append(f"Ингредиент {i}: количество должно быть числом не меньше 0")
+    return errors
+
+
+def coerce_recipe(record):
+    """Приводим запись из файла (в т.ч. строки CSV) к типам схемы"""
+    recipe = dict(record)
+    for key in ("categories", "ingredients", "instructions"):
+        value = recipe.get(key)
+        if isinstance(value, str):
+            try:
+                recipe[key] = json.loads(value)
+            except json.JSONDecodeError:
+                # Категория одной строкой, как в старых рецептах
+                if key == "categories":
+                    recipe[key] = [value]
+    for key in ("cooking_time", "servings"):
+        value = recipe.get(key)
+        if isinstance(value, str) and value.strip().isdigit():
+            recipe[key] = int(value)
+        elif isinstance(value, float) and value.is_integer():
+            recipe[key] = int(value)
+    # Пустая ячейка CSV - поля нет
+    if recipe.get("servings") in ("", None):
+        recipe.pop("servings", None)
+    # КБЖУ из выгрузки (в CSV - колонки nutrition_*) - расчетные поля, не храним
+    for key in [key for key in recipe if key == "nutrition" or key.startswith("nutrition_")]:
+        del recipe[key]
+    if recipe.get("id"):
+        recipe["id"] = str(recipe["id"])
+    return recipe
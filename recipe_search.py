@@ -0,0 +1,203 @@
+"""Инвертированный индекс рецептов: полнотекстовый поиск и подбор по имеющимся продуктам"""
+import re
+import threading
+from array import array
+
+import numpy as np
+
+from ingredients import canonical_name, stem
+from recipe_schema import TO_TASTE
+
+_WORD = re.compile(r"[а-яa-z0-9]+")
+
+# Вес совпадения в зависимости от поля рецепта
+FIELD_WEIGHTS = {"name": 3, "ingredient": 2, "step": 1}
+
+
+def text_terms(text):
+    """Основы слов текста для индекса и запросов"""
+    text = str(text).lower().replace("ё", "е")
+    return {stem(word) for word in _WORD.findall(text) if len(word) > 1}
+
+
+class RecipeSearchIndex:
+    """Индекс по названиям, шагам и нормализованным ингредиентам рецептов.
+
+    Каждый рецепт получает порядковый номер документа; списки вхождений -
+    отсортированные массивы uint32 (array('I')), номера только растут, поэтому
+    добавление - это дописывание в конец. Удаленные документы помечаются в
+    битовой маске и вычищаются перестройкой, когда их становится много.
+
+    Индекс подписывается на изменения хранилища и обновляется по одному рецепту;
+    если данные перечитаны целиком, он перестраивается при следующем запросе.
+    """
+
+    def __init__(self, store=None):
+        self._lock = threading.RLock()
+        self._store = store
+        self._reset()
+        if store is not None:
+            self._stale = True
+            store.subscribe(self._on_change)
+
+    def _reset(self):
+        self._ids = []               # номер документа -> id рецепта
+        self._doc_of = {}            # id рецепта -> номер документа
+        self._alive = bytearray()    # 1 - документ действующий
+        self._dead = 0
+        self._terms = {}             # (поле, основа) -> array('I')
+        self._ingredients = {}       # продукт (кроме "по вкусу") -> array('I')
+        self._required = array('H')  # сколько разных продуктов нужно рецепту (без "по вкусу")
+        self._doc_ingredients = []   # номер документа -> кортеж продуктов
+        self._stale = False
+
+    # --- Обновление ---
+
+    def _on_change(self, event, payload):
+        with self._lock:
+            if event == "put":
+                for recipe in payload:
+                    self.add(recipe)
+            elif event == "delete":
+                self.remove(payload)
+            else:
+                self._stale = True
+
+    def add(self, recipe):
+        """Добавляем (или заменяем) рецепт в индексе"""
+        with self._lock:
+            self.remove(recipe["id"])
+            doc = len(self._ids)
+            self._ids.append(recipe["id"])
+            self._doc_of[recipe["id"]] = doc
+            self._alive.append(1)
+
+            terms = {("name", t) for t in text_terms(recipe.get("name", ""))}
+            for step in recipe.get("instructions", []):
+                terms.update(("step", t) for t in text_terms(step))
+            # Продукты "по вкусу" (соль, перец) ищутся по тексту, но не считаются обязательными
+            required = {}
+            for ing in recipe.get("ingredients", []):
+                product = canonical_name(ing.get("name", ""))
+                terms.update(("ingredient", t) for t in text_terms(product))
+                terms.update(("ingredient", t) for t in text_terms(ing.get("name", "")))
+                if ing.get("unit") != TO_TASTE:
+                    required[product] = None
+            for term in terms:
+                self._terms.setdefault(term, array('I')).append(doc)
+            for product in required:
+                self._ingredients.setdefault(product, array('I')).append(doc)
+            self._required.append(len(required))
+            self._doc_ingredients.append(tuple(required))
+
+    def remove(self, recipe_id):
+        with self._lock:
+            doc = self._doc_of.pop(recipe_id, None)
+            if doc is None:
+                return
+            self._alive[doc] = 0
+            self._doc_ingredients[doc] = ()
+            self._dead += 1
+
+    def rebuild(self, recipes):
+        """Строим индекс заново по списку рецептов"""
+        with self._lock:
+            self._reset()
+            for recipe in recipes:
+                self.add(recipe)
+
+    def _ensure_fresh(self):
+        if self._store is None:
+            return
+        # Чужие записи хранилище передает событиями при refresh()
+        self._store.refresh()
+        if not (self._stale or self._dead > max(1000, len(self._doc_of))):
+            return
+        # Снимок берем без блокировки индекса: запись в хранилище сама ждет блокировку индекса
+        version = self._store.version
+        recipes = self._store.snapshot()
+        with self._lock:
+            self.rebuild(recipes)
+            if self._store.version != version:
+                self._stale = True
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    # --- Запросы ---
+
+    # Массивы копируем: пока numpy держит буфер array/bytearray, их нельзя дописывать
+    def _alive_mask(self):
+        return np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+
+    def _postings(self, key, table):
+        posting = table.get(key)
+        return np.frombuffer(posting, dtype=np.uint32).copy() if posting else np.empty(0, dtype=np.uint32)
+
+    def search(self, query, limit=50):
+        """Полнотекстовый поиск: рецепты со всеми словами запроса (в любом поле).
+
+        Возвращает [(id рецепта, оценка)] по убыванию оценки; совпадение в
+        названии весит больше, чем в ингредиентах и шагах. limit=None - все.
+        """
+        self._ensure_fresh()
+        terms = text_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            alive = self._alive_mask()
+            scores = np.zeros(len(self._ids), dtype=np.int32)
+            matched = None
+            for term in terms:
+                docs_for_term = []
+                for field, weight in FIELD_WEIGHTS.items():
+                    docs = self._postings((field, term), self._terms)
+                    scores[docs] += weight
+                    docs_for_term.append(docs)
+                docs = np.unique(np.concatenate(docs_for_term))
+                matched = docs if matched is None else np.intersect1d(matched, docs, assume_unique=True)
+                if not len(matched):
+                    return []
+            matched = matched[alive[matched]]
+            order = np.lexsort((matched, -scores[matched]))[:limit]
+            return [(self._ids[doc], int(scores[doc])) for doc in matched[order]]
+
+    def pantry(self, products, max_missing=None, limit=50):
+        """Что приготовить из имеющихся продуктов.
+
+        Возвращает [(id рецепта, сколько не хватает, каких продуктов)] -
+        сначала рецепты, где не хватает меньше всего. Рецепты без единого
+        совпадения не попадают в выдачу. limit=None - все.
+        """
+        return [(recipe_id, missing, self.missing_products(recipe_id, products))
+                for recipe_id, missing in self.pantry_ranking(products, max_missing, limit)]
+
+    def pantry_ranking(self, products, max_missing=None, limit=50):
+        """Как pantry, но без списков продуктов: [(id рецепта, сколько не хватает)]"""
+        self._ensure_fresh()
+        have = _products(products)
+        if not have:
+            return []
+        with self._lock:
+            n_docs = len(self._ids)
+            postings = [self._postings(product, self._ingredients) for product in have]
+            hits = np.bincount(np.concatenate(postings), minlength=n_docs) if postings else np.zeros(n_docs)
+            required = np.frombuffer(self._required, dtype=np.uint16).astype(np.int64)
+            candidates = np.flatnonzero((hits > 0) & self._alive_mask())
+            missing = required[candidates] - hits[candidates]
+            if max_missing is not None:
+                keep = missing <= max_missing
+                candidates, missing = candidates[keep], missing[keep]
+            order = np.lexsort((candidates, -hits[candidates], missing))[:limit]
+            return [(self._ids[doc], miss) for doc, miss in zip(candidates[order].tolist(), missing[order].tolist())]
+
+    def missing_products(self, recipe_id, products):
+        """Каких продуктов рецепту не хватает (без "по вкусу")"""
+        have = _products(products)
+        with self._lock:
+            doc = self._doc_of.get(recipe_id)
+            return [] if doc is None else [p for p in self._doc_ingredients[doc] if p not in have]
+
+
+def _products(products):
+    return {canonical_name(p) for p in products if str(p).strip()}
@@ -0,0 +1,1087 @@
+"""Хранилища рецептов: журнал JSON Lines и база SQLite с общим интерфейсом"""
+import io
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from recipe_columns import EMPTY, RecipeTable
+from recipe_schema import recipe_categories
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: блокировки файла между процессами нет
+    fcntl = None
+
+LOG_PATH = 'my_recipes.jsonl'
+EXPORT_PATH = 'my_recipes.json'
+DB_PATH = 'my_recipes.db'
+# Сколько изменений журнал держит словарями, прежде чем влить их в таблицу
+PENDING_MIN_RECORDS = 1000
+
+
+class RecipeStore:
+    """Общий интерфейс хранилищ рецептов.
+
+    Наследники реализуют all/get/add/delete/clear; фильтрация по умолчанию
+    идет простым перебором и переопределяется там, где есть индексы.
+
+    snapshot() отдает один общий на процесс неизменяемый снимок всех рецептов -
+    колоночную таблицу RecipeTable (см. recipe_columns). Снимок пересобирается
+    только после записи через это хранилище (version) или когда данные
+    поменял кто-то другой (другой процесс).
+
+    Чужие изменения хранилище замечает, сравнивая данные с тем, какими они
+    должны быть после его собственных записей (размер журнала, счетчик
+    изменений базы). Перед записью хранилище догоняет чужие изменения, иначе
+    его запись скрыла бы их.
+
+    Через subscribe() можно следить за изменениями: слушатель получает
+    ("put", [рецепты]), ("delete", id) или ("reset", None), если данные
+    перечитаны или очищены целиком.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._snapshot = None
+        self._snapshot_lock = threading.Lock()
+        self._query_cache = {}
+        self._listeners = []
+
+    def _external_change(self):
+        """Менял ли данные кто-то помимо этого объекта; по умолчанию следить не за чем"""
+        return False
+
+    def _reload(self):
+        """Перечитываем данные после изменения извне"""
+
+    def subscribe(self, listener):
+        """Слушатель изменений: listener(event, payload)"""
+        self._listeners.append(listener)
+
+    def _notify(self, event, payload=None):
+        for listener in self._listeners:
+            listener(event, payload)
+
+    def _touch(self, event, payload=None):
+        """Отмечаем собственную запись: снимок устарел, но перечитывать данные не нужно"""
+        self.version += 1
+        self._notify(event, payload)
+
+    def refresh(self):
+        """Проверяем данные и перечитываем их, если их изменил кто-то другой"""
+        if self._external_change():
+            self._reload()
+            self.version += 1
+            self._notify("reset")
+
+    def snapshot(self):
+        """Таблица всех рецептов - общая для всех сессий; словари рецептов
+        собираются из нее по одному при обращении"""
+        with self._snapshot_lock:
+            self.refresh()
+            if self._snapshot is None or self._snapshot[0] != self.version:
+                self._snapshot = (self.version, self._build_snapshot())
+            return self._snapshot[1]
+
+    def _build_snapshot(self):
+        return RecipeTable.from_recipes(self.all())
+
+    def all(self):
+        raise NotImplementedError
+
+    def get(self, recipe_id):
+        raise NotImplementedError
+
+    def add(self, recipe):
+        raise NotImplementedError
+
+    def add_many(self, recipes):
+        for recipe in recipes:
+            self.add(recipe)
+
+    def delete(self, recipe_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return len(self.all())
+
+    def __contains__(self, recipe_id):
+        return self.get(recipe_id) is not None
+
+    def find(self, author=None, category=None, difficulty=None, max_cooking_time=None):
+        """Рецепты, подходящие под все заданные фильтры (None - без фильтра)"""
+        recipes = self.snapshot()
+        return [recipes[row] for row in recipes.rows(author=author, category=category, difficulty=difficulty,
+                                                     max_cooking_time=max_cooking_time)]
+
+    def query(self, offset=0, limit=None, author=None, category=None, difficulty=None,
+              max_cooking_time=None):
+        """Страница рецептов под фильтрами: (сколько всего найдено, рецепты страницы).
+
+        Фильтры - векторные, по колонкам снимка; номера подходящих строк
+        кэшируются до следующего изменения данных, а словари собираются
+        только для рецептов страницы.
+        """
+        recipes = self.snapshot()
+        filters = (author, category, difficulty, max_cooking_time)
+        if any(f is not None for f in filters):
+            matched = self._cached(('query',) + filters, lambda: recipes.rows(
+                author=author, category=category, difficulty=difficulty, max_cooking_time=max_cooking_time))
+        else:
+            matched = range(len(recipes))
+        end = None if limit is None else offset + limit
+        return len(matched), [recipes[row] for row in matched[offset:end]]
+
+    def query_ids(self, recipe_ids, offset=0, limit=None, author=None, category=None, difficulty=None,
+                  max_cooking_time=None):
+        """Страница рецептов из списка ID (в его порядке) под фильтрами: (сколько подошло, рецепты страницы).
+
+        ID сопоставляются со строками снимка, фильтры - та же маска, что у
+        query; словари собираются только для рецептов страницы.
+        """
+        recipes = self.snapshot()
+        rows = recipes.find_rows(recipe_ids)
+        rows = rows[rows >= 0]
+        filters = (author, category, difficulty, max_cooking_time)
+        if any(f is not None for f in filters):
+            mask = self._cached(('mask',) + filters, lambda: recipes.mask(
+                author=author, category=category, difficulty=difficulty, max_cooking_time=max_cooking_time))
+            rows = rows[mask[rows]]
+        end = None if limit is None else offset + limit
+        return len(rows), [recipes[row] for row in rows[offset:end].tolist()]
+
+    def facets(self):
+        """Значения для фильтров: авторы и категории, встречающиеся в рецептах"""
+        recipes = self.snapshot()
+
+        def build():
+            authors = [author for author in recipes.values("author") if author]
+            return {"authors": sorted(authors), "categories": sorted(recipes.values("category"))}
+
+        return self._cached(('facets',), build)
+
+    def _cached(self, key, build):
+        # Кэш живет до смены версии данных
+        cache = self._query_cache
+        if cache.get('version') != self.version:
+            cache = self._query_cache = {'version': self.version}
+        if key not in cache:
+            cache[key] = build()
+        return cache[key]
+
+    def export_json(self, path=EXPORT_PATH):
+        """Выгружаем все рецепты в my_recipes.json (формат прежних версий)"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.all(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+
+def file_state(path):
+    """(inode, размер) файла или None, если его нет"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size
+
+
+def matches_filters(recipe, author=None, category=None, difficulty=None, max_cooking_time=None):
+    if author is not None and recipe.get('author') != author:
+        return False
+    if category is not None and category not in recipe_categories(recipe):
+        return False
+    if difficulty is not None and recipe.get('difficulty') != difficulty:
+        return False
+    if max_cooking_time is not None:
+        # Время, которое не число (None, строка из старых файлов), фильтром не отсекается - как в RecipeTable.mask
+        cooking_time = recipe.get('cooking_time', 0)
+        if isinstance(cooking_time, (int, float)) and cooking_time > max_cooking_time:
+            return False
+    return True
+
+
+class RecipeLog(RecipeStore):
+    """Журнал рецептов: каждое сохранение и удаление дописывается одной строкой в конец файла.
+
+    Актуальное состояние держим в памяти: колоночная таблица RecipeTable плюс
+    словари изменений после ее сборки (новые, замененные и удаленные рецепты),
+    поэтому запись стоит одинаково при любом размере коллекции. Изменения
+    вливаются в новую таблицу, когда их накопится достаточно или понадобится
+    снимок. Когда «мертвых» строк в журнале становится больше, чем живых
+    рецептов, журнал переписывается в фоновом потоке.
+
+    Один журнал могут держать несколько процессов (приложение и API). Запись,
+    уплотнение и очистка идут под flock файла-замка рядом с журналом; под ним
+    хранилище сначала дочитывает чужие строки, а если файл подменили
+    (уплотнение или очистка в другом процессе) - открывает его заново.
+    Без fcntl (Windows) блокировки между процессами нет - см. SHARED_SAFE.
+    """
+
+    # Можно ли писать в один журнал из нескольких процессов
+    SHARED_SAFE = fcntl is not None
+
+    def __init__(self, log_path=LOG_PATH, export_path=EXPORT_PATH, compact_min_records=1000):
+        self.log_path = log_path
+        self.export_path = export_path
+        self.compact_min_records = compact_min_records
+        self._lock = threading.RLock()
+        self._lock_file = open(self.log_path + '.lock', 'ab')
+        self._lock_depth = 0
+        self._reset()
+        self._compacting = False
+        self._generation = 0
+        with self._file_lock():
+            self._load()
+            self._log = open(self.log_path, 'ab')
+        super().__init__()
+
+    @contextmanager
+    def _file_lock(self):
+        """Блокировка журнала между процессами (внутри процесса - self._lock)"""
+        with self._lock:
+            if fcntl is not None and self._lock_depth == 0:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if fcntl is not None and self._lock_depth == 0:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _writing(self):
+        """Запись в журнал: под блокировкой догоняем чужие записи, чтобы дописывать в тот же файл"""
+        with self._file_lock():
+            self.refresh()
+            if file_state(self.log_path) != self._seen:
+                # Оборванная чужая строка (сбой посреди записи) - закрываем ее, чтобы не испортить свою
+                self._log.write(b'\n')
+                self._log.flush()
+                self._dead_records += 1
+                self._seen = file_state(self.log_path)
+            yield
+
+    def refresh(self):
+        """Догоняем чужие изменения: дописанные строки применяем, подмененный файл перечитываем"""
+        with self._lock:
+            state = file_state(self.log_path)
+            if state == self._seen:
+                return
+            inode, size = self._seen
+            data = None
+            if state is not None and state[0] == inode and state[1] >= size:
+                with open(self.log_path, 'rb') as f:
+                    # Файл могли подменить между stat и open
+                    if os.fstat(f.fileno()).st_ino == inode:
+                        f.seek(size)
+                        data = f.read(state[1] - size)
+            if data is None:
+                # Файл подменили или обрезали - перечитываем целиком
+                self._reload()
+                self.version += 1
+                self._notify("reset")
+                return
+            records, consumed = self._apply_lines(io.BytesIO(data))
+            if not consumed:
+                return
+            self._seen = (inode, size + consumed)
+            self.version += 1
+            for record in records:
+                if record.get('op') == 'put':
+                    self._notify("put", [record['recipe']])
+                elif record.get('op') == 'delete':
+                    self._notify("delete", record['id'])
+
+    def _reload(self):
+        # Файл могли подменить целиком (уплотнение в другом процессе) - открываем заново
+        with self._lock:
+            self._log.close()
+            self._reset()
+            self._generation += 1
+            self._load()
+            self._log = open(self.log_path, 'ab')
+
+    def _reset(self):
+        self._table = EMPTY
+        self._added = {}        # id -> рецепт, добавленный после сборки таблицы
+        self._replaced = {}     # id -> новая версия рецепта из таблицы (место в порядке то же)
+        self._deleted = set()   # id удаленных рецептов таблицы
+        self._dead_records = 0
+
+    # --- Загрузка ---
+
+    def _load(self):
+        # Первый запуск: переносим рецепты из старого my_recipes.json в журнал
+        if not os.path.exists(self.log_path):
+            recipes = {}
+            for recipe in self._read_export():
+                # Для совместимости со старыми рецептами без ID
+                recipe.setdefault('id', str(uuid.uuid4()))
+                recipes[recipe['id']] = recipe
+            self._replace_log(list(recipes.values()))
+            self._added = recipes
+            self._merge()
+            self._seen = file_state(self.log_path)
+            return
+
+        with open(self.log_path, 'rb') as f:
+            _, consumed = self._apply_lines(f)
+            # Сколько прочитали - столько и считаем своим: дописанное позже заметит refresh()
+            self._seen = (os.fstat(f.fileno()).st_ino, consumed)
+        self._merge()
+
+    def _apply_lines(self, lines):
+        """Применяем строки журнала (bytes) до первой недописанной: (записи, сколько байт прочитано)"""
+        records, consumed = [], 0
+        for line in lines:
+            if not line.endswith(b'\n'):
+                # Строку, которую другой процесс еще дописывает, оставляем до следующего раза;
+                # оборванную при сбое закроет следующая запись (_writing)
+                break
+            consumed += len(line)
+            line = line.decode('utf-8').strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Оборванная строка (например, после сбоя) - пропускаем
+                self._dead_records += 1
+                continue
+            self._apply(record)
+            self._maybe_merge()
+            records.append(record)
+        return records, consumed
+
+    def _read_export(self):
+        if not os.path.exists(self.export_path) or os.path.getsize(self.export_path) == 0:
+            return []
+        with open(self.export_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        return json.loads(content) if content else []
+
+    def _apply(self, record):
+        op = record.get('op')
+        if op == 'put':
+            recipe = record['recipe']
+            recipe_id = recipe['id']
+            if recipe_id in self._added:
+                self._dead_records += 1
+                self._added[recipe_id] = recipe
+            elif self._in_table(recipe_id):
+                self._dead_records += 1
+                self._replaced[recipe_id] = recipe
+            else:
+                self._added[recipe_id] = recipe
+        elif op == 'delete':
+            # И запись об удалении, и удаленный рецепт больше не нужны
+            if self._remove(record['id']):
+                self._dead_records += 1
+            self._dead_records += 1
+        else:
+            self._dead_records += 1
+
+    def _in_table(self, recipe_id):
+        return recipe_id not in self._deleted and self._table.find(recipe_id) is not None
+
+    def _remove(self, recipe_id):
+        if self._added.pop(recipe_id, None) is not None:
+            return True
+        if not self._in_table(recipe_id):
+            return False
+        self._replaced.pop(recipe_id, None)
+        self._deleted.add(recipe_id)
+        return True
+
+    # --- Таблица ---
+
+    def _maybe_merge(self):
+        pending = len(self._added) + len(self._replaced) + len(self._deleted)
+        if pending >= max(PENDING_MIN_RECORDS, len(self._table) // 8):
+            self._merge()
+
+    def _merge(self):
+        """Вливаем накопленные изменения в новую таблицу (старая остается у тех, кто ее взял)"""
+        with self._lock:
+            if not (self._added or self._replaced or self._deleted):
+                return
+            table = self._table
+            pending = RecipeTable.from_recipes(list(self._replaced.values()) + list(self._added.values()))
+            merged = RecipeTable.concat([table, pending])
+            if self._replaced or self._deleted:
+                # Замененный рецепт встает на место прежней версии, удаленные выпадают
+                order = np.arange(len(merged))
+                keep = np.ones(len(merged), dtype=bool)
+                for i, recipe_id in enumerate(self._replaced):
+                    keep[len(table) + i] = False
+                    order[table.find(recipe_id)] = len(table) + i
+                for recipe_id in self._deleted:
+                    keep[table.find(recipe_id)] = False
+                merged = merged.take(order[keep])
+            self._table = merged
+            self._added, self._replaced, self._deleted = {}, {}, set()
+
+    def _build_snapshot(self):
+        with self._lock:
+            self._merge()
+            return self._table
+
+    # --- Чтение ---
+
+    def all(self):
+        """Список всех рецептов в порядке добавления"""
+        with self._lock:
+            self._merge()
+            table = self._table
+        return list(table)
+
+    def get(self, recipe_id):
+        with self._lock:
+            for pending in (self._added, self._replaced):
+                if recipe_id in pending:
+                    return pending[recipe_id]
+            if recipe_id in self._deleted:
+                return None
+            row = self._table.find(recipe_id)
+            return None if row is None else self._table[row]
+
+    def __len__(self):
+        return len(self._table) - len(self._deleted) + len(self._added)
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self._added or self._in_table(recipe_id)
+
+    # --- Запись ---
+
+    def _append(self, records):
+        """Дописываем строки в журнал; ожидаемый размер файла растет ровно на них"""
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        self._log.write(data)
+        self._log.flush()
+        inode, size = self._seen
+        self._seen = (inode, size + len(data))
+
+    def add(self, recipe):
+        """Добавляем (или заменяем) рецепт - одна строка в журнале"""
+        with self._writing():
+            self._append([{"op": "put", "recipe": recipe}])
+            self._apply({"op": "put", "recipe": recipe})
+            self._maybe_merge()
+            self._touch("put", [recipe])
+        self._maybe_compact()
+
+    def add_many(self, recipes):
+        """Добавляем пачку рецептов одной записью в файл"""
+        recipes = list(recipes)
+        records = [{"op": "put", "recipe": recipe} for recipe in recipes]
+        with self._writing():
+            self._append(records)
+            for record in records:
+                self._apply(record)
+            self._maybe_merge()
+            self._touch("put", recipes)
+        self._maybe_compact()
+
+    def delete(self, recipe_id):
+        """Удаляем рецепт по ID, возвращаем удаленный рецепт или None"""
+        with self._writing():
+            recipe = self.get(recipe_id)
+            if recipe is None:
+                return None
+            self._append([{"op": "delete", "id": recipe_id}])
+            self._apply({"op": "delete", "id": recipe_id})
+            self._maybe_merge()
+            self._touch("delete", recipe_id)
+        self._maybe_compact()
+        return recipe
+
+    def clear(self):
+        """Удаляем все рецепты - журнал подменяется пустым файлом.
+
+        Новый файл (а не обрезка старого) - чтобы другие процессы по смене
+        inode поняли, что журнал начался заново.
+        """
+        with self._writing():
+            self._log.close()
+            self._replace_log([])
+            self._log = open(self.log_path, 'ab')
+            self._reset()
+            self._seen = file_state(self.log_path)
+            self._generation += 1
+            self._touch("reset")
+
+    # --- Уплотнение и выгрузка ---
+
+    def _maybe_compact(self):
+        with self._lock:
+            if self._compacting:
+                return
+            if self._dead_records < max(self.compact_min_records, len(self)):
+                return
+            self._compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Переписываем журнал, оставляя только живые рецепты.
+
+        Снимок пишется без блокировки; строки, дописанные за это время (в том
+        числе другими процессами), переносятся в новый файл перед подменой -
+        уже под блокировкой журнала.
+        """
+        tmp_path = f"{self.log_path}.{uuid.uuid4().hex}.compact"
+        try:
+            with self._lock:
+                self._compacting = True
+                self.refresh()
+                self._merge()
+                # Таблица неизменяема - пишем ее без блокировки
+                snapshot = self._table
+                self._log.flush()
+                offset = self._seen[1]
+                dead_before = self._dead_records
+                generation = self._generation
+
+            self._write_snapshot(tmp_path, snapshot)
+
+            with self._writing():
+                if generation != self._generation:
+                    # Журнал очистили, перечитали или уже уплотнили, пока писали снимок, -
+                    # смещение относится к прежнему файлу, снимок не нужен
+                    return
+                self._log.flush()
+                with open(self.log_path, 'rb') as src, open(tmp_path, 'ab') as dst:
+                    src.seek(offset)
+                    dst.write(src.read())
+                self._log.close()
+                os.replace(tmp_path, self.log_path)
+                self._log = open(self.log_path, 'ab')
+                self._generation += 1
+                self._dead_records -= dead_before
+                # Содержимое не изменилось - только файл, снимок пересобирать не нужно
+                st = os.fstat(self._log.fileno())
+                self._seen = (st.st_ino, st.st_size)
+        finally:
+            self._compacting = False
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _write_snapshot(path, recipes):
+        with open(path, 'w', encoding='utf-8') as f:
+            for recipe in recipes:
+                f.write(json.dumps({"op": "put", "recipe": recipe}, ensure_ascii=False) + '\n')
+
+    def _replace_log(self, recipes):
+        """Журнал из рецептов целиком: пишем рядом и подменяем одним rename"""
+        tmp_path = f"{self.log_path}.{uuid.uuid4().hex}.tmp"
+        self._write_snapshot(tmp_path, recipes)
+        os.replace(tmp_path, self.log_path)
+
+    def export_json(self, path=None):
+        return super().export_json(path or self.export_path)
+
+    def close(self):
+        with self._lock:
+            self._log.close()
+            self._lock_file.close()
+
+
+# Порядок ключей рецепта из make_recipe: для такого рецепта порядок ключей не храним
+RECIPE_LAYOUT = ("id", "name", "author", "categories", "difficulty", "cooking_time", "servings",
+                 "ingredients", "instructions", "created_date")
+INGREDIENT_COLUMNS = ("name", "amount", "unit", "needs_preparation")
+SQLITE_MAX_INT = 2 ** 63 - 1
+
+
+def _is_sqlite_int(value):
+    return type(value) is int and -SQLITE_MAX_INT <= value <= SQLITE_MAX_INT
+
+
+def _is_str_list(value):
+    return type(value) is list and all(type(item) is str for item in value)
+
+
+def _ingredient_row(ing):
+    """Колонки таблицы ingredients (без recipe_id и позиции) или None,
+    если ингредиент в них без потерь не укладывается"""
+    if type(ing) is not dict or list(ing)[:3] != ["name", "amount", "unit"]:
+        return None
+    if "needs_preparation" in ing and (list(ing)[3] != "needs_preparation"
+                                       or type(ing["needs_preparation"]) is not bool):
+        return None
+    name, amount, unit = ing["name"], ing["amount"], ing["unit"]
+    if not (name is None or type(name) is str) or not (unit is None or type(unit) is str):
+        return None
+    if not (amount is None or type(amount) in (str, float) or _is_sqlite_int(amount)):
+        return None
+    prep = ing.get("needs_preparation")
+    extra = {k: v for k, v in ing.items() if k not in INGREDIENT_COLUMNS}
+    return (name, amount, unit, None if prep is None else int(prep),
+            json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+class SQLiteRecipeStore(RecipeStore):
+    """Рецепты в SQLite: отдельные таблицы для рецептов, категорий, ингредиентов и шагов.
+
+    База открывается в режиме WAL, поэтому несколько сессий (и процессов) могут
+    писать одновременно, а чтение не блокируется записью. У каждого потока
+    свое соединение.
+
+    Каждая запись оставляет в таблице changes свои операции (put/delete по id),
+    поэтому чужие записи доходят до слушателей теми же событиями "put" и
+    "delete", что и свои. "reset" остается для очистки и для случая, когда
+    нужная часть журнала изменений уже удалена.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS recipes (
+            pk INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            name TEXT,
+            author TEXT,
+            difficulty TEXT,
+            cooking_time INTEGER,
+            created_date TEXT,
+            extra TEXT,
+            layout TEXT
+        );
+        CREATE TABLE IF NOT EXISTS recipe_categories (
+            recipe_id TEXT NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            category TEXT,
+            PRIMARY KEY (recipe_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS ingredients (
+            recipe_id TEXT NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            name TEXT,
+            amount,
+            unit TEXT,
+            needs_preparation INTEGER,
+            extra TEXT,
+            PRIMARY KEY (recipe_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS instructions (
+            recipe_id TEXT NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            step TEXT,
+            PRIMARY KEY (recipe_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_recipes_author ON recipes(author);
+        CREATE INDEX IF NOT EXISTS idx_recipes_difficulty ON recipes(difficulty);
+        CREATE INDEX IF NOT EXISTS idx_recipes_cooking_time ON recipes(cooking_time);
+        CREATE INDEX IF NOT EXISTS idx_categories_category ON recipe_categories(category);
+        -- Счетчик изменений: каждая запись увеличивает его в своей транзакции
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+        INSERT OR IGNORE INTO meta VALUES ('data_version', 0);
+        -- Что поменяла каждая запись: по нему другие процессы догоняют изменения
+        CREATE TABLE IF NOT EXISTS changes (data_version INTEGER NOT NULL, op TEXT NOT NULL, id TEXT);
+        CREATE INDEX IF NOT EXISTS idx_changes_version ON changes(data_version);
+    """
+
+    # Ключи, которые раскладываются по колонкам; остальное уходит в extra (JSON).
+    # Значение другого типа (время строкой, ID числом) тоже кладем в extra как есть,
+    # а в колонку - то, по чему работают фильтры
+    COLUMNS = ("id", "name", "author", "difficulty", "cooking_time", "created_date")
+    CHILDREN = ("categories", "ingredients", "instructions")
+    # Журнал изменений хранится за столько последних записей
+    CHANGES_KEEP = 1000
+    # Колонки, добавленные после первой версии схемы: старым базам их дописываем
+    ADDED_COLUMNS = (("recipes", "layout"), ("ingredients", "extra"))
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+        self._upgrade()
+        self._seen_version = self._data_version()
+        super().__init__()
+
+    def _upgrade(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for table, column in self.ADDED_COLUMNS:
+                if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+    def _data_version(self):
+        return self._connect().execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+
+    def refresh(self):
+        """Догоняем чужие записи по журналу изменений"""
+        if self._data_version() == self._seen_version:
+            return
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                # Версия, журнал и рецепты - из одного снимка базы
+                conn.execute("BEGIN")
+                current = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+                events = self._changes(conn, current)
+                self._seen_version = current
+        self._publish(events)
+
+    def _changes(self, conn, current):
+        """События для чужих записей после увиденной версии до current.
+
+        По каждому id берем последнюю операцию; измененные рецепты читаем
+        целиком. Если журнал неполон (очищен, записи удалены за давностью)
+        или в нем очистка, отдаем один "reset".
+        """
+        seen = self._seen_version
+        if current == seen:
+            return []
+        rows = conn.execute("SELECT data_version, op, id FROM changes WHERE data_version > ? "
+                            "ORDER BY data_version, rowid", (seen,)).fetchall()
+        if len({version for version, _, _ in rows}) != current - seen or any(op == "reset" for _, op, _ in rows):
+            return [("reset", None)]
+        last = {}
+        for _, op, recipe_id in rows:
+            last.pop(recipe_id, None)
+            last[recipe_id] = op
+        put = [recipe_id for recipe_id, op in last.items() if op == "put"]
+        recipes = []
+        for start in range(0, len(put), 500):
+            chunk = put[start:start + 500]
+            recipes.extend(self._select(f"WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        events = [("delete", recipe_id) for recipe_id, op in last.items() if op == "delete"]
+        if recipes:
+            events.append(("put", recipes))
+        return events
+
+    def _publish(self, events):
+        if events:
+            self.version += 1
+        for event, payload in events:
+            self._notify(event, payload)
+
+    @contextmanager
+    def _transaction(self, changes):
+        """Транзакция записи; changes - ее операции [(op, id)] для журнала изменений.
+
+        Под блокировкой записи базы сверяем счетчик изменений: если до нас
+        писал кто-то другой, сначала передаем слушателям его изменения -
+        иначе наша запись скрыла бы их.
+        """
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                before = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+                events = self._changes(conn, before)
+                yield conn
+                version = before + 1
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'data_version'", (version,))
+                conn.executemany("INSERT INTO changes VALUES (?, ?, ?)",
+                                 [(version, op, recipe_id) for op, recipe_id in changes])
+                conn.execute("DELETE FROM changes WHERE data_version <= ?", (version - self.CHANGES_KEEP,))
+            self._seen_version = version
+        self._publish(events)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # --- Запись ---
+
+    def add(self, recipe):
+        self.add_many([recipe])
+
+    def add_many(self, recipes):
+        """Добавляем (или заменяем) рецепты одной транзакцией"""
+        recipes = list(recipes)
+        if not recipes:
+            return
+        rows, categories, ingredients, steps = [], [], [], []
+        for recipe in recipes:
+            rid = recipe['id']
+            extra = {k: v for k, v in recipe.items() if k not in self.COLUMNS and k not in self.CHILDREN}
+            columns = []
+            for key in self.COLUMNS:
+                value = recipe.get(key)
+                if key == "cooking_time":
+                    exact = value is None or _is_sqlite_int(value)
+                    number = isinstance(value, (int, float)) and abs(value) <= SQLITE_MAX_INT
+                    columns.append(value if exact else float(value) if number else None)
+                else:
+                    exact = type(value) is str or (value is None and key != "id")
+                    columns.append(value if exact else str(value) if key == "id" else None)
+                if not exact:
+                    extra[key] = value
+
+            # Категории-строки нужны фильтру и при нестандартном значении поля
+            categories.extend((rid, i, c) for i, c in enumerate(
+                c for c in recipe_categories(recipe) if isinstance(c, str)))
+            if 'categories' in recipe and not _is_str_list(recipe['categories']):
+                extra['categories'] = recipe['categories']
+            items = recipe.get('ingredients', [])
+            item_rows = [_ingredient_row(ing) for ing in items] if type(items) is list else [None]
+            if None in item_rows:
+                extra['ingredients'] = items
+            else:
+                ingredients.extend((rid, i) + row for i, row in enumerate(item_rows))
+            if _is_str_list(recipe.get('instructions', [])):
+                steps.extend((rid, i, step) for i, step in enumerate(recipe.get('instructions', [])))
+            else:
+                extra['instructions'] = recipe['instructions']
+
+            layout = None if tuple(recipe) == RECIPE_LAYOUT else json.dumps(list(recipe), ensure_ascii=False)
+            rows.append(tuple(columns) + (json.dumps(extra, ensure_ascii=False) if extra else None, layout))
+
+        with self._transaction([("put", str(recipe['id'])) for recipe in recipes]) as conn:
+            ids = [(recipe['id'],) for recipe in recipes]
+            # UPSERT сохраняет позицию рецепта при замене; дочерние строки пишем заново
+            conn.executemany(
+                "INSERT INTO recipes (id, name, author, difficulty, cooking_time, created_date, extra, layout) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                "name=excluded.name, author=excluded.author, difficulty=excluded.difficulty, "
+                "cooking_time=excluded.cooking_time, created_date=excluded.created_date, "
+                "extra=excluded.extra, layout=excluded.layout",
+                rows,
+            )
+            for table in ("recipe_categories", "ingredients", "instructions"):
+                conn.executemany(f"DELETE FROM {table} WHERE recipe_id = ?", ids)
+            conn.executemany("INSERT INTO recipe_categories VALUES (?, ?, ?)", categories)
+            conn.executemany("INSERT INTO ingredients VALUES (?, ?, ?, ?, ?, ?, ?)", ingredients)
+            conn.executemany("INSERT INTO instructions VALUES (?, ?, ?)", steps)
+        self._touch("put", recipes)
+
+    def delete(self, recipe_id):
+        recipe = self.get(recipe_id)
+        if recipe is None:
+            return None
+        with self._transaction([("delete", str(recipe_id))]) as conn:
+            conn.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+        self._touch("delete", recipe_id)
+        return recipe
+
+    def clear(self):
+        with self._transaction([("reset", None)]) as conn:
+            conn.execute("DELETE FROM recipes")
+        self._touch("reset")
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- Чтение ---
+
+    def _select(self, where="", params=(), limit=None, offset=0):
+        conn = self._connect()
+        sql = ("SELECT id, name, author, difficulty, cooking_time, created_date, extra, layout "
+               f"FROM recipes r {where} ORDER BY pk")
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = list(params) + [limit, offset]
+        rows = conn.execute(sql, params).fetchall()
+        return self._hydrate(conn, rows)
+
+    def _hydrate(self, conn, rows):
+        """Собираем словари рецептов из строк recipes и дочерних таблиц"""
+        recipes = {}
+        for rid, name, author, difficulty, cooking_time, created_date, extra, layout in rows:
+            values = {"id": rid, "name": name, "author": author, "categories": [], "difficulty": difficulty,
+                      "cooking_time": cooking_time, "ingredients": [], "instructions": [],
+                      "created_date": created_date}
+            extra = json.loads(extra) if extra else {}
+            # Без layout - порядок make_recipe, лишние ключи в конце
+            keys = json.loads(layout) if layout else RECIPE_LAYOUT + tuple(k for k in extra if k not in RECIPE_LAYOUT)
+            recipes[rid] = (values, extra, keys)
+
+        ids = list(recipes)
+        # Дочерние строки догружаем пачками, чтобы не упереться в лимит параметров
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            for rid, category in conn.execute(
+                    f"SELECT recipe_id, category FROM recipe_categories WHERE recipe_id IN ({marks}) "
+                    "ORDER BY recipe_id, position", chunk):
+                recipes[rid][0]["categories"].append(category)
+            for rid, name, amount, unit, prep, extra in conn.execute(
+                    f"SELECT recipe_id, name, amount, unit, needs_preparation, extra FROM ingredients "
+                    f"WHERE recipe_id IN ({marks}) ORDER BY recipe_id, position", chunk):
+                ing = {"name": name, "amount": amount, "unit": unit}
+                if prep is not None:
+                    ing["needs_preparation"] = bool(prep)
+                if extra:
+                    ing.update(json.loads(extra))
+                recipes[rid][0]["ingredients"].append(ing)
+            for rid, step in conn.execute(
+                    f"SELECT recipe_id, step FROM instructions WHERE recipe_id IN ({marks}) "
+                    "ORDER BY recipe_id, position", chunk):
+                recipes[rid][0]["instructions"].append(step)
+
+        result = []
+        for values, extra, keys in recipes.values():
+            values.update(extra)
+            result.append({key: values[key] for key in keys if key in values})
+        return result
+
+    def all(self):
+        return self._select()
+
+    def get(self, recipe_id):
+        found = self._select("WHERE id = ?", (recipe_id,))
+        return found[0] if found else None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def __contains__(self, recipe_id):
+        return self._connect().execute(
+            "SELECT 1 FROM recipes WHERE id = ?", (recipe_id,)).fetchone() is not None
+
+    @staticmethod
+    def _where(author=None, category=None, difficulty=None, max_cooking_time=None):
+        clauses, params = [], []
+        if author is not None:
+            clauses.append("author = ?")
+            params.append(author)
+        if difficulty is not None:
+            clauses.append("difficulty = ?")
+            params.append(difficulty)
+        if max_cooking_time is not None:
+            # Как matches_filters: время не числом (NULL в колонке) фильтр не отсекает
+            clauses.append("(cooking_time IS NULL OR cooking_time <= ?)")
+            params.append(max_cooking_time)
+        if category is not None:
+            clauses.append("EXISTS (SELECT 1 FROM recipe_categories c "
+                           "WHERE c.recipe_id = r.id AND c.category = ?)")
+            params.append(category)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def find(self, author=None, category=None, difficulty=None, max_cooking_time=None):
+        """Фильтрация по индексам author/difficulty/cooking_time/category"""
+        return self._select(*self._where(author, category, difficulty, max_cooking_time))
+
+    def query(self, offset=0, limit=None, author=None, category=None, difficulty=None,
+              max_cooking_time=None):
+        """Страница рецептов прямо из базы: COUNT и LIMIT/OFFSET по индексам"""
+        where, params = self._where(author, category, difficulty, max_cooking_time)
+        total = self._connect().execute(f"SELECT COUNT(*) FROM recipes r {where}", params).fetchone()[0]
+        page = self._select(where, params, limit=-1 if limit is None else limit, offset=offset)
+        return total, page
+
+    def query_ids(self, recipe_ids, offset=0, limit=None, author=None, category=None, difficulty=None,
+                  max_cooking_time=None):
+        """Страница рецептов из списка ID: фильтры проверяет база пачками ID, полностью читаем только страницу"""
+        where, params = self._where(author, category, difficulty, max_cooking_time)
+        where = f"{where} AND" if where else "WHERE"
+        conn = self._connect()
+        recipe_ids = list(recipe_ids)
+        matched = set()
+        for start in range(0, len(recipe_ids), 500):
+            chunk = recipe_ids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            matched.update(row[0] for row in conn.execute(
+                f"SELECT id FROM recipes r {where} id IN ({marks})", list(params) + chunk))
+        ids = [recipe_id for recipe_id in recipe_ids if recipe_id in matched]
+        end = None if limit is None else offset + limit
+        page = ids[offset:end]
+        found = {}
+        for start in range(0, len(page), 500):
+            chunk = page[start:start + 500]
+            found.update((r["id"], r) for r in self._select(f"WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return len(ids), [found[recipe_id] for recipe_id in page if recipe_id in found]
+
+    def facets(self):
+        conn = self._connect()
+        authors = [row[0] for row in conn.execute(
+            "SELECT DISTINCT author FROM recipes WHERE author IS NOT NULL AND author != '' ORDER BY author")]
+        categories = [row[0] for row in conn.execute(
+            "SELECT DISTINCT category FROM recipe_categories WHERE category IS NOT NULL ORDER BY category")]
+        return {"authors": authors, "categories": categories}
+
+
+BACKENDS = {
+    'json': lambda: RecipeLog(),
+    'sqlite': lambda: SQLiteRecipeStore(os.environ.get('RECIPES_DB', DB_PATH)),
+}
+
+
+def open_store(backend=None):
+    """Открываем хранилище; по умолчанию выбор берется из RECIPES_BACKEND (json/sqlite)"""
+    backend = backend or os.environ.get('RECIPES_BACKEND', 'json')
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестное хранилище рецептов: {backend}")
+    return BACKENDS[backend]()
+
+
+def read_recipes_file(path):
+    """Читаем рецепты из my_recipes.json (массив) или журнала my_recipes.jsonl"""
+    # RecipeLog создал бы пустой журнал на месте опечатки в пути
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Нет файла с рецептами: {path}")
+    if path.endswith('.jsonl'):
+        log = RecipeLog(log_path=path, export_path=os.devnull)
+        try:
+            return log.all()
+        finally:
+            log.close()
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read().strip()
+    recipes = json.loads(content) if content else []
+    for recipe in recipes:
+        recipe.setdefault('id', str(uuid.uuid4()))
+    return recipes
+
+
+def migrate(paths, db_path=DB_PATH):
+    """Разовый перенос рецептов из JSON-файлов в SQLite; повторный запуск ничего не дублирует"""
+    # Все пути проверяем до того, как создавать базу
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Нет файла с рецептами: {path}")
+    store = SQLiteRecipeStore(db_path)
+    try:
+        total = 0
+        for path in paths:
+            recipes = read_recipes_file(path)
+            store.add_many(recipes)
+            total += len(recipes)
+        return total
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Разовый перенос рецептов из JSON в SQLite")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("paths", nargs="+", help="my_recipes.json и/или my_recipes.jsonl")
+    parser.add_argument("--db", default=DB_PATH, help="путь к базе SQLite")
+    args = parser.parse_args()
+
+    try:
+        count = migrate(args.paths, args.db)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    print(f"✅ Перенесено рецептов: {count} -> {args.db}")
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# Модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recipe_storage import RecipeLog, SQLiteRecipeStore  # noqa: E402
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def open_store(request, tmp_path):
+    """Открывает хранилища выбранного типа на одних и тех же файлах"""
+    stores = []
+
+    def open_one():
+        if request.param == "json":
+            store = RecipeLog(log_path=str(tmp_path / "recipes.jsonl"), export_path=str(tmp_path / "recipes.json"))
+        else:
+            store = SQLiteRecipeStore(str(tmp_path / "recipes.db"))
+        stores.append(store)
+        return store
+
+    yield open_one
+    for store in stores:
+        store.close()
@@ -0,0 +1,191 @@
+"""HTTP API: разбор запросов на настоящем сокете"""
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import quote
+
+import pytest
+
+from recipe_api import MAX_BODY, MAX_LIMIT, serve
+from recipe_core import RecipeService
+from recipe_schema import make_ingredient, make_recipe
+
+
+async def _exchange(port, request):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body) if body else None
+
+
+async def _request(port, method, target, headers=None):
+    """(статус, заголовки, тело) одного запроса без тела; кириллица в адресе кодируется"""
+    lines = [f"{method} {quote(target, safe='/?=&%,')} HTTP/1.1", "Host: x", "Connection: close"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("utf-8"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    head = dict(line.split(": ", 1) for line in header_lines)
+    return int(status_line.split()[1]), head, json.loads(body) if body else None
+
+
+def _with_server(service, scenario):
+    """Запускаем сервер на свободном порту и выполняем scenario(port)"""
+    async def run():
+        server = await serve("127.0.0.1", 0, service)
+        async with server:
+            return await scenario(server.sockets[0].getsockname()[1])
+
+    return asyncio.run(run())
+
+
+def _service(open_store, count=45):
+    service = RecipeService(open_store())
+    recipes = []
+    for i in range(count):
+        recipe = make_recipe(f"Суп {i}", f"Автор {i % 3}", "суп", "легко", 10 + i,
+                             [make_ingredient("картофель", 300, "г")], "Сварить")
+        recipe["id"] = f"r{i:02d}"
+        recipes.append(recipe)
+    service.store.add_many(recipes)
+    return service
+
+
+def _post(length, body=b""):
+    return (f"POST /recipes HTTP/1.1\r\nHost: x\r\nConnection: close\r\n"
+            f"Content-Length: {length}\r\n\r\n").encode("latin-1") + body
+
+
+@pytest.mark.parametrize("length, status", [
+    ("abc", 400),
+    ("-1", 400),
+    ("+5", 400),
+    ("1, 1", 400),
+    (str(MAX_BODY + 1), 413),
+])
+def test_bad_content_length(open_store, length, status):
+    async def run():
+        server = await serve("127.0.0.1", 0, RecipeService(open_store()))
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await _exchange(port, _post(length))
+
+    code, payload = asyncio.run(run())
+    assert code == status
+    assert "error" in payload
+
+
+def test_post_with_body(open_store):
+    recipe = {"name": "Омлет", "author": "Я", "category": "горячее", "difficulty": "легко",
+              "cooking_time": 15, "ingredients": [{"name": "яйца", "amount": 2, "unit": "шт"}],
+              "instructions": "Взбить\nОбжарить"}
+    body = json.dumps(recipe, ensure_ascii=False).encode("utf-8")
+
+    async def run():
+        server = await serve("127.0.0.1", 0, RecipeService(open_store()))
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await _exchange(port, _post(len(body), body))
+
+    code, payload = asyncio.run(run())
+    assert code == 201
+    assert payload["name"] == "Омлет"
+
+
+def test_etag_and_not_modified(open_store):
+    service = _service(open_store)
+
+    async def scenario(port):
+        status, head, first = await _request(port, "GET", "/recipes?limit=5")
+        etag = head["ETag"]
+        same = await _request(port, "GET", "/recipes?limit=5", {"If-None-Match": etag})
+        weak = await _request(port, "GET", "/recipes?limit=5", {"If-None-Match": f'"x", W/{etag}'})
+        other = await _request(port, "GET", "/recipes?limit=5", {"If-None-Match": '"x"'})
+        # После записи данные другие - старый ETag больше не совпадает
+        await asyncio.to_thread(service.store.delete, "r00")
+        changed = await _request(port, "GET", "/recipes?limit=5", {"If-None-Match": etag})
+        return status, first, same, weak, other, changed
+
+    status, first, same, weak, other, changed = _with_server(service, scenario)
+    assert status == 200 and first["total"] == 45
+    assert same[0] == weak[0] == 304 and same[2] is None and same[1]["ETag"] == weak[1]["ETag"]
+    assert other[0] == 200 and other[2] == first
+    assert changed[0] == 200 and changed[2]["total"] == 44 and changed[1]["ETag"] != same[1]["ETag"]
+
+
+def test_list_and_search_pages(open_store):
+    service = _service(open_store)
+
+    async def scenario(port):
+        pages = []
+        for target in ("/recipes?author=Автор%201&limit=4&offset={}",
+                       "/search?q=суп&author=Автор%201&limit=4&offset={}"):
+            found, offset = [], 0
+            while True:
+                _, _, page = await _request(port, "GET", target.format(offset))
+                found.extend(r["id"] for r in page["items"])
+                offset += 4
+                if offset >= page["total"]:
+                    break
+            pages.append((page["total"], found))
+        limited = await _request(port, "GET", "/recipes?limit=100000")
+        bad = await _request(port, "GET", "/search?q=суп&offset=-1")
+        return pages, limited, bad
+
+    pages, limited, bad = _with_server(service, scenario)
+    expected = [f"r{i:02d}" for i in range(45) if i % 3 == 1]
+    assert pages[0] == (15, expected)
+    assert pages[1][0] == 15 and sorted(pages[1][1]) == expected
+    assert limited[2]["limit"] == MAX_LIMIT
+    assert bad[0] == 400
+
+
+def test_delete_missing_recipe(open_store):
+    service = _service(open_store, count=1)
+
+    async def scenario(port):
+        first = await _request(port, "DELETE", "/recipes/r00")
+        again = await _request(port, "DELETE", "/recipes/r00")
+        get = await _request(port, "GET", "/recipes/r00")
+        unknown = await _request(port, "GET", "/nothing")
+        return first, again, get, unknown
+
+    first, again, get, unknown = _with_server(service, scenario)
+    assert first[0] == 200 and first[2]["id"] == "r00"
+    assert again[0] == get[0] == unknown[0] == 404
+    assert "error" in again[2]
+
+
+def test_slow_request_does_not_block_others(open_store):
+    service = _service(open_store, count=3)
+    release = threading.Event()
+    search = service.search
+
+    def slow_search(*args, **kwargs):
+        release.wait(5)
+        return search(*args, **kwargs)
+
+    service.search = slow_search
+
+    async def scenario(port):
+        started = time.perf_counter()
+        slow = asyncio.create_task(_request(port, "GET", "/search?q=суп"))
+        await asyncio.sleep(0.05)
+        status, _, facets = await _request(port, "GET", "/facets")
+        elapsed, pending = time.perf_counter() - started, not slow.done()
+        release.set()
+        return status, facets, elapsed, pending, await slow
+
+    status, facets, elapsed, pending, slow = _with_server(service, scenario)
+    assert status == 200 and facets["authors"] == ["Автор 0", "Автор 1", "Автор 2"]
+    # Ответ пришел, пока поиск еще ждал в своем потоке
+    assert pending and elapsed < 2
+    assert slow[0] == 200 and slow[2]["total"] == 3
@@ -0,0 +1,121 @@
+"""RecipeTable отдает те же словари, что получила, - и для рецептов, не уложившихся в колонки"""
+import json
+
+import pytest
+
+from recipe_columns import RecipeTable
+from recipe_schema import make_ingredient, make_recipe
+from recipe_storage import matches_filters
+
+
+def regular(i):
+    recipe = make_recipe(f"Суп {i}", f"Автор {i % 3}", ["суп", "горячее", "салат"][i % 3], "легко", 10 + i,
+                         [make_ingredient("картофель", 300, "г"), make_ingredient("соль", None, "по вкусу"),
+                          make_ingredient("сливки", 20.5, "мл", True)], "Сварить\nПосолить", servings=2)
+    recipe["id"] = f"r{i}"
+    return recipe
+
+
+ODD = {
+    "missing keys": {"id": "m1", "name": "Без автора", "cooking_time": 5},
+    "only id": {"id": "m2"},
+    "no id": {"name": "Без ID", "categories": ["суп"], "ingredients": [], "instructions": []},
+    "None values": {"id": "n1", "name": None, "author": None, "categories": None, "difficulty": None,
+                    "cooking_time": None, "ingredients": [{"name": "яйца", "amount": None, "unit": "шт"}]},
+    "extra key": {"id": "e1", "name": "С полем", "categories": ["суп"], "cooking_time": 10, "source": "книга"},
+    "extra ingredient key": {"id": "e2", "ingredients": [{"name": "мука", "amount": 1, "unit": "г", "brand": "x"}]},
+    "category string": {"id": "c1", "categories": "суп", "cooking_time": 10},
+    "non-string categories": {"id": "c2", "categories": [1, "салат", None], "difficulty": "легко"},
+    "ingredient string": {"id": "i1", "ingredients": ["соль"]},
+    "amount string": {"id": "i2", "ingredients": [{"name": "мука", "amount": "2", "unit": "г"}]},
+    "prep int": {"id": "i3", "ingredients": [{"name": "мука", "amount": 2, "unit": "г", "needs_preparation": 1}]},
+    "huge int": {"id": "i4", "cooking_time": 2 ** 60, "ingredients": [{"name": "мука", "amount": 2 ** 60}]},
+    "float time": {"id": "f1", "cooking_time": 12.5, "author": "Автор 1"},
+    "bool time": {"id": "f2", "cooking_time": True},
+    "int id": {"id": 42, "name": "Число"},
+    "steps not strings": {"id": "s1", "instructions": ["a", 2]},
+    "reordered keys": {"cooking_time": 7, "name": "Порядок", "id": "o1",
+                       "ingredients": [{"unit": "г", "amount": 1.0, "name": "мука", "needs_preparation": False}]},
+}
+
+
+def recipes():
+    result = [regular(i) for i in range(20)]
+    for i, recipe in enumerate(ODD.values()):
+        result.insert(2 * i + 1, recipe)
+    return json.loads(json.dumps(result, ensure_ascii=False))
+
+
+def assert_same(restored, original):
+    """Равенство вплоть до порядка ключей и типов значений (1 и 1.0, 1 и True - разные)"""
+    assert json.dumps(restored, ensure_ascii=False) == json.dumps(original, ensure_ascii=False)
+    assert restored == original
+
+
+@pytest.mark.parametrize("name", ODD)
+def test_odd_recipe_round_trip(name):
+    table = RecipeTable.from_recipes([regular(0), ODD[name], regular(1)])
+    assert len(table) == 3
+    assert_same(table[1], ODD[name])
+    assert_same(table[0], regular(0))
+    assert_same(table[2], regular(1))
+
+
+def test_round_trip_keeps_order_and_types():
+    original = recipes()
+    table = RecipeTable.from_recipes(original)
+    assert_same(list(table), original)
+    assert_same(table[5:9], original[5:9])
+    amounts = [type(ing["amount"]) for ing in table[0]["ingredients"]]
+    assert amounts == [int, str, float]
+
+
+def test_restored_recipe_is_a_copy():
+    table = RecipeTable.from_recipes([ODD["extra key"], regular(0)])
+    table[0]["name"] = "изменено"
+    table[1]["ingredients"].append("изменено")
+    assert table[0]["name"] == "С полем"
+    assert_same(table[1], regular(0))
+
+
+def test_find():
+    original = recipes()
+    table = RecipeTable.from_recipes(original)
+    for row, recipe in enumerate(original):
+        if isinstance(recipe.get("id"), str):
+            assert table.find(recipe["id"]) == row
+    assert table.find("нет такого") is None
+    assert table.find(["не хэшируется"]) is None
+    rows = table.find_rows(["r3", "нет такого", "c2"]).tolist()
+    assert rows == [table.find("r3"), -1, table.find("c2")]
+
+
+@pytest.mark.parametrize("filters", [
+    {"author": "Автор 1"},
+    {"category": "суп"},
+    {"category": "салат", "difficulty": "легко"},
+    {"max_cooking_time": 12},
+    {"author": "нет такого"},
+])
+def test_filters_match_dicts(filters):
+    original = recipes()
+    table = RecipeTable.from_recipes(original)
+    expected = [row for row, recipe in enumerate(original) if matches_filters(recipe, **filters)]
+    assert table.rows(**filters).tolist() == expected
+
+
+def test_take_and_concat():
+    original = recipes()
+    table = RecipeTable.from_recipes(original)
+    order = list(range(len(original)))[::-3] + [0, 1]
+    taken = table.take(order)
+    assert_same(list(taken), [original[row] for row in order])
+
+    parts = [table.take(order), RecipeTable.from_recipes([]), RecipeTable.from_recipes(original[:4])]
+    joined = RecipeTable.concat(parts)
+    expected = [original[row] for row in order] + original[:4]
+    assert_same(list(joined), expected)
+    # Словари значений объединены - фильтры и поиск по ID работают по склеенной таблице
+    assert joined.rows(category="суп").tolist() == [
+        row for row, recipe in enumerate(expected) if matches_filters(recipe, category="суп")]
+    assert joined.find("e1") == expected.index(ODD["extra key"])
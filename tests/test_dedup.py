@@ -0,0 +1,127 @@
+"""Поиск похожих рецептов: MinHash-подписи и LSH-индекс"""
+import threading
+
+import numpy as np
+
+from recipe_core import RecipeService
+from recipe_dedup import NUM_PERM, THRESHOLD, DuplicateIndex, recipe_shingles, signatures, similarity
+from recipe_schema import make_ingredient, make_recipe
+
+STEPS = "Нарезать картофель и морковь\nВарить 20 минут\nПосолить по вкусу"
+
+
+def soup(recipe_id, extra=(), steps=STEPS):
+    products = ["картофель", "морковь", "лук", *extra]
+    recipe = make_recipe("Суп", "Я", "суп", "легко", 30, [make_ingredient(name, 100, "г") for name in products],
+                         steps)
+    recipe["id"] = recipe_id
+    return recipe
+
+
+def jaccard(a, b):
+    a, b = recipe_shingles(a), recipe_shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def ingredients_recipe(recipe_id, names):
+    return {"id": recipe_id, "name": recipe_id, "ingredients": [{"name": name, "amount": 1, "unit": "г"}
+                                                                 for name in names]}
+
+
+def pair(number, shared, own):
+    """Два рецепта с точным сходством shared / (shared + 2 * own) по набору продуктов"""
+    common = [f"общий{number}x{k}" for k in "abcdefghijklmnopqrstuvwxyz"[:shared]]
+    return (ingredients_recipe(f"a{number}", common + [f"первый{number}x{k}" for k in "abcdefgh"[:own]]),
+            ingredients_recipe(f"b{number}", common + [f"второй{number}x{k}" for k in "abcdefgh"[:own]]))
+
+
+def test_recipe_shingles():
+    shingles = recipe_shingles(soup("s1", extra=["Картошка"]))
+    # Продукты - по каноническому названию, шаги - тройки основ слов подряд
+    assert {s for s in shingles if s.startswith("i:")} == {"i:картофель", "i:морковь", "i:лук репчатый"}
+    assert "s:нарезат картофел и" in shingles
+    assert "s:минут посолит по" in shingles
+    assert recipe_shingles({"instructions": ["Жарить"]}) == {"s:жарит"}
+    assert recipe_shingles({}) == set()
+
+
+def test_signatures():
+    similar = soup("c", extra=["сыр", "сливки"])
+    sigs = signatures([soup("a"), {}, soup("b"), similar])
+    assert sigs.shape == (4, NUM_PERM) and sigs.dtype == np.uint32
+    assert (sigs[1] == 0xFFFFFFFF).all()
+    assert similarity(sigs[0], sigs[2]) == 1.0
+    # Подпись в пачке та же, что и по одному; сходство подписей - оценка коэффициента Жаккара
+    assert (signatures([similar])[0] == sigs[3]).all()
+    assert abs(similarity(sigs[0], sigs[3]) - jaccard(soup("a"), similar)) < 0.15
+
+
+def test_pairs_at_threshold_become_candidates():
+    # 14 общих продуктов и по 3 своих: сходство ровно 0.7
+    pairs = [pair(n, 14, 3) for n in range(300)]
+    index = DuplicateIndex()
+    index.rebuild(a for a, _ in pairs)
+    found = sum(a["id"] in dict(index.candidates(b, threshold=0)) for a, b in pairs)
+    assert THRESHOLD == 0.7
+    # Полосы 32 x 4 находят такую пару с вероятностью 0.9998; при 16 x 8 было бы ~0.61
+    assert found >= 295
+
+
+def test_candidates():
+    index = DuplicateIndex()
+    other = soup("other", steps="Смешать творог с сахаром\nЗапекать 30 минут")
+    other["ingredients"] = [make_ingredient("творог", 200, "г"), make_ingredient("сахар", 50, "г")]
+    index.rebuild([soup("same"), soup("close", extra=["сыр"]), other])
+    found = index.candidates(soup("new"))
+    assert [recipe_id for recipe_id, _ in found] == ["same", "close"]
+    assert found[0][1] == 1.0 and THRESHOLD <= found[1][1] < 1.0
+    # Сам рецепт в свои дубликаты не попадает; пустой рецепт ни на что не похож
+    assert [recipe_id for recipe_id, _ in index.candidates(soup("same"))] == ["close"]
+    assert index.candidates({"id": "empty"}) == []
+
+    index.remove("same")
+    assert [recipe_id for recipe_id, _ in index.candidates(soup("new"))] == ["close"]
+    index.add(soup("close", extra=["сыр", "сливки", "укроп", "кинза", "базилик", "петрушка"]))
+    assert index.candidates(soup("new")) == []
+
+
+def test_clusters():
+    index = DuplicateIndex()
+    cake = soup("cake", steps="Смешать творог с сахаром\nЗапекать 30 минут")
+    cake["ingredients"] = [make_ingredient("творог", 200, "г"), make_ingredient("сахар", 50, "г")]
+    cake2 = dict(cake, id="cake2")
+    index.rebuild([soup("s1"), cake, soup("s2"), soup("s3", extra=["сыр"]), cake2, soup("alone", steps="")])
+    assert index.clusters() == [["s1", "s2", "s3"], ["cake", "cake2"]]
+    # Группы одного размера - по порядку id
+    assert index.clusters(threshold=1.0) == [["cake", "cake2"], ["s1", "s2"]]
+
+
+def test_store_index_builds_in_background(open_store):
+    store = open_store()
+    store.add_many([soup("s1"), soup("s2", extra=["сыр"])])
+    snapshot, release = store.snapshot, threading.Event()
+
+    def slow_snapshot():
+        release.wait(5)
+        return snapshot()
+
+    store.snapshot = slow_snapshot
+    service = RecipeService(store)
+    service.warm_up()
+    # Пока индекс собирается, проверка пропускается и запись его не ждет
+    assert service.duplicates(soup("new")) == []
+    store.add(soup("s3"))
+    store.delete("s1")
+    release.set()
+    assert service.dedup.wait_ready(5)
+    # Изменения, пришедшие во время сборки, в индексе
+    assert sorted(recipe["id"] for recipe, _ in service.duplicates(soup("new"))) == ["s2", "s3"]
+
+    # После "reset" индекс собирается заново - тоже в фоне
+    release.clear()
+    store.clear()
+    store.add(soup("s4"))
+    assert service.duplicates(soup("new")) == []
+    release.set()
+    assert service.dedup.wait_ready(5)
+    assert [recipe["id"] for recipe, _ in service.duplicates(soup("new"))] == ["s4"]
@@ -0,0 +1,71 @@
+"""Выгрузка с КБЖУ и обратный импорт дают те же рецепты"""
+import json
+
+import pytest
+
+from nutrition import NutritionCalculator
+from recipe_export import export_recipes
+from recipe_import import import_recipes
+from recipe_schema import make_ingredient, make_recipe
+from recipe_storage import SQLiteRecipeStore
+
+
+def recipes():
+    omelette = make_recipe("Омлет", "Я", "горячее", "легко", 15,
+                           [make_ingredient("яйца", 2, "шт"), make_ingredient("молоко", 100, "мл"),
+                            make_ingredient("соль", None, "по вкусу")],
+                           "Взбить\nОбжарить", servings=2)
+    omelette["categories"].append("закуска")
+    soup = make_recipe("Суп", "Ты", "суп", "средне", 60,
+                       [make_ingredient("картофель", 0.5, "стакан"), make_ingredient("сливки", 20.5, "мл")], "Сварить")
+    return [omelette, soup]
+
+
+@pytest.mark.parametrize("fmt", ["json", "jsonl.gz", "csv", "csv.gz"])
+def test_round_trip_with_nutrition(tmp_path, fmt):
+    source = SQLiteRecipeStore(str(tmp_path / "source.db"))
+    target = SQLiteRecipeStore(str(tmp_path / "target.db"))
+    try:
+        source.add_many(recipes())
+        path = str(tmp_path / f"recipes.{fmt}")
+        export_recipes(source, fmt, path, NutritionCalculator())
+
+        report = import_recipes(target, path, workers=0)
+        assert report.errors == []
+        assert report.imported == len(source)
+        assert target.all() == source.all()
+    finally:
+        source.close()
+        target.close()
+
+
+def test_broken_json_array_keeps_records_read_before(tmp_path):
+    good = [json.dumps(recipe, ensure_ascii=False) for recipe in recipes()]
+    path = tmp_path / "broken.json"
+    path.write_text("[" + ",\n".join(good) + ',\n{"name": "Оборван', encoding="utf-8")
+    store = SQLiteRecipeStore(str(tmp_path / "target.db"))
+    try:
+        report = import_recipes(store, str(path), workers=0, batch_size=1)
+        assert report.total == report.imported == len(store) == 2
+        assert report.stopped_at == 3
+        assert [(number, recipe_id) for number, recipe_id, _ in report.errors] == [(3, None)]
+        assert "остановлено на записи 3" in report.summary()
+    finally:
+        store.close()
+
+
+def test_pool_import(tmp_path):
+    path = tmp_path / "many.jsonl"
+    many = []
+    for i in range(1200):
+        recipe = recipes()[i % 2]
+        recipe["id"] = f"r{i}"
+        many.append(recipe)
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in many), encoding="utf-8")
+    store = SQLiteRecipeStore(str(tmp_path / "target.db"))
+    try:
+        report = import_recipes(store, str(path), workers=2)
+        assert report.errors == [] and report.imported == 1200
+        assert [r["id"] for r in store.all()] == [r["id"] for r in many]
+    finally:
+        store.close()
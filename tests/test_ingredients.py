@@ -0,0 +1,63 @@
+"""Словарь продуктов: основы слов, сопоставление названий и перевод в граммы"""
+import pytest
+
+from ingredients import INGREDIENT_NAMES, canonical_name, match_ingredient, stem, to_grams
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("картошка", "картошк"),
+    ("грибы", "гриб"),
+    ("моркови", "морков"),
+    ("зеленый", "зелен"),
+    ("лук", "лук"),      # короче трех букв основу не режем
+    ("яиц", "яиц"),
+])
+def test_stem(word, expected):
+    assert stem(word) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Картошка", "картофель"),
+    ("филе куриной грудки без кожи", "куриная грудка"),
+    ("курица", "курица"),
+    ("зеленый лук", "лук зеленый"),
+    ("лук", "лук репчатый"),
+    ("мука (высший сорт)", "мука пшеничная"),
+    ("перец", "перец черный молотый"),
+    ("болгарский перец", "перец болгарский"),
+])
+def test_match_ingredient_prefers_longest_variant(name, expected):
+    assert INGREDIENT_NAMES[match_ingredient(name)] == expected
+
+
+def test_herbs_are_separate_products():
+    herbs = ["укроп", "петрушка", "кинза", "базилик", "зелень"]
+    assert [canonical_name(name) for name in ["пучок укропа", "Петрушка", "кинза", "базилик свежий",
+                                              "зелень"]] == herbs
+    assert len({match_ingredient(name) for name in herbs}) == len(herbs)
+    # Вес у трав общий с зеленью
+    assert {to_grams(name, 2, "ст.л.") for name in herbs} == {4.5}
+
+
+def test_unknown_ingredient():
+    assert match_ingredient("кирпич") == -1
+    assert canonical_name("  Кирпич   Красный ") == "кирпич красный"
+
+
+@pytest.mark.parametrize("name, amount, unit, grams", [
+    ("мука", 200, "г", 200.0),
+    ("мука", 1, "стакан", 137.5),
+    ("молоко", 100, "мл", 103.0),
+    ("сахар", 2, "ч.л.", 8.5),
+    ("яйца", 2, "шт", 110.0),
+    ("нечто", 10, "мл", 10.0),    # неизвестный продукт - плотность воды
+    ("мука", 2, "шт", None),      # муку штуками не меряют
+    ("соль", "-", "по вкусу", None),
+    ("соль", 1, "щепотка", None),
+])
+def test_to_grams(name, amount, unit, grams):
+    result = to_grams(name, amount, unit)
+    if grams is None:
+        assert result is None
+    else:
+        assert result == pytest.approx(grams)
@@ -0,0 +1,97 @@
+"""Список покупок и меню на неделю"""
+import math
+
+from meal_plan import plan_selection, plan_week, rollup, shopping_list
+from recipe_columns import RecipeTable
+from recipe_schema import make_ingredient, make_recipe
+
+
+def recipe(recipe_id, name, cooking_time, ingredients, difficulty="легко", servings=2):
+    result = make_recipe(name, "Я", "горячее", difficulty, cooking_time, ingredients, "Приготовить",
+                         servings=servings)
+    result["id"] = recipe_id
+    return result
+
+
+def omelette():
+    return recipe("omelette", "Омлет", 15, [
+        make_ingredient("яйца", 2, "шт"),
+        make_ingredient("молоко", 100, "мл"),
+        make_ingredient("соль", None, "по вкусу", needs_preparation=True),
+        make_ingredient("зеленый лук", 10, "г", needs_preparation=True),
+    ])
+
+
+def pancakes():
+    return recipe("pancakes", "Блины", 40, [
+        make_ingredient("яйцо", 1, "шт"),
+        make_ingredient("мука", 1, "стакан", needs_preparation=True),
+        make_ingredient("соль", None, "по вкусу"),
+        make_ingredient("ваниль", 1, "шт"),
+    ], servings=4)
+
+
+def rows(frame):
+    return [tuple(row) for row in frame.itertuples(index=False)]
+
+
+def test_shopping_list_sums_scaled_amounts():
+    shopping = shopping_list([(omelette(), 4), (pancakes(), None)])
+    items = {(row.ingredient, row.unit): row for row in shopping.items.itertuples()}
+    # Омлет на 4 порции из 2 - вдвое больше; "яйца" и "яйцо" - один продукт
+    assert items[("яйцо куриное", "шт")].amount == 5
+    assert items[("яйцо куриное", "шт")].grams == 275
+    assert items[("яйцо куриное", "шт")].recipes == 2
+    assert items[("молоко", "мл")].amount == 200
+    assert items[("мука пшеничная", "стакан")].grams == 137.5
+    # Вес штуки неизвестен - вес пустой, а не 0
+    assert math.isnan(items[("ваниль", "шт")].grams)
+    assert shopping.to_taste == ["соль"]
+
+
+def test_prep_includes_to_taste_rows():
+    shopping = shopping_list([(omelette(), None), (pancakes(), None)])
+    assert rows(shopping.prep) == [
+        ("pancakes", 1, "Блины", "мука пшеничная", 1.0, "стакан"),
+        ("omelette", 2, "Омлет", "соль", "-", "по вкусу"),
+        ("omelette", 3, "Омлет", "лук зеленый", 10.0, "г"),
+    ]
+    assert shopping.as_text().endswith("Подготовить заранее:\n- мука пшеничная (Блины)\n- соль (Омлет)\n"
+                                       "- лук зеленый (Омлет)")
+
+
+def test_rollup_keeps_plans_apart():
+    items, seasonings, prep = rollup([
+        ("аня", omelette(), None), ("аня", omelette(), None), ("боря", pancakes(), 8),
+    ])
+    eggs = items[items["ingredient"] == "яйцо куриное"].set_index("plan")["amount"].to_dict()
+    # Повтор рецепта в плане складывает множители
+    assert eggs == {"аня": 4, "боря": 2}
+    assert rows(seasonings) == [("аня", "соль"), ("боря", "соль")]
+    assert prep["plan"].tolist() == ["аня", "аня", "боря"]
+
+
+def test_empty_selection():
+    shopping = shopping_list([])
+    assert shopping.items.empty and shopping.prep.empty and shopping.to_taste == []
+    assert shopping.as_text() == ""
+
+
+def test_plan_week_fits_daily_time_and_uses_each_recipe_first():
+    recipes = [recipe(f"r{i}", f"Блюдо {i}", 20 + 10 * (i % 4), [make_ingredient("рис", 100, "г")],
+                      difficulty=["легко", "средне", "сложно"][i % 3]) for i in range(12)]
+    recipes.append(recipe("long", "Долгое", 200, [make_ingredient("рис", 100, "г")]))
+    plan = plan_week(recipes, days=5, meals_per_day=2, daily_time=70, max_difficulty="средне")
+    assert len(plan) == 5
+    chosen = [r["id"] for day in plan for r in day]
+    assert all(sum(r["cooking_time"] for r in day) <= 70 for day in plan)
+    assert all(r["difficulty"] != "сложно" for day in plan for r in day)
+    assert "long" not in chosen
+    allowed = [r["id"] for r in recipes if r["difficulty"] != "сложно" and r["cooking_time"] <= 70]
+    assert len(set(chosen)) == min(len(chosen), len(allowed))
+
+    # Снимок хранилища дает то же меню, что и список словарей
+    assert plan_week(RecipeTable.from_recipes(recipes), days=5, meals_per_day=2, daily_time=70,
+                     max_difficulty="средне") == plan
+    assert plan_week(recipes, days=5, seed=1) != plan_week(recipes, days=5, seed=2)
+    assert len(plan_selection(plan, 3)) == len(chosen) and plan_selection(plan, 3)[0][1] == 3
@@ -0,0 +1,117 @@
+"""Конвейер генерации на заглушке: кэш запросов, повторы, ошибки модели и проверка черновиков"""
+import asyncio
+import uuid
+
+import pytest
+
+from recipe_gen import RECIPE_ID_NAMESPACE, LocalStubBackend, PromptCache, generate_recipes
+
+PROMPTS = ["Суп с фрикадельками", "Омлет с сыром", "Салат из огурцов", "Плов", "Блины"]
+
+
+class CountingBackend(LocalStubBackend):
+    """Заглушка, которая запоминает пачки запросов и может ломать отдельные запросы"""
+
+    def __init__(self, broken=(), invalid=(), **options):
+        super().__init__(**options)
+        self.broken = set(broken)
+        self.invalid = set(invalid)
+        self.calls = []
+
+    async def generate_batch(self, prompts):
+        self.calls.append(list(prompts))
+        if self.broken & set(prompts):
+            raise TimeoutError("модель не ответила")
+        drafts = await super().generate_batch(prompts)
+        for prompt, draft in zip(prompts, drafts):
+            if prompt in self.invalid:
+                draft["cooking_time"] = 0
+                draft["ingredients"] = []
+        return drafts
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Паузы между повторами не ждем, а запоминаем"""
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    return delays
+
+
+def run(prompts, backend, store=None, cache_dir=None, **options):
+    return generate_recipes(prompts, backend, store, cache=PromptCache(str(cache_dir)), **options)
+
+
+def test_second_run_is_served_from_cache(tmp_path, open_store):
+    backend = CountingBackend()
+    first = run(PROMPTS, backend, open_store(), tmp_path, batch_size=2)
+    assert (first.generated, first.cached, first.saved) == (5, 0, 5)
+    assert sorted(len(batch) for batch in backend.calls) == [1, 2, 2]
+
+    backend.calls.clear()
+    second = run(PROMPTS + ["  Плов  ", ""], backend, open_store(), tmp_path, batch_size=2)
+    assert backend.calls == []
+    assert (second.prompts, second.cached, second.generated) == (5, 5, 0)
+    assert (second.saved, second.existing) == (0, 5)
+
+
+def test_ids_are_stable_and_reruns_do_not_duplicate(tmp_path, open_store):
+    store = open_store()
+    run(PROMPTS, LocalStubBackend(), store, tmp_path / "a")
+    # Без кэша (другой каталог) модель вызывается снова, но ID те же
+    report = run(PROMPTS[:2] + ["Новый рецепт"], LocalStubBackend(), store, tmp_path / "b")
+    assert (report.generated, report.saved, report.existing) == (3, 1, 2)
+    assert len(store) == 6
+    key = PromptCache.key(LocalStubBackend.name, "Плов")
+    assert store.get(str(uuid.uuid5(RECIPE_ID_NAMESPACE, key)))["name"] == "Плов"
+
+
+def test_retries_with_doubling_backoff(tmp_path, sleeps):
+    backend = CountingBackend(fail_rate=0.5, seed=3)
+    report = run(PROMPTS, backend, cache_dir=tmp_path, batch_size=1, concurrency=1, retries=10, backoff=0.1)
+    assert report.failed == [] and report.generated == 5
+    assert len(backend.calls) > 5
+    # Пачки идут по одной: на каждый запрос - серия пауз 0.1, 0.2, 0.4, ... по числу сбоев
+    expected = []
+    for prompt in PROMPTS:
+        attempts = backend.calls.count([prompt])
+        expected.extend(0.1 * 2 ** n for n in range(attempts - 1))
+    assert sleeps == pytest.approx(expected)
+
+
+def test_retries_run_out(tmp_path, sleeps):
+    backend = CountingBackend(fail_rate=1.0)
+    report = run(PROMPTS, backend, cache_dir=tmp_path, batch_size=5, retries=2, backoff=0.1)
+    assert [prompt for prompt, _ in report.failed] == PROMPTS
+    assert report.generated == 0 and len(backend.calls) == 3
+    assert sleeps == pytest.approx([0.1, 0.2])
+
+
+def test_failures_are_reported_per_prompt(tmp_path, open_store, sleeps):
+    backend = CountingBackend(broken={"Плов"})
+    store = open_store()
+    report = run(PROMPTS, backend, store, tmp_path, batch_size=1, retries=2, backoff=0.5)
+    assert report.failed == [("Плов", "модель не ответила")]
+    assert report.saved == 4 and "Плов" not in [r["name"] for r in store.all()]
+    assert backend.calls.count(["Плов"]) == 3
+    assert sleeps == [0.5, 1.0]
+
+    # Сбойный запрос не попал в кэш - следующий запуск спросит модель только о нем
+    backend = CountingBackend()
+    report = run(PROMPTS, backend, store, tmp_path, batch_size=1)
+    assert backend.calls == [["Плов"]]
+    assert (report.cached, report.generated, report.saved) == (4, 1, 1)
+
+
+def test_invalid_drafts_are_not_saved(tmp_path, open_store):
+    store = open_store()
+    report = run(PROMPTS, CountingBackend(invalid={"Блины"}), store, tmp_path)
+    assert [prompt for prompt, _ in report.invalid] == ["Блины"]
+    errors = report.invalid[0][1]
+    assert "Добавьте хотя бы один ингредиент" in errors
+    assert any("Время готовки" in error for error in errors)
+    assert report.saved == 4 and len(store) == 4
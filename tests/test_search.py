@@ -0,0 +1,47 @@
+"""Поиск с фильтрами и листанием: итог считается по всем совпадениям, а не по первым сотням"""
+from recipe_core import RecipeService
+from recipe_schema import make_ingredient, make_recipe
+
+COUNT = 1200
+
+
+def recipes():
+    result = []
+    for i in range(COUNT):
+        ingredients = [make_ingredient("картофель", 300, "г"), make_ingredient("морковь", 1, "шт")][:1 + i % 2]
+        recipe = make_recipe(f"Суп {i}", f"Автор {i % 3}", "суп", "легко", 10 + i % 50,
+                             ingredients, "Сварить")
+        recipe["id"] = f"r{i:04d}"
+        result.append(recipe)
+    return result
+
+
+def test_search_total_and_pages_cover_all_matches(open_store):
+    service = RecipeService(open_store())
+    service.store.add_many(recipes())
+    expected = [r["id"] for r in recipes() if r["author"] == "Автор 1" and r["cooking_time"] <= 30]
+
+    total, page, _ = service.search("суп", offset=0, limit=50, author="Автор 1", max_cooking_time=30)
+    assert total == len(expected)
+    found = [r["id"] for r in page]
+    offset = 50
+    while offset < total:
+        _, page, _ = service.search("суп", offset=offset, limit=50, author="Автор 1", max_cooking_time=30)
+        found.extend(r["id"] for r in page)
+        offset += 50
+    assert sorted(found) == expected
+
+
+def test_pantry_missing_products_for_page_only(open_store):
+    service = RecipeService(open_store())
+    service.store.add_many(recipes())
+
+    total, page, missing = service.search("", ["картофель"], offset=0, limit=10, author="Автор 2")
+    assert total == sum(1 for r in recipes() if r["author"] == "Автор 2")
+    # Сначала рецепты, где ничего не нужно докупать
+    assert [len(r["ingredients"]) for r in page] == [1] * 10
+    assert missing == {r["id"]: [] for r in page}
+
+    total, page, missing = service.search("суп", ["картофель"], offset=total - 1, limit=10, author="Автор 2")
+    assert len(page) == 1 and len(page[0]["ingredients"]) == 2
+    assert missing == {page[0]["id"]: ["морковь"]}
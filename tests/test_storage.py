@@ -0,0 +1,138 @@
+"""Два хранилища на одних данных (как приложение и API в разных процессах)"""
+import multiprocessing
+
+import pytest
+
+from recipe_core import RecipeService
+from recipe_schema import make_ingredient, make_recipe
+from recipe_storage import RecipeLog, SQLiteRecipeStore
+
+
+def recipe(recipe_id, name="Омлет"):
+    result = make_recipe(name, "Я", "горячее", "легко", 15,
+                         [make_ingredient("яйца", 2, "шт")], "Взбить\nОбжарить")
+    result["id"] = recipe_id
+    return result
+
+
+def ids(store):
+    return [r["id"] for r in store.snapshot()]
+
+
+def test_own_write_does_not_hide_other_store_write(open_store):
+    a, b = open_store(), open_store()
+    assert ids(a) == []
+    b.add(recipe("from-b"))
+    a.add(recipe("from-a"))
+    assert sorted(ids(a)) == ["from-a", "from-b"]
+    assert a.get("from-b") is not None
+    total, _ = a.query()
+    assert total == 2
+
+
+def test_other_store_delete_and_clear_are_seen(open_store):
+    a, b = open_store(), open_store()
+    a.add_many([recipe("r1"), recipe("r2")])
+    assert sorted(ids(b)) == ["r1", "r2"]
+    b.delete("r1")
+    a.add(recipe("r3"))
+    assert sorted(ids(a)) == ["r2", "r3"]
+    b.clear()
+    assert ids(a) == []
+
+
+def test_listener_learns_about_other_store_write(open_store):
+    a, b = open_store(), open_store()
+    events = []
+    a.subscribe(lambda event, payload: events.append(
+        (event, [r["id"] for r in payload] if event == "put" else payload)))
+    b.add(recipe("from-b"))
+    a.add(recipe("from-a"))
+    assert events == [("put", ["from-b"]), ("put", ["from-a"])]
+
+
+def test_other_store_changes_arrive_as_events(open_store):
+    a, b = open_store(), open_store()
+    a.add_many([recipe("r1"), recipe("r2")])
+    events = []
+    a.subscribe(lambda event, payload: events.append(
+        (event, [r["id"] for r in payload] if event == "put" else payload)))
+    b.add(recipe("r3"))
+    b.delete("r1")
+    b.add(recipe("r2", name="Омлет 2"))
+    a.refresh()
+    # Журнал передает операции по одной, база - последнюю операцию по каждому рецепту
+    assert ("delete", "r1") in events
+    assert sorted(i for event, payload in events if event == "put" for i in payload) == ["r2", "r3"]
+    assert {event for event, _ in events} == {"put", "delete"}
+    assert sorted(ids(a)) == ["r2", "r3"] and a.get("r2")["name"] == "Омлет 2"
+
+    events.clear()
+    b.clear()
+    a.refresh()
+    assert events == [("reset", None)]
+
+
+def test_search_index_stays_incremental(open_store):
+    a, b = open_store(), open_store()
+    service = RecipeService(a)
+    a.add_many([recipe(f"r{i}") for i in range(5)])
+    assert service.search("омлет")[0] == 5
+    rebuild, rebuilds = service.index.rebuild, []
+    service.index.rebuild = lambda recipes: (rebuilds.append(len(recipes)), rebuild(recipes))
+    b.add(recipe("new", name="Запеканка"))
+    b.delete("r0")
+    total, page, _ = service.search("запеканка")
+    assert [r["id"] for r in page] == ["new"] and total == 1
+    assert service.search("омлет")[0] == 4
+    # Чужие записи применены к индексу по одной, без перестройки
+    assert rebuilds == []
+
+
+def test_sqlite_reset_when_changes_are_pruned(tmp_path):
+    a = SQLiteRecipeStore(str(tmp_path / "recipes.db"))
+    b = SQLiteRecipeStore(str(tmp_path / "recipes.db"))
+    b.CHANGES_KEEP = 3
+    try:
+        events = []
+        a.subscribe(lambda event, payload: events.append(event))
+        for i in range(5):
+            b.add(recipe(f"r{i}"))
+        a.refresh()
+        assert events == ["reset"]
+        assert sorted(ids(a)) == [f"r{i}" for i in range(5)]
+    finally:
+        a.close()
+        b.close()
+
+
+def _write_many(log_path, export_path, prefix, count):
+    """Выполняется в отдельном процессе: пишет, перезаписывает и удаляет, часто уплотняя журнал"""
+    store = RecipeLog(log_path=log_path, export_path=export_path, compact_min_records=20)
+    for i in range(count):
+        store.add(recipe(f"{prefix}-{i}"))
+        store.add(recipe(f"{prefix}-{i}", name="Омлет 2"))
+        if i % 3 == 0:
+            store.delete(f"{prefix}-{i}")
+        if i % 25 == 0:
+            store.compact()
+    store.close()
+
+
+@pytest.mark.skipif(not RecipeLog.SHARED_SAFE, reason="нет блокировки файла между процессами")
+def test_processes_share_log_through_compaction(tmp_path):
+    log_path, export_path = str(tmp_path / "recipes.jsonl"), str(tmp_path / "recipes.json")
+    RecipeLog(log_path=log_path, export_path=export_path).close()
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_write_many, args=(log_path, export_path, p, 120)) for p in "abc"]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(120)
+        assert worker.exitcode == 0
+
+    store = RecipeLog(log_path=log_path, export_path=export_path)
+    expected = sorted(f"{p}-{i}" for p in "abc" for i in range(120) if i % 3)
+    assert sorted(ids(store)) == expected
+    assert {r["name"] for r in store.snapshot()} == {"Омлет 2"}
+    store.close()
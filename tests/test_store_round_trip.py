@@ -0,0 +1,59 @@
+"""Хранилища отдают те же словари, что получили: лишние ключи, отсутствующие поля и типы значений"""
+import sqlite3
+
+import pytest
+
+from recipe_storage import SQLiteRecipeStore, matches_filters
+from test_columns import ODD, assert_same, recipes, regular
+
+# Без ID рецепт в хранилище не сохранить
+STORED = {name: recipe for name, recipe in ODD.items() if "id" in recipe}
+STORED.update({
+    "ingredient note": {"id": "x1", "ingredients": [{"name": "соль", "amount": 1, "unit": "г", "note": "морская"}]},
+    "no needs_preparation": {"id": "x2", "ingredients": [{"name": "мука", "amount": 2, "unit": "г"}]},
+    "time string": {"id": "x3", "name": "Строкой", "cooking_time": "30"},
+})
+
+
+@pytest.mark.parametrize("name", STORED)
+def test_odd_recipe_round_trip(open_store, name):
+    store = open_store()
+    store.add_many([regular(0), STORED[name], regular(1)])
+    expected = [regular(0), STORED[name], regular(1)]
+    assert_same(store.get(STORED[name]["id"]), STORED[name])
+    assert_same(store.all(), expected)
+    assert_same(open_store().all(), expected)
+
+
+def test_filters_match_dicts(open_store):
+    store = open_store()
+    original = [recipe for recipe in recipes() if "id" in recipe] + [STORED["time string"]]
+    store.add_many(original)
+    for filters in ({"author": "Автор 1"}, {"category": "суп"}, {"max_cooking_time": 12},
+                    {"category": "салат", "difficulty": "легко"}):
+        expected = [recipe for recipe in original if matches_filters(recipe, **filters)]
+        assert_same(store.find(**filters), expected)
+
+
+def test_old_sqlite_schema_is_upgraded(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE recipes (pk INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, name TEXT, author TEXT,
+                              difficulty TEXT, cooking_time INTEGER, created_date TEXT, extra TEXT);
+        CREATE TABLE ingredients (recipe_id TEXT NOT NULL, position INTEGER NOT NULL, name TEXT, amount,
+                                  unit TEXT, needs_preparation INTEGER, PRIMARY KEY (recipe_id, position));
+        INSERT INTO recipes (id, name, cooking_time, extra) VALUES ('old', 'Старый', 10, '{"servings": 2}');
+        INSERT INTO ingredients VALUES ('old', 0, 'мука', 1, 'г', 0);
+    """)
+    conn.close()
+
+    store = SQLiteRecipeStore(path)
+    try:
+        old = store.get("old")
+        assert old["servings"] == 2
+        assert old["ingredients"] == [{"name": "мука", "amount": 1, "unit": "г", "needs_preparation": False}]
+        store.add(regular(0))
+        assert_same(store.get("r0"), regular(0))
+    finally:
+        store.close()